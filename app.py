@@ -1,6 +1,5 @@
 from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
-import mysql.connector
 import os
 import datetime
 import uuid
@@ -8,27 +7,21 @@ import bcrypt
 import jwt
 import re
 from functools import wraps
+from db_pool import DB_CONFIG, ConnectionPool
+from models import fetch_recipes, recipe_response, recipes_response
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 CORS(app, supports_credentials=True)
 
-# Database configuration
-# Use environment variables for production (Render), fallback to local defaults
-DB_CONFIG = {
-    "host": os.environ.get("DB_HOST", "localhost"),
-    "user": os.environ.get("DB_USER", "root"),
-    "password": os.environ.get("DB_PASSWORD", ""),  # Required: Set via environment variable
-    "database": os.environ.get("DB_NAME", "recipe_finder"),
-    "port": int(os.environ.get("DB_PORT", 3306))
-}
+# Connection pool shared with server.py; configured through the DB_POOL_* variables
+db_pool = ConnectionPool(DB_CONFIG)
 
 def get_db_connection():
-    """Create and return a database connection"""
+    """Get a connection from the pool"""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except mysql.connector.Error as e:
+        return db_pool.get_connection()
+    except Exception as e:
         print(f"❌ Database connection error: {e}")
         return None
 
@@ -304,32 +297,25 @@ def get_favorites():
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count,
+                   COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+                   COALESCE(s.rating_count, 0) as review_count,
                    f.created_at as favorited_at
             FROM user_favorites f
             JOIN recipes r ON f.recipe_id = r.id
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
+            LEFT JOIN recipe_stats s ON r.id = s.recipe_id
             WHERE f.user_id = %s
-            GROUP BY r.id
             ORDER BY f.created_at DESC
         """, (user_id,))
         
-        favorites = cursor.fetchall()
+        favorites = fetch_recipes(cursor)
         
-        for recipe in favorites:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
-
         cursor.close()
         conn.close()
 
-        return jsonify(favorites)
+        return recipes_response(favorites)
 
     except Exception as e:
         print(f"❌ Favorites error: {e}")
@@ -429,6 +415,14 @@ def check_favorite(recipe_id):
         print(f"❌ Check favorite error: {e}")
         return jsonify({"error": "Failed to check favorite"}), 500
 
+# Tag filters by mode; %s is the tag placeholder list
+TAG_MODE_SQL = {
+    'any': " AND r.id IN (SELECT recipe_id FROM recipe_tags WHERE tag_name IN (%s))",
+    'all': " AND r.id IN (SELECT recipe_id FROM recipe_tags WHERE tag_name IN (%s)"
+           " GROUP BY recipe_id HAVING COUNT(DISTINCT tag_name) = %%s)",
+    'none': " AND r.id NOT IN (SELECT recipe_id FROM recipe_tags WHERE tag_name IN (%s))",
+}
+
 # Recipe Routes
 @app.route('/search', methods=['GET'])
 def search_recipe():
@@ -437,107 +431,71 @@ def search_recipe():
         category = request.args.get('category', '')
         difficulty = request.args.get('difficulty', '')
         max_time = request.args.get('max_time', '')
-        tags = request.args.get('tags', '')
+        tag_list = sorted({tag.strip().lower() for tag in request.args.get('tags', '').split(',') if tag.strip()})
+        tag_mode = request.args.get('tag_mode', 'any').strip().lower() or 'any'
+        if tag_mode not in TAG_MODE_SQL:
+            return jsonify({"error": f"Unsupported tag_mode: {tag_mode}"}), 400
 
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        # Use stored procedure for advanced search
-        if tags:
-            cursor.callproc('SearchRecipesAdvanced', [query or None, category or None, difficulty or None, int(max_time) if max_time else None, tags or None])
-        else:
-            # Basic search
-            sql = """
-                SELECT r.*, 
-                       COALESCE(AVG(rt.rating), 0) as avg_rating,
-                       COUNT(rt.id) as review_count,
-                       COUNT(rv.id) as view_count,
-                       n.calories, n.protein_g, n.carbs_g, n.fat_g, n.fiber_g
-                FROM recipes r
-                LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-                LEFT JOIN recipe_views rv ON r.id = rv.recipe_id
-                LEFT JOIN recipe_nutrition n ON r.id = n.recipe_id
-                WHERE 1=1
-            """
-            
-            params = []
-            
-            if query:
-                sql += " AND (LOWER(r.name) LIKE %s OR LOWER(r.ingredients) LIKE %s OR LOWER(r.description) LIKE %s)"
-                params.extend([f"%{query}%", f"%{query}%", f"%{query}%"])
+        sql = """
+            SELECT r.*, 
+                   COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+                   COALESCE(s.rating_count, 0) as review_count,
+                   COALESCE(s.view_count, 0) as view_count,
+                   n.calories, n.protein_g, n.carbs_g, n.fat_g, n.fiber_g
+            FROM recipes r
+            LEFT JOIN recipe_stats s ON r.id = s.recipe_id
+            LEFT JOIN recipe_nutrition n ON r.id = n.recipe_id
+            WHERE 1=1
+        """
+        
+        params = []
+        
+        if query:
+            sql += " AND (LOWER(r.name) LIKE %s OR LOWER(r.ingredients) LIKE %s OR LOWER(r.description) LIKE %s)"
+            params.extend([f"%{query}%", f"%{query}%", f"%{query}%"])
+        
+        if category:
+            sql += " AND r.category = %s"
+            params.append(category)
             
-            if category:
-                sql += " AND r.category = %s"
-                params.append(category)
-                
-            if difficulty:
-                sql += " AND r.difficulty = %s"
-                params.append(difficulty)
-                
-            if max_time:
-                sql += " AND (r.prep_time + r.cook_time) <= %s"
-                params.append(int(max_time))
+        if difficulty:
+            sql += " AND r.difficulty = %s"
+            params.append(difficulty)
             
-            sql += " GROUP BY r.id ORDER BY r.name"
-            cursor.execute(sql, params)
+        if max_time:
+            sql += " AND (r.prep_time + r.cook_time) <= %s"
+            params.append(int(max_time))
 
-        recipes = []
-        if tags:
-            for result in cursor.stored_results():
-                recipes = result.fetchall()
-                break
-        else:
-            recipes = cursor.fetchall()
+        # Tags go through the recipe_tags index rather than FIND_IN_SET over a join
+        if tag_list:
+            sql += TAG_MODE_SQL[tag_mode] % ", ".join(["%s"] * len(tag_list))
+            params.extend(tag_list)
+            if tag_mode == 'all':
+                params.append(len(tag_list))
+        
+        sql += " ORDER BY r.name"
+        cursor.execute(sql, params)
+        recipes = fetch_recipes(cursor)
 
         cursor.close()
         conn.close()
 
-        # Enhance recipe data
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = recipe['prep_time'] + recipe['cook_time']
-            recipe['view_count'] = int(recipe['view_count']) if recipe['view_count'] else 0
-            
-            # Add nutrition info
-            recipe['nutrition'] = {
-                'calories': recipe.get('calories', estimate_calories(recipe)),
-                'protein': f"{recipe.get('protein_g', 0)}g",
-                'carbs': f"{recipe.get('carbs_g', 0)}g",
-                'fat': f"{recipe.get('fat_g', 0)}g",
-                'fiber': f"{recipe.get('fiber_g', 0)}g"
-            }
-
         # Log search activity
         if query or category or difficulty or max_time:
             log_search_activity(query, category, difficulty, max_time, len(recipes))
 
-        return jsonify(recipes)
+        return recipes_response(recipes)
     
     except Exception as e:
         print(f"❌ Search error: {e}")
         return jsonify({"error": "Failed to search recipes"}), 500
 
-def estimate_calories(recipe):
-    """Estimate calories based on recipe ingredients"""
-    ingredients = recipe.get('ingredients', '').lower()
-    if 'paneer' in ingredients or 'cheese' in ingredients:
-        return 350
-    elif 'chicken' in ingredients or 'meat' in ingredients:
-        return 400
-    elif 'rice' in ingredients:
-        return 300
-    elif 'dal' in ingredients or 'lentil' in ingredients:
-        return 250
-    elif 'vegetable' in ingredients:
-        return 200
-    else:
-        return 280
-
 def log_search_activity(query, category, difficulty, max_time, results_count):
     """Log search activity for analytics"""
     try:
@@ -548,12 +506,12 @@ def log_search_activity(query, category, difficulty, max_time, results_count):
         cursor = conn.cursor()
         session_id = get_session_id()
         
-        search_query = f"q={query}&category={category}&difficulty={difficulty}&max_time={max_time}"
-        
         cursor.execute("""
-            INSERT INTO search_history (search_query, session_id, results_count)
-            VALUES (%s, %s, %s)
-        """, (search_query, session_id, results_count))
+            INSERT INTO search_history
+                (normalized_query, category, difficulty, max_time, session_id, results_count)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (' '.join(query.split())[:255] or None, category or None, difficulty or None,
+              int(max_time) if max_time else None, session_id, results_count))
         
         conn.commit()
         cursor.close()
@@ -569,25 +527,23 @@ def get_recipe(recipe_id):
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         cursor.execute("""
             SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count,
-                   COUNT(rv.id) as view_count,
+                   COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+                   COALESCE(s.rating_count, 0) as review_count,
+                   COALESCE(s.view_count, 0) as view_count,
                    n.calories, n.protein_g, n.carbs_g, n.fat_g, n.fiber_g
             FROM recipes r
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-            LEFT JOIN recipe_views rv ON r.id = rv.recipe_id
+            LEFT JOIN recipe_stats s ON r.id = s.recipe_id
             LEFT JOIN recipe_nutrition n ON r.id = n.recipe_id
             WHERE r.id = %s
-            GROUP BY r.id
         """, (recipe_id,))
         
-        recipe = cursor.fetchone()
+        recipes = fetch_recipes(cursor)
         
-        if not recipe:
+        if not recipes:
             cursor.close()
             conn.close()
             return jsonify({"error": "Recipe not found"}), 404
@@ -596,32 +552,15 @@ def get_recipe(recipe_id):
         cursor.execute("""
             SELECT tag_name FROM recipe_tags WHERE recipe_id = %s
         """, (recipe_id,))
-        tags = [row['tag_name'] for row in cursor.fetchall()]
+        tags = [row[0] for row in cursor.fetchall()]
         
         cursor.close()
         conn.close()
 
-        # Enhance recipe data
-        recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-        recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-        recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-        recipe['total_time'] = recipe['prep_time'] + recipe['cook_time']
-        recipe['view_count'] = int(recipe['view_count']) if recipe['view_count'] else 0
-        recipe['tags'] = tags
-        
-        # Add nutrition info
-        recipe['nutrition'] = {
-            'calories': recipe.get('calories', estimate_calories(recipe)),
-            'protein': f"{recipe.get('protein_g', 0)}g",
-            'carbs': f"{recipe.get('carbs_g', 0)}g",
-            'fat': f"{recipe.get('fat_g', 0)}g",
-            'fiber': f"{recipe.get('fiber_g', 0)}g"
-        }
-
         # Log recipe view
         log_recipe_view(recipe_id)
 
-        return jsonify(recipe)
+        return recipe_response(recipes[0], tags=tags)
     
     except Exception as e:
         print(f"❌ Database error: {e}")
@@ -653,33 +592,24 @@ def get_popular_recipes():
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         cursor.execute("""
             SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count,
-                   COUNT(rv.id) as view_count
+                   COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+                   COALESCE(s.rating_count, 0) as review_count,
+                   COALESCE(s.view_count, 0) as view_count
             FROM recipes r
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-            LEFT JOIN recipe_views rv ON r.id = rv.recipe_id
-            GROUP BY r.id
+            LEFT JOIN recipe_stats s ON r.id = s.recipe_id
             ORDER BY view_count DESC, avg_rating DESC
             LIMIT 8
         """)
         
-        recipes = cursor.fetchall()
+        recipes = fetch_recipes(cursor)
         cursor.close()
         conn.close()
 
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
-            recipe['view_count'] = int(recipe['view_count']) if recipe['view_count'] else 0
-
-        return jsonify(recipes)
+        return recipes_response(recipes)
     
     except Exception as e:
         print(f"❌ Database error: {e}")
@@ -693,31 +623,24 @@ def get_quick_meals():
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         cursor.execute("""
             SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count
+                   COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+                   COALESCE(s.rating_count, 0) as review_count
             FROM recipes r
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
+            LEFT JOIN recipe_stats s ON r.id = s.recipe_id
             WHERE r.is_quick_meal = TRUE OR (r.prep_time + r.cook_time) <= 30
-            GROUP BY r.id
             ORDER BY (r.prep_time + r.cook_time) ASC
             LIMIT 10
         """)
         
-        recipes = cursor.fetchall()
+        recipes = fetch_recipes(cursor)
         cursor.close()
         conn.close()
 
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
-
-        return jsonify(recipes)
+        return recipes_response(recipes)
     
     except Exception as e:
         print(f"❌ Database error: {e}")
@@ -731,31 +654,24 @@ def get_featured_recipes():
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         cursor.execute("""
             SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count
+                   COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+                   COALESCE(s.rating_count, 0) as review_count
             FROM recipes r
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
+            LEFT JOIN recipe_stats s ON r.id = s.recipe_id
             WHERE r.is_featured = TRUE
-            GROUP BY r.id
             ORDER BY r.created_at DESC
             LIMIT 6
         """)
         
-        recipes = cursor.fetchall()
+        recipes = fetch_recipes(cursor)
         cursor.close()
         conn.close()
 
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
-
-        return jsonify(recipes)
+        return recipes_response(recipes)
     
     except Exception as e:
         print(f"❌ Database error: {e}")
@@ -769,25 +685,19 @@ def get_recipes_by_category(category_name):
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         cursor.callproc('GetRecipesByCategory', [category_name])
         
         recipes = []
         for result in cursor.stored_results():
-            recipes = result.fetchall()
+            recipes = fetch_recipes(result)
             break
         
         cursor.close()
         conn.close()
 
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
-
-        return jsonify(recipes)
+        return recipes_response(recipes)
     
     except Exception as e:
         print(f"❌ Database error: {e}")
@@ -864,10 +774,12 @@ def rate_recipe(recipe_id):
 
         cursor = conn.cursor()
 
-        # Check if user already rated this recipe
+        # Check if user already rated this recipe; the row stays locked until commit so a
+        # concurrent re-rating cannot apply its difference against the same old value
         cursor.execute("""
-            SELECT id FROM recipe_ratings 
+            SELECT id, rating FROM recipe_ratings 
             WHERE recipe_id = %s AND session_id = %s
+            FOR UPDATE
         """, (recipe_id, session_id))
         
         existing_rating = cursor.fetchone()
@@ -879,12 +791,14 @@ def rate_recipe(recipe_id):
                 SET rating = %s, created_at = CURRENT_TIMESTAMP 
                 WHERE id = %s
             """, (rating, existing_rating[0]))
+            update_rating_stats(cursor, recipe_id, int(rating) - (existing_rating[1] or 0), 0)
         else:
             # Insert new rating
             cursor.execute("""
                 INSERT INTO recipe_ratings (recipe_id, rating, session_id)
                 VALUES (%s, %s, %s)
             """, (recipe_id, rating, session_id))
+            update_rating_stats(cursor, recipe_id, int(rating), 1)
 
         conn.commit()
         cursor.close()
@@ -896,6 +810,16 @@ def rate_recipe(recipe_id):
         print(f"❌ Rating error: {e}")
         return jsonify({"error": "Failed to submit rating"}), 500
 
+def update_rating_stats(cursor, recipe_id, rating_delta, count_delta):
+    """Apply a rating change to the denormalized recipe_stats row"""
+    cursor.execute("""
+        INSERT INTO recipe_stats (recipe_id, rating_sum, rating_count)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            rating_sum = rating_sum + VALUES(rating_sum),
+            rating_count = rating_count + VALUES(rating_count)
+    """, (recipe_id, rating_delta, count_delta))
+
 # Get similar recipes
 @app.route('/recipe/<int:recipe_id>/similar', methods=['GET'])
 def get_similar_recipes(recipe_id):
@@ -906,24 +830,18 @@ def get_similar_recipes(recipe_id):
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         cursor.callproc('GetSimilarRecipes', [recipe_id, int(limit)])
         
         similar_recipes = []
         for result in cursor.stored_results():
-            similar_recipes = result.fetchall();
+            similar_recipes = fetch_recipes(result)
             break
         
         cursor.close()
         conn.close()
 
-        for recipe in similar_recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
-
-        return jsonify(similar_recipes)
+        return recipes_response(similar_recipes)
     
     except Exception as e:
         print(f"❌ Database error: {e}")
@@ -952,8 +870,8 @@ def get_stats():
         total_tags = cursor.fetchone()['total_tags']
 
         # Get total views
-        cursor.execute("SELECT COUNT(*) as total_views FROM recipe_views")
-        total_views = cursor.fetchone()['total_views']
+        cursor.execute("SELECT COALESCE(SUM(view_count), 0) as total_views FROM recipe_stats")
+        total_views = int(cursor.fetchone()['total_views'])
 
         # Get popular categories
         cursor.execute("""
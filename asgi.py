@@ -0,0 +1,456 @@
+"""
+ASGI entry point: `uvicorn asgi:app --workers 2`.
+
+Serves the same routes and JSON as the WSGI `server:app`, which keeps working
+unchanged. The read routes that dominate traffic (recipe detail, the home
+sections, category pages, similar recipes, categories, tags, stats and
+/bootstrap) run as coroutines on an aiomysql pool. Their independent queries
+run concurrently, e.g. a recipe and its tags, or the five /stats counters.
+While a query is in flight the event loop keeps serving other clients. One
+process can therefore hold thousands of open connections and needs only
+ASYNC_DB_POOL_SIZE MySQL connections per database.
+
+Every other route (auth, favorites, ratings, search, static files) is handed to
+the Flask app through a WSGI adapter on a thread pool. Both halves share the
+process's catalog, response cache and background writers, so ETags and cached
+bodies are interchangeable between them.
+
+Reads go to the DB_REPLICA_HOSTS replicas when configured, except for clients
+holding server.py's read-your-writes cookie, and fall back to the primary if a
+replica cannot be reached.
+"""
+
+import asyncio
+import contextvars
+import datetime
+import itertools
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+import aiomysql
+import pymysql
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags
+
+import server
+from db_pool import DB_CONFIG, DB_POOL_RECYCLE, ReplicaVersions, replica_configs
+from models import VIEWS, FieldSet, RecipeSchema, encode_value, recipes_by_id_json, recipes_json
+from pagination import DEFAULT_PAGE_SIZE, PageRequest, SORT_KEYS
+from similarity import SIMILAR_NEIGHBORS
+from server import (
+    CATEGORIES_SQL, FEATURED_SECTION, POPULAR_SECTION, QUICK_MEALS_SECTION, RECIPE_TAGS_SQL,
+    READ_PRIMARY_COOKIE, STATS_QUERIES, TAGS_SQL, build_stats, catalog, recipe_list_sql,
+    response_cache, section_sql, similar_sql, similarity, view_writer,
+)
+
+ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 20))
+
+# Replicas the current request has read from, collected by conditional()
+read_replicas = contextvars.ContextVar('read_replicas', default=None)
+
+JSON = 'application/json'
+
+
+class ReadPools:
+    """aiomysql pools for the primary and each replica, opened at startup."""
+
+    def __init__(self):
+        self.primary = None
+        self.replicas = []
+        self.replica_versions = ReplicaVersions(0)
+        self._turn = itertools.count()
+
+    async def open(self):
+        self.primary = await self._create(DB_CONFIG)
+        self.replicas = []
+        for config in replica_configs():
+            try:
+                self.replicas.append(await self._create(config))
+            except Exception as e:
+                print(f"❌ Replica {config['host']} unavailable, reading from the primary: {e}")
+        self.replica_versions = ReplicaVersions(len(self.replicas))
+
+    @staticmethod
+    async def _create(config):
+        return await aiomysql.create_pool(
+            host=config['host'], port=config['port'], user=config['user'],
+            password=config['password'], db=config['database'],
+            minsize=1, maxsize=ASYNC_DB_POOL_SIZE, pool_recycle=DB_POOL_RECYCLE,
+            # Read-only; autocommit keeps every query on a fresh snapshot
+            autocommit=True,
+        )
+
+    async def close(self):
+        for pool in [self.primary, *self.replicas]:
+            if pool is not None:
+                pool.close()
+                await pool.wait_closed()
+
+    def pick(self, request):
+        """Round-robin replica, or the primary after a recent write by this client."""
+        if not self.replicas or wrote_recently(request):
+            return self.primary
+        return self.replicas[next(self._turn) % len(self.replicas)]
+
+
+pools = ReadPools()
+
+
+def wrote_recently(request):
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def query(request, sql, params=()):
+    """Run one read on its own pooled connection; returns (column_names, rows)."""
+    pool = pools.pick(request)
+    try:
+        if pool is not pools.primary:
+            await note_replica_read(pools.replicas.index(pool))
+        return await _query(pool, sql, params)
+    except pymysql.err.OperationalError:
+        if pool is pools.primary:
+            raise
+        return await _query(pools.primary, sql, params)
+
+
+async def _query(pool, sql, params):
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+            return [column[0] for column in cursor.description], rows
+
+
+async def query_recipes(request, fields, sql, params=()):
+    column_names, rows = await query(request, sql, params)
+    return RecipeSchema(column_names, fields.fields).load(rows)
+
+
+async def note_replica_read(i):
+    """Record a read from replica `i`, refreshing its data_versions first when due.
+
+    Read before the query itself, so the query sees at least those versions.
+    """
+    if pools.replica_versions.claim(i):
+        try:
+            _, rows = await _query(pools.replicas[i], "SELECT scope, version FROM data_versions", ())
+            pools.replica_versions.update(i, rows)
+        except pymysql.err.MySQLError as e:
+            print(f"❌ Failed to read data_versions on a replica: {e}")
+    replicas = read_replicas.get()
+    if replicas is not None:
+        replicas.add(i)
+
+
+def json_response(body, status_code=200):
+    return Response(body, status_code=status_code, media_type=JSON)
+
+
+def json_error(message, status_code):
+    return json_response(encode_value({"error": message}), status_code)
+
+
+async def data_versions(scopes):
+    # The version poll and a snapshot reload are blocking; both run off the event loop. The
+    # counters are then read without polling: version_of() could poll again on the loop when
+    # the interval has lapsed meanwhile or another thread holds the refresh lock.
+    if catalog.refresh_due():
+        await asyncio.to_thread(catalog.refresh)
+    return catalog.cached_versions(scopes)
+
+
+def cache_key(request):
+    """Same key as response_cache.normalized_args(), from Starlette's query params."""
+    return (request.url.path, tuple(sorted(
+        (name, value.strip()) for name, value in request.query_params.multi_items() if value.strip()
+    )))
+
+
+def conditional(scopes, cache_control, ttl=None, on_not_modified=None):
+    """Async counterpart of ResponseCache.conditional(), plus .cached() when `ttl` is set."""
+    def decorator(handler):
+        async def endpoint(request):
+            versions = await data_versions(scopes)
+            etag = response_cache.etag(versions)
+
+            if parse_etags(request.headers.get('if-none-match')).contains(etag):
+                response_cache.not_modified += 1
+                if on_not_modified:
+                    on_not_modified(request)
+                response = Response(status_code=304)
+            else:
+                key = cache_key(request)
+                body = response_cache.get(key, versions) if ttl else None
+                if body is not None:
+                    response = json_response(body)
+                else:
+                    # A set shared with the gather()ed reads, which run in copies of this context
+                    replicas = set()
+                    read_replicas.set(replicas)
+                    response = await handler(request)
+                    if response.status_code != 200:
+                        return response
+                    if any(pools.replica_versions.behind(i, scopes, versions) for i in replicas):
+                        # Read from a lagging replica: valid now, but not under this ETag
+                        response.headers['Cache-Control'] = 'no-cache'
+                        return response
+                    if ttl:
+                        response_cache.set(key, versions, response.body, ttl)
+
+            response.headers['ETag'] = f'"{etag}"'
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return endpoint
+    return decorator
+
+
+def log_view(request, recipe_id):
+    session_id = request.headers.get('x-session-id') or str(uuid.uuid4())
+    view_writer.submit((recipe_id, session_id, datetime.datetime.now()))
+
+
+def log_revalidated_view(request):
+    recipe_id = request.path_params['recipe_id']
+    snapshot = catalog.snapshot
+    if snapshot is not None and recipe_id in snapshot.by_id:
+        log_view(request, recipe_id)
+
+
+@conditional(('recipes', 'ratings', 'views'), 'public, max-age=60', on_not_modified=log_revalidated_view)
+async def get_recipe(request):
+    recipe_id = request.path_params['recipe_id']
+    try:
+        fields = FieldSet()
+        recipes, (_, tag_rows) = await asyncio.gather(
+            query_recipes(request, fields, recipe_list_sql(fields) + " AND r.id = %s", (recipe_id,)),
+            query(request, RECIPE_TAGS_SQL, (recipe_id,)),
+        )
+        if not recipes:
+            return json_error("Recipe not found", 404)
+
+        log_view(request, recipe_id)
+
+        recipe = recipes[0]
+        recipe.values[recipe.schema.index['tags']] = [row[0] for row in tag_rows]
+        return json_response(recipe.to_json())
+
+    except Exception as e:
+        print(f"❌ Database error: {e}")
+        return json_error("Failed to fetch recipe", 500)
+
+
+def section_route(section, error):
+    async def handler(request):
+        try:
+            fields = FieldSet.from_args(request.query_params)
+            recipes = await query_recipes(request, fields, section_sql(fields.select_list(), section))
+            return json_response(recipes_json(recipes))
+        except ValueError as e:
+            return json_error(str(e), 400)
+        except Exception as e:
+            print(f"❌ Database error: {e}")
+            return json_error(error, 500)
+    return handler
+
+
+get_popular_recipes = conditional(('recipes', 'ratings', 'views'), 'public, max-age=30', ttl=60)(
+    section_route(POPULAR_SECTION, "Failed to fetch popular recipes"))
+get_quick_meals = conditional(('recipes', 'ratings'), 'public, max-age=120', ttl=300)(
+    section_route(QUICK_MEALS_SECTION, "Failed to fetch quick meals"))
+get_featured_recipes = conditional(('recipes', 'ratings'), 'public, max-age=120', ttl=300)(
+    section_route(FEATURED_SECTION, "Failed to fetch featured recipes"))
+
+
+async def fetch_recipe_page(request, fields, where, params, page):
+    """Async server.fetch_recipe_page(); the first-page COUNT runs alongside the page itself."""
+    sort_key = SORT_KEYS[page.sort]
+    keyset, keyset_params = page.keyset_sql(sort_key)
+    sql = recipe_list_sql(fields, sort_key.field) + where + keyset + page.order_sql(sort_key)
+    reads = [query_recipes(request, fields, sql, params + keyset_params)]
+    if page.first:
+        reads.append(query(request, "SELECT COUNT(*) FROM recipes r WHERE 1=1" + where, params))
+
+    results = await asyncio.gather(*reads)
+    recipes, next_cursor = page.paginate(results[0], sort_key)
+    total = results[1][1][0][0] if page.first else None
+    return recipes, next_cursor, total
+
+
+async def fetch_recipes_by_id(request, fields, recipe_ids):
+    """Async server.fetch_recipes_by_id(): recipes by id, in the order given."""
+    if not recipe_ids:
+        return []
+    sql = recipe_list_sql(fields) + " AND r.id IN (%s)" % ", ".join(["%s"] * len(recipe_ids))
+    rank = {recipe_id: i for i, recipe_id in enumerate(recipe_ids)}
+    recipes = await query_recipes(request, fields, sql, recipe_ids)
+    return sorted(recipes, key=lambda recipe: rank[recipe.id])
+
+
+def page_body(recipes, next_cursor, total):
+    return (
+        '{"recipes":' + recipes_json(recipes)
+        + ',"next_cursor":' + encode_value(next_cursor)
+        + ',"total":' + encode_value(total) + '}'
+    )
+
+
+@conditional(('recipes', 'ratings'), 'public, max-age=60')
+async def get_recipes_by_category(request):
+    try:
+        page = PageRequest.from_args(request.query_params, SORT_KEYS, 'rating')
+        fields = FieldSet.from_args(request.query_params)
+        recipes, next_cursor, total = await fetch_recipe_page(
+            request, fields, " AND r.category = %s", [request.path_params['category_name']], page
+        )
+        return json_response(page_body(recipes, next_cursor, total))
+    except ValueError as e:
+        return json_error(str(e), 400)
+    except Exception as e:
+        print(f"❌ Database error: {e}")
+        return json_error("Failed to fetch category recipes", 500)
+
+
+@conditional(('recipes', 'ratings'), 'public, max-age=300')
+async def get_similar_recipes(request):
+    try:
+        recipe_id = request.path_params['recipe_id']
+        limit = min(int(request.query_params.get('limit', 4)), SIMILAR_NEIGHBORS)
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        fields = FieldSet.from_args(request.query_params)
+        similar_ids = similarity.neighbors(recipe_id, limit)
+        if similar_ids is None:
+            recipes = await query_recipes(request, fields, similar_sql(fields), (recipe_id, limit))
+        else:
+            recipes = await fetch_recipes_by_id(request, fields, similar_ids)
+        return json_response(recipes_json(recipes))
+    except ValueError as e:
+        return json_error(str(e), 400)
+    except Exception as e:
+        print(f"❌ Database error: {e}")
+        return json_error("Failed to fetch similar recipes", 500)
+
+
+async def read_counts(request, sql):
+    _, rows = await query(request, sql)
+    return [{'name': row[0], 'count': row[1]} for row in rows]
+
+
+async def read_stats(request):
+    results = await asyncio.gather(*(query(request, sql) for sql in STATS_QUERIES.values()))
+    return build_stats({name: rows for name, (_, rows) in zip(STATS_QUERIES, results)})
+
+
+@conditional(('recipes',), 'public, max-age=300', ttl=600)
+async def get_categories(request):
+    try:
+        return json_response(encode_value(await read_counts(request, CATEGORIES_SQL)))
+    except Exception as e:
+        print(f"❌ Database error: {e}")
+        return json_error("Failed to fetch categories", 500)
+
+
+@conditional(('recipes',), 'public, max-age=300', ttl=600)
+async def get_tags(request):
+    try:
+        return json_response(encode_value(await read_counts(request, TAGS_SQL)))
+    except Exception as e:
+        print(f"❌ Database error: {e}")
+        return json_error("Failed to fetch tags", 500)
+
+
+@conditional(('recipes', 'views'), 'public, max-age=30', ttl=60)
+async def get_stats(request):
+    try:
+        return json_response(encode_value(await read_stats(request)))
+    except Exception as e:
+        print(f"❌ Database error: {e}")
+        return json_error("Failed to fetch statistics", 500)
+
+
+@conditional(('recipes', 'ratings', 'views'), 'public, max-age=30', ttl=60)
+async def get_bootstrap(request):
+    """Same body as server.get_bootstrap(), with every independent read in flight at once."""
+    try:
+        fields = FieldSet(*VIEWS['card'])
+        page = PageRequest('name', DEFAULT_PAGE_SIZE)
+        section_names = ('popular', 'quick_meals', 'featured')
+
+        (recipes, next_cursor, total), *section_rows, categories, tags, stats = await asyncio.gather(
+            fetch_recipe_page(request, fields, "", [], page),
+            *(query(request, section_sql('r.id', section))
+              for section in (POPULAR_SECTION, QUICK_MEALS_SECTION, FEATURED_SECTION)),
+            read_counts(request, CATEGORIES_SQL),
+            read_counts(request, TAGS_SQL),
+            read_stats(request),
+        )
+        cards = {recipe.id: recipe for recipe in recipes}
+        sections = {
+            name: [row[0] for row in rows] for name, (_, rows) in zip(section_names, section_rows)
+        }
+
+        # One read for the cards not already on the first page
+        missing = list(dict.fromkeys(
+            recipe_id for ids in sections.values() for recipe_id in ids if recipe_id not in cards
+        ))
+        for recipe in await fetch_recipes_by_id(request, fields, missing):
+            cards[recipe.id] = recipe
+
+        body = (
+            '{"recipes":' + recipes_by_id_json(cards.values())
+            + ',"all":' + encode_value({
+                "ids": [recipe.id for recipe in recipes], "next_cursor": next_cursor, "total": total
+            })
+            + ''.join(f',"{name}":{encode_value(ids)}' for name, ids in sections.items())
+            + ',"categories":' + encode_value(categories)
+            + ',"tags":' + encode_value(tags)
+            + ',"stats":' + encode_value(stats) + '}'
+        )
+        return json_response(body)
+
+    except Exception as e:
+        print(f"❌ Bootstrap error: {e}")
+        return json_error("Failed to load initial data", 500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await pools.open()
+    try:
+        yield
+    finally:
+        await pools.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/recipe/{recipe_id:int}', get_recipe, methods=['GET']),
+        Route('/recipe/{recipe_id:int}/similar', get_similar_recipes, methods=['GET']),
+        Route('/popular', get_popular_recipes, methods=['GET']),
+        Route('/quick-meals', get_quick_meals, methods=['GET']),
+        Route('/featured', get_featured_recipes, methods=['GET']),
+        Route('/category/{category_name}', get_recipes_by_category, methods=['GET']),
+        Route('/categories', get_categories, methods=['GET']),
+        Route('/tags', get_tags, methods=['GET']),
+        Route('/stats', get_stats, methods=['GET']),
+        Route('/bootstrap', get_bootstrap, methods=['GET']),
+        # Everything else, including 404s, is answered by the Flask app
+        Mount('/', app=WSGIMiddleware(server.app)),
+    ],
+    middleware=[
+        # Mirrors CORS(app, supports_credentials=True) in server.py
+        Middleware(CORSMiddleware, allow_origin_regex='.*', allow_credentials=True,
+                   allow_methods=['*'], allow_headers=['*']),
+    ],
+    lifespan=lifespan,
+)
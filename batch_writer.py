@@ -0,0 +1,160 @@
+"""
+Background writer that moves fire-and-forget INSERTs off the request thread.
+
+Requests hand rows to `submit()`, which only touches an in-process queue. A
+daemon thread drains the queue and writes whatever has accumulated every
+`flush_interval` seconds, or sooner once `batch_size` rows are waiting, using a
+single connection checkout and commit per batch. An optional `on_idle()` runs
+on the writer thread after each `flush_interval` with nothing to write, and an
+optional `after_flush()` after each committed batch, outside its transaction,
+so its failure cannot undo the rows.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+
+class BatchWriter:
+    """Bounded queue drained by a thread that writes rows in batches.
+
+    `write_batch(cursor, rows)` performs the actual INSERTs. When the queue is
+    full, the 'drop' policy discards the new row and 'block' waits up to
+    `block_timeout` seconds for room before discarding it.
+    """
+
+    def __init__(self, name, write_batch, connection_factory, batch_size=500,
+                 flush_interval=1.0, max_queue=10000, overflow='drop', block_timeout=1.0, on_idle=None,
+                 after_flush=None):
+        if overflow not in ('drop', 'block'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self.name = name
+        self.write_batch = write_batch
+        self._get_connection = connection_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.on_idle = on_idle
+        self.after_flush = after_flush
+
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+        self._queue = None
+        self._thread = None
+        self._stopping = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own queue and thread
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, row):
+        """Queue a row for writing; returns False if it was dropped."""
+        self._ensure_started()
+        try:
+            if self.overflow == 'block':
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.queued += 1
+        return True
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+            elif self._stopping.is_set():
+                return
+            elif self.on_idle is not None:
+                self._call(self.on_idle, "idle")
+
+    def _call(self, callback, label):
+        try:
+            callback()
+        except Exception as e:
+            print(f"❌ {self.name} {label} callback failed: {e}")
+
+    def _collect(self):
+        """Wait for the first row, then gather more until the batch or the interval is full."""
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if deadline is None:
+                timeout = self.flush_interval
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            if self._stopping.is_set():
+                timeout = 0
+            try:
+                row = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                if deadline is None and not self._stopping.is_set() and self.on_idle is None:
+                    continue
+                break
+            batch.append(row)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _flush(self, batch):
+        conn = None
+        try:
+            conn = self._get_connection()
+            if not conn:
+                raise RuntimeError("no database connection")
+            cursor = conn.cursor()
+            self.write_batch(cursor, batch)
+            conn.commit()
+            cursor.close()
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"❌ Failed to write {len(batch)} {self.name} rows: {e}")
+            return
+        finally:
+            if conn:
+                conn.close()
+        if self.after_flush is not None:
+            self._call(self.after_flush, "after-flush")
+
+    def stop(self, timeout=5.0):
+        """Flush whatever is queued and stop the writer thread."""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self.queued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": self._queue.qsize() if self._pid == os.getpid() else 0,
+            "overflow": self.overflow,
+        }
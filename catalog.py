@@ -0,0 +1,170 @@
+"""
+In-memory snapshot of the recipe catalog and the data version counters.
+
+The search indexes are built from this snapshot instead of scanning MySQL on
+every request. data_versions holds one counter per scope: 'recipes' (bumped
+by triggers on recipes and recipe_tags), 'ratings' (triggers on
+recipe_ratings), 'views' (bumped after recipe_views batches, at most every
+VIEW_VERSION_INTERVAL seconds) and 'trending' (bumped by each rollup_views.py
+run). Each worker polls that table at most every CATALOG_CHECK_INTERVAL
+seconds; the snapshot is reloaded when the 'recipes' counter moves, and
+caches compare the other counters to decide whether an entry is stale.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+CATALOG_CHECK_INTERVAL = float(os.environ.get('CATALOG_CHECK_INTERVAL', 5))
+
+CatalogRecipe = namedtuple('CatalogRecipe', [
+    'id', 'name', 'description', 'ingredients', 'category', 'difficulty',
+    'prep_time', 'cook_time', 'cuisine_type', 'tags'
+])
+
+
+class CatalogSnapshot:
+    """Immutable view of every recipe, in id order."""
+
+    def __init__(self, version, recipes):
+        self.version = version
+        self.recipes = recipes
+        self.by_id = {recipe.id: recipe for recipe in recipes}
+
+    def __len__(self):
+        return len(self.recipes)
+
+
+class Catalog:
+    """Loads the catalog snapshot and notifies subscribers when it changes."""
+
+    def __init__(self, connection_factory, check_interval=CATALOG_CHECK_INTERVAL):
+        self._get_connection = connection_factory
+        self.check_interval = check_interval
+        self.snapshot = None
+        self.versions = {}
+        self._subscribers = []
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.last_error = None
+
+    def subscribe(self, callback):
+        """Call `callback(snapshot)` now (if loaded) and after every reload."""
+        self._subscribers.append(callback)
+        if self.snapshot is not None:
+            callback(self.snapshot)
+
+    def current(self):
+        """Return the latest snapshot, reloading it if the catalog version moved."""
+        if self.refresh_due():
+            self.refresh()
+        return self.snapshot
+
+    def refresh_due(self):
+        """Whether the next current() call will query data_versions."""
+        return time.monotonic() - self._checked_at >= self.check_interval
+
+    def version_of(self, scopes):
+        """Return the current counters for `scopes` as a tuple."""
+        self.current()
+        return self.cached_versions(scopes)
+
+    def cached_versions(self, scopes):
+        """Counters for `scopes` from the last poll, without polling (safe on an event loop)."""
+        versions = self.versions
+        return tuple(versions.get(scope, 0) for scope in scopes)
+
+    def mark_stale(self):
+        """Make the next current() call re-read the counters (after a local write)."""
+        self._checked_at = 0.0
+
+    def refresh(self, force=False):
+        """Reload the snapshot if the stored version differs from ours.
+
+        Only one thread reloads at a time; the others keep serving the
+        previous snapshot instead of waiting.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            conn = self._get_connection()
+            if not conn:
+                self._failed("no database connection")
+                return False
+            try:
+                cursor = conn.cursor()
+                versions = self._read_versions(cursor)
+                version = versions.get('recipes', 0)
+                if not force and self.snapshot is not None and version == self.snapshot.version:
+                    cursor.close()
+                    self.versions = versions
+                    return False
+                snapshot = CatalogSnapshot(version, self._load_recipes(cursor))
+                cursor.close()
+            finally:
+                conn.close()
+
+            self.snapshot = snapshot
+            self.versions = versions
+            self.last_error = None
+            for callback in self._subscribers:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    print(f"❌ Catalog subscriber failed: {e}")
+            print(f"✅ Catalog loaded: {len(snapshot)} recipes (version {version})")
+            return True
+        except Exception as e:
+            self._failed(e)
+            return False
+        finally:
+            self._lock.release()
+
+    def _failed(self, error):
+        self.failures += 1
+        self.last_error = str(error)
+        if self.snapshot is None:
+            # Nothing in memory: text search falls back to LIKE and facets, suggestions and pantry are off
+            print(
+                f"❌ RECIPE CATALOG NOT LOADED ({error}). In-memory search, facets, suggestions and pantry "
+                "matching are disabled until it loads. If data_versions or its triggers are missing, "
+                "run migrate_db.py."
+            )
+        else:
+            print(f"❌ Failed to reload recipe catalog, still serving version {self.snapshot.version}: {error}")
+
+    def stats(self):
+        return {
+            "loaded": self.snapshot is not None,
+            "version": self.snapshot.version if self.snapshot is not None else None,
+            "recipes": len(self.snapshot) if self.snapshot is not None else 0,
+            "versions": dict(self.versions),
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+    @staticmethod
+    def _read_versions(cursor):
+        cursor.execute("SELECT scope, version FROM data_versions")
+        return dict(cursor.fetchall())
+
+    @staticmethod
+    def _load_recipes(cursor):
+        cursor.execute("SELECT recipe_id, tag_name FROM recipe_tags ORDER BY recipe_id, tag_name")
+        tags = {}
+        for recipe_id, tag_name in cursor.fetchall():
+            tags.setdefault(recipe_id, []).append(tag_name)
+
+        cursor.execute("""
+            SELECT id, name, description, ingredients, category, difficulty,
+                   prep_time, cook_time, cuisine_type
+            FROM recipes
+            ORDER BY id
+        """)
+        return [
+            CatalogRecipe(*row, tags=tuple(tags.get(row[0], ())))
+            for row in cursor.fetchall()
+        ]
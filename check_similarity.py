@@ -0,0 +1,137 @@
+"""
+Brute-force check of the /recipe/<id>/similar neighbour search.
+
+SimilarityIndex finds each recipe's top-k neighbours with posting lists and
+group bounds instead of scoring every pair (see similarity.py). This script
+builds the index on a synthetic catalog, scores every pair with one dense
+matrix product, and compares each neighbour list. It then changes a few
+recipes and checks the incrementally patched lists the same way.
+
+Run it after any change to FeatureMatrix.top() or SimilarityIndex._patch():
+
+    python check_similarity.py [--recipes 3000] [--seed 7]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from catalog import CatalogRecipe, CatalogSnapshot
+from similarity import SimilarityIndex
+
+# Tolerance on scores: the index stores them as float32
+SCORE_TOLERANCE = 1e-5
+
+INGREDIENTS = [
+    'salt', 'oil', 'onion', 'garlic', 'ginger', 'tomato', 'turmeric', 'cumin seeds', 'chili powder',
+    'garam masala', 'coriander leaves', 'butter', 'ghee', 'cream', 'yogurt', 'milk', 'sugar', 'flour',
+    'rice', 'basmati rice', 'toor dal', 'moong dal', 'chickpeas', 'paneer', 'chicken', 'mutton', 'egg',
+    'potato', 'cauliflower', 'spinach', 'peas', 'carrot', 'bell pepper', 'mushroom', 'lemon juice',
+    'mustard seeds', 'curry leaves', 'coconut milk', 'tamarind', 'jaggery', 'cardamom', 'saffron',
+    'cashew nuts', 'raisins', 'bread', 'cheese', 'pasta', 'olive oil', 'basil', 'soy sauce',
+]
+TAGS = ['vegetarian', 'spicy', 'quick', 'healthy', 'festive', 'breakfast', 'dessert', 'street food']
+CUISINES = ['Indian', 'Italian', 'Chinese', 'Mexican', None]
+DIFFICULTIES = ['Easy', 'Medium', 'Hard']
+
+
+def synthetic_recipe(rng, recipe_id):
+    # Skewed choice, so some ingredients are frequent and others rare
+    count = rng.randint(2, 9)
+    names = {INGREDIENTS[min(int(rng.paretovariate(1.2)) - 1, len(INGREDIENTS) - 1)] for _ in range(count)}
+    names |= {rng.choice(INGREDIENTS) for _ in range(rng.randint(0, 2))}
+    return CatalogRecipe(
+        id=recipe_id,
+        name=f"Recipe {recipe_id}",
+        description='',
+        ingredients=', '.join(f"{name} ({rng.randint(1, 4)} tsp)" for name in sorted(names)),
+        category=None,
+        difficulty=rng.choice(DIFFICULTIES),
+        prep_time=10,
+        cook_time=20,
+        cuisine_type=rng.choice(CUISINES),
+        tags=tuple(sorted(rng.sample(TAGS, rng.randint(0, 2)))),
+    )
+
+
+def brute_force(matrix, k):
+    """Top-k (ids, scores) of every row from the full cosine matrix of `matrix`."""
+    n = len(matrix)
+    dense = np.zeros((n, matrix.feature_count))
+    rows = np.repeat(np.arange(n), np.diff(matrix.indptr))
+    dense[rows, matrix.indices] = matrix.data
+    cosines = dense @ dense.T
+    np.fill_diagonal(cosines, 0)
+    lists = []
+    for row in range(n):
+        others = np.flatnonzero(cosines[row] > 1e-12)
+        order = np.lexsort((matrix.ids[others], -cosines[row, others]))[:k]
+        lists.append((matrix.ids[others[order]], cosines[row, others[order]]))
+    return lists
+
+
+def mismatches(index):
+    """Rows whose stored neighbours differ from the brute-force ones (ties may swap ids)."""
+    matrix = index._matrix
+    _, neighbor_ids, neighbor_scores = index._state
+    bad = []
+    for row, (expected_ids, expected_scores) in enumerate(brute_force(matrix, index.k)):
+        found = neighbor_ids[row] >= 0
+        ids, scores = neighbor_ids[row][found], neighbor_scores[row][found].astype(np.float64)
+        if len(ids) != len(expected_ids) or not np.allclose(scores, expected_scores, atol=SCORE_TOLERANCE):
+            bad.append(int(matrix.ids[row]))
+            continue
+        # Outside ties at the k-th score the ids must match exactly
+        if len(expected_scores):
+            clear = expected_scores > expected_scores[-1] + SCORE_TOLERANCE
+            if set(ids[clear]) != set(expected_ids[clear]):
+                bad.append(int(matrix.ids[row]))
+    return bad
+
+
+def wait_for(index, version, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while index.version != version:
+        if time.monotonic() > deadline:
+            raise RuntimeError("similarity update did not finish")
+        time.sleep(0.05)
+
+
+def check(recipes=3000, seed=7):
+    rng = random.Random(seed)
+    catalog = [synthetic_recipe(rng, recipe_id) for recipe_id in range(1, recipes + 1)]
+    index = SimilarityIndex()
+
+    started = time.perf_counter()
+    index.update(CatalogSnapshot(1, catalog))
+    print(f"Built neighbours of {recipes} recipes in {time.perf_counter() - started:.1f}s")
+    bad = mismatches(index)
+    print(f"{'✓' if not bad else '✗'} Full build: {len(bad)} mismatched lists")
+
+    # Change, add and remove a few recipes, under the patch threshold
+    changes = max(1, int(recipes * index.rebuild_share / 3))
+    for position in rng.sample(range(len(catalog)), changes):
+        catalog[position] = synthetic_recipe(rng, catalog[position].id)
+    removed = set(rng.sample([recipe.id for recipe in catalog], changes))
+    catalog = [recipe for recipe in catalog if recipe.id not in removed]
+    catalog += [synthetic_recipe(rng, recipes + i) for i in range(1, changes + 1)]
+    index.update(CatalogSnapshot(2, catalog))
+    wait_for(index, 2)
+    patched = mismatches(index)
+    print(f"{'✓' if not patched else '✗'} Patched ({changes} changed, removed and added): "
+          f"{len(patched)} mismatched lists (builds={index.builds}, updates={index.updates})")
+
+    if bad or patched:
+        print(f"First mismatched recipe ids: {(bad + patched)[:10]}")
+    return not bad and not patched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--recipes', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    sys.exit(0 if check(args.recipes, args.seed) else 1)
@@ -0,0 +1,427 @@
+"""
+MySQL connection pool shared by server.py and app.py.
+
+The pool keeps up to DB_POOL_SIZE connections open and opens up to
+DB_POOL_MAX_OVERFLOW more under load. Overflow connections are closed when
+they come back. When every connection is in use, `get_connection()` waits up
+to DB_POOL_TIMEOUT seconds for one to be returned and then raises PoolTimeout.
+Before this pool, the route failed at once.
+
+The pool checks each connection on checkout:
+- A connection older than DB_POOL_RECYCLE seconds is replaced. This keeps
+  ahead of MySQL's wait_timeout and any proxy idle limits.
+- A connection idle for longer than DB_POOL_PRE_PING seconds is pinged first.
+
+Connections are handed out wrapped in a PooledConnection. Its `close()`
+returns the connection to the pool, so route code stays unchanged.
+
+A forked gunicorn worker must not share the parent's sockets. The pool
+empties itself in the child through os.register_at_fork. `reset()` does the
+same on demand, for a post_fork hook.
+
+DB_REPLICA_HOSTS (e.g. "replica1:3306,replica2") turns on read/write
+splitting. A ReplicaRouter sends writes to the primary pool. It spreads reads
+over one pool per replica, round-robin or to the least busy one
+(DB_REPLICA_STRATEGY). A replica that fails to connect is skipped for
+DB_REPLICA_RETRY seconds. With no replica available, reads use the primary.
+
+Replica reads are eventually consistent. The response cache and ETags are
+keyed by data_versions as read on the primary, so a lagging replica's rows
+could be stored under a version they do not reflect yet. To prevent that,
+the router re-reads data_versions on each replica at most every
+DB_REPLICA_VERSION_CHECK seconds. A response read from a replica that has
+not been seen at the primary's versions is served but not cached or
+ETagged. The cost is up to DB_REPLICA_VERSION_CHECK seconds of uncached
+replica reads after each write.
+"""
+
+import itertools
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+import mysql.connector
+
+# Use environment variables for production (Render), fallback to local defaults
+DB_CONFIG = {
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "user": os.environ.get("DB_USER", "root"),
+    "password": os.environ.get("DB_PASSWORD", ""),  # Required: Set via environment variable
+    "database": os.environ.get("DB_NAME", "recipe_finder"),
+    "port": int(os.environ.get("DB_PORT", 3306))
+}
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 5))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5.0))
+DB_POOL_RECYCLE = float(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = float(os.environ.get('DB_POOL_PRE_PING', 30))
+
+DB_REPLICA_HOSTS = os.environ.get('DB_REPLICA_HOSTS', '')
+DB_REPLICA_STRATEGY = os.environ.get('DB_REPLICA_STRATEGY', 'round_robin')
+DB_REPLICA_RETRY = float(os.environ.get('DB_REPLICA_RETRY', 30))
+# A busy replica hands the read to the next one (or the primary) after this long
+DB_REPLICA_TIMEOUT = float(os.environ.get('DB_REPLICA_TIMEOUT', 0.5))
+# Seconds between reads of data_versions on each replica
+DB_REPLICA_VERSION_CHECK = float(os.environ.get('DB_REPLICA_VERSION_CHECK', 2))
+
+# Upper bounds (ms) of the checkout wait histogram; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolTimeout(Exception):
+    """No connection became free before the checkout deadline."""
+
+
+class PooledConnection:
+    """A checked-out connection; `close()` hands it back to its pool."""
+
+    __slots__ = ('_pool', '_entry')
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        entry = self._entry
+        if entry is None:
+            raise AttributeError(f"connection already returned to the pool: {name}")
+        return getattr(entry.connection, name)
+
+    def close(self):
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool._release(entry)
+
+    def invalidate(self):
+        """Close the underlying connection instead of returning it (e.g. after a fatal error)."""
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool._discard(entry)
+
+
+class _Entry:
+    __slots__ = ('connection', 'generation', 'created_at', 'returned_at')
+
+    def __init__(self, connection, generation):
+        self.connection = connection
+        self.generation = generation
+        self.created_at = self.returned_at = time.monotonic()
+
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections with blocking checkout and recycling."""
+
+    def __init__(self, config, size=DB_POOL_SIZE, max_overflow=DB_POOL_MAX_OVERFLOW,
+                 timeout=DB_POOL_TIMEOUT, recycle=DB_POOL_RECYCLE, pre_ping=DB_POOL_PRE_PING):
+        self.config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._generation = 0
+        self.reset()
+        os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        """Forget every connection and counter, as after a fork.
+
+        Inherited connections are dropped without being closed. Closing would
+        send COM_QUIT on a socket the parent process still uses. Connections
+        checked out before the reset are ignored when they come back.
+        """
+        # A lock held by another thread at fork time would never be released
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._generation += 1
+        self._idle = deque()
+        self._total = 0
+        self._in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.invalidated = 0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    @property
+    def in_use(self):
+        return self._in_use
+
+    def get_connection(self, timeout=None):
+        """Check a connection out, waiting up to `timeout` seconds for a free one."""
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        entry = None
+        generation = self._generation
+        with self._available:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._total < self.size + self.max_overflow:
+                    # Reserve the slot; the connection is opened outside the lock
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    self._record_wait(started)
+                    raise PoolTimeout(
+                        f"no database connection free after {self.timeout:g}s "
+                        f"({self._in_use} in use)"
+                    )
+                self._available.wait(remaining)
+            self._in_use += 1
+            self.checkouts += 1
+            self._record_wait(started)
+
+        try:
+            entry = self._checked(entry) if entry is not None else self._open()
+        except Exception:
+            with self._available:
+                if generation == self._generation:
+                    self._in_use -= 1
+                    self._total -= 1
+                    self._available.notify()
+            raise
+        return PooledConnection(self, entry)
+
+    def warm(self, count=None):
+        """Open connections until `count` (default: the pool size) are idle."""
+        count = min(self.size if count is None else count, self.size)
+        connections = []
+        try:
+            while len(self._idle) + len(connections) < count:
+                connections.append(self.get_connection())
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def dispose(self):
+        """Close the idle connections, e.g. in a preloading master before it forks."""
+        with self._available:
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+        for entry in idle:
+            self._close_quietly(entry.connection)
+
+    def _checked(self, entry):
+        """Return `entry` if still usable, otherwise a freshly opened replacement."""
+        now = time.monotonic()
+        if now - entry.created_at >= self.recycle:
+            self.recycled += 1
+            self._close_quietly(entry.connection)
+            return self._open()
+        if now - entry.returned_at >= self.pre_ping and not entry.connection.is_connected():
+            self.invalidated += 1
+            self._close_quietly(entry.connection)
+            return self._open()
+        return entry
+
+    def _open(self):
+        entry = _Entry(mysql.connector.connect(**self.config), self._generation)
+        self.created += 1
+        return entry
+
+    def _release(self, entry):
+        if entry.generation != self._generation:
+            return
+        try:
+            # End the read snapshot and any unfinished work before reuse
+            if entry.connection.in_transaction:
+                entry.connection.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+
+        entry.returned_at = time.monotonic()
+        with self._available:
+            self._in_use -= 1
+            if len(self._idle) < self.size:
+                self._idle.append(entry)
+                entry = None
+            else:
+                self._total -= 1
+            self._available.notify()
+        if entry is not None:
+            self._close_quietly(entry.connection)
+
+    def _discard(self, entry):
+        if entry.generation != self._generation:
+            return
+        self.invalidated += 1
+        self._close_quietly(entry.connection)
+        with self._available:
+            self._in_use -= 1
+            self._total -= 1
+            self._available.notify()
+
+    def _record_wait(self, started):
+        waited_ms = (time.monotonic() - started) * 1000
+        self.wait_histogram[bisect_left(WAIT_BUCKETS_MS, waited_ms)] += 1
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        labels = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + [f"gt_{WAIT_BUCKETS_MS[-1]}ms"]
+        return {
+            "size": self.size,
+            "max_overflow": self.max_overflow,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "open": self._total,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "created": self.created,
+            "recycled": self.recycled,
+            "invalidated": self.invalidated,
+            "wait_ms": dict(zip(labels, self.wait_histogram)),
+        }
+
+
+def replica_configs(hosts=DB_REPLICA_HOSTS, base=DB_CONFIG):
+    """Connection settings for each "host[:port]" in a comma-separated list."""
+    configs = []
+    for address in hosts.split(','):
+        address = address.strip()
+        if not address:
+            continue
+        host, _, port = address.partition(':')
+        configs.append({**base, "host": host, "port": int(port) if port else base["port"]})
+    return configs
+
+
+class ReplicaVersions:
+    """data_versions as last read on each replica, to tell whether a replica has caught up."""
+
+    def __init__(self, count, interval=DB_REPLICA_VERSION_CHECK):
+        self.interval = interval
+        self._versions = [None] * count
+        self._checked_at = [0.0] * count
+        self._lock = threading.Lock()
+
+    def claim(self, i):
+        """Whether replica `i` is due for a version read; only one caller gets True per interval."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at[i] < self.interval:
+                return False
+            self._checked_at[i] = now
+            return True
+
+    def update(self, i, rows):
+        self._versions[i] = dict(rows)
+
+    def behind(self, i, scopes, versions):
+        """Whether replica `i` may not reflect `versions` of `scopes` yet (versions only grow)."""
+        seen = self._versions[i]
+        if seen is None:
+            return True
+        return any(seen.get(scope, 0) < version for scope, version in zip(scopes, versions))
+
+
+class ReplicaRouter:
+    """Sends writes to the primary pool and spreads reads over replica pools."""
+
+    STRATEGIES = ('round_robin', 'least_busy')
+
+    def __init__(self, primary, replicas=(), strategy=DB_REPLICA_STRATEGY,
+                 retry_after=DB_REPLICA_RETRY, replica_timeout=DB_REPLICA_TIMEOUT):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.retry_after = retry_after
+        self.replica_timeout = replica_timeout
+        self._down_until = [0.0] * len(self.replicas)
+        self._turn = itertools.count()
+        self._local = threading.local()
+        self.replica_versions = ReplicaVersions(len(self.replicas))
+        self.replica_reads = [0] * len(self.replicas)
+        self.primary_reads = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls, primary):
+        return cls(primary, [ConnectionPool(config) for config in replica_configs()])
+
+    @property
+    def pools(self):
+        return [self.primary, *self.replicas]
+
+    def write_connection(self):
+        return self.primary.get_connection()
+
+    def read_connection(self, primary=False):
+        """A replica connection, or a primary one when asked or when no replica answers."""
+        if not primary and self.replicas:
+            for i in self._read_order():
+                try:
+                    connection = self.replicas[i].get_connection(timeout=self.replica_timeout)
+                except PoolTimeout:
+                    continue
+                except Exception as e:
+                    self._down_until[i] = time.monotonic() + self.retry_after
+                    print(f"❌ Replica {self.replicas[i].config['host']} unavailable, "
+                          f"skipping it for {self.retry_after:g}s: {e}")
+                    continue
+                self.replica_reads[i] += 1
+                if self.replica_versions.claim(i):
+                    self._read_versions(i, connection)
+                self._local.replica = i
+                return connection
+            self.fallbacks += 1
+        self.primary_reads += 1
+        self._local.replica = None
+        return self.primary.get_connection()
+
+    def last_replica(self):
+        """Index of the replica behind this thread's last read_connection(), or None for the primary."""
+        return getattr(self._local, 'replica', None)
+
+    def _read_versions(self, i, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT scope, version FROM data_versions")
+            self.replica_versions.update(i, cursor.fetchall())
+            cursor.close()
+        except Exception as e:
+            print(f"❌ Failed to read data_versions on replica {self.replicas[i].config['host']}: {e}")
+
+    def _read_order(self):
+        now = time.monotonic()
+        healthy = [i for i, until in enumerate(self._down_until) if until <= now]
+        if self.strategy == 'least_busy':
+            return sorted(healthy, key=lambda i: self.replicas[i].in_use)
+        if not healthy:
+            return healthy
+        start = next(self._turn) % len(healthy)
+        return healthy[start:] + healthy[:start]
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+            "replicas": [
+                {
+                    "host": pool.config["host"],
+                    "port": pool.config["port"],
+                    "up": self._down_until[i] <= now,
+                    "reads": self.replica_reads[i],
+                    "pool": pool.stats(),
+                }
+                for i, pool in enumerate(self.replicas)
+            ],
+        }
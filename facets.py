@@ -0,0 +1,224 @@
+"""
+Facet counts for /search, computed from the catalog snapshot.
+
+Each facet keeps one value code per recipe position (category, difficulty,
+cuisine_type), the total time of each recipe, or a recipe -> tag CSR list for
+tags. A result set is a boolean mask over the same positions. Counting a
+facet is one bincount of the codes under the mask, with no GROUP BY and no
+round trip.
+
+Facets are disjunctive. The counts for a facet leave out that facet's own
+filter, so with category=Dessert the category counts still show what the
+other categories would return.
+
+The same arrays answer the /search filters. Tags are also kept grouped by
+tag (tag -> positions), so a tag filter is a few slice copies into one mask:
+"any" sets the union, "all" keeps positions hit by every tag and "none" is
+the complement of "any". Combining filters is an AND of masks.
+"""
+
+import os
+
+import numpy as np
+
+# Upper bounds (minutes) of the cumulative total-time buckets, matching the time filter
+TIME_BUCKETS = (30, 45, 60, 90)
+FACET_TOP_TAGS = int(os.environ.get('FACET_TOP_TAGS', 20))
+
+VALUE_FACETS = ('category', 'difficulty', 'cuisine_type')
+
+TAG_MODES = ('any', 'all', 'none')
+
+
+class FacetIndex:
+    """Per-position facet codes for the recipes of one catalog snapshot."""
+
+    def __init__(self, top_tags=FACET_TOP_TAGS):
+        self.top_tags = top_tags
+        self.version = None
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.values = {}
+        self.lookup = {}
+        self.codes = {}
+        self.total_time = np.zeros(0)
+        self.tag_rows = np.zeros(0, dtype=np.int64)
+        self.tag_codes = np.zeros(0, dtype=np.int64)
+        self.tag_ptr = np.zeros(1, dtype=np.int64)
+        self.tag_positions = np.zeros(0, dtype=np.int64)
+
+    def rebuild(self, snapshot):
+        """Rebuild from a catalog snapshot and swap the new index in atomically."""
+        recipes = snapshot.recipes
+        values, lookup, codes = {}, {}, {}
+        for facet in VALUE_FACETS:
+            labels, index, column = [], {}, []
+            for recipe in recipes:
+                value = getattr(recipe, facet)
+                if not value:
+                    column.append(-1)
+                    continue
+                key = value.lower()
+                if key not in index:
+                    index[key] = len(labels)
+                    labels.append(value)
+                column.append(index[key])
+            values[facet], lookup[facet], codes[facet] = labels, index, np.array(column, dtype=np.int64)
+
+        tag_labels, tag_index, tag_rows, tag_codes = [], {}, [], []
+        for position, recipe in enumerate(recipes):
+            for key, tag in {tag.lower(): tag for tag in recipe.tags}.items():
+                if key not in tag_index:
+                    tag_index[key] = len(tag_labels)
+                    tag_labels.append(tag)
+                tag_rows.append(position)
+                tag_codes.append(tag_index[key])
+        values['tags'], lookup['tags'] = tag_labels, tag_index
+        tag_rows = np.array(tag_rows, dtype=np.int64)
+        tag_codes = np.array(tag_codes, dtype=np.int64)
+        # Rows are in position order, so each tag's positions come out sorted
+        by_tag = np.argsort(tag_codes, kind='stable')
+        tag_ptr = np.concatenate(([0], np.cumsum(np.bincount(tag_codes, minlength=len(tag_labels))))).astype(np.int64)
+
+        total_time = np.array([
+            recipe.prep_time + recipe.cook_time
+            if recipe.prep_time is not None and recipe.cook_time is not None else np.nan
+            for recipe in recipes
+        ], dtype=np.float64)
+
+        (self.doc_ids, self.values, self.lookup, self.codes, self.total_time, self.tag_rows,
+         self.tag_codes, self.tag_ptr, self.tag_positions, self.version) = (
+            np.array([recipe.id for recipe in recipes], dtype=np.int64),
+            values,
+            lookup,
+            codes,
+            total_time,
+            tag_rows,
+            tag_codes,
+            tag_ptr,
+            tag_rows[by_tag],
+            snapshot.version,
+        )
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def _positions(self, recipe_ids):
+        """Positions of the given recipes, and which of them the snapshot holds."""
+        doc_ids = self.doc_ids
+        if not isinstance(recipe_ids, np.ndarray):
+            recipe_ids = np.fromiter(recipe_ids, dtype=np.int64)
+        if not len(doc_ids):
+            return recipe_ids, np.zeros(len(recipe_ids), dtype=bool)
+        # Snapshots list recipes in id order
+        positions = np.minimum(np.searchsorted(doc_ids, recipe_ids), len(doc_ids) - 1)
+        return positions, doc_ids[positions] == recipe_ids
+
+    def mask_for(self, recipe_ids):
+        """Boolean mask over positions with the given recipes set."""
+        mask = self._none()
+        positions, found = self._positions(recipe_ids)
+        mask[positions[found]] = True
+        return mask
+
+    def contains(self, mask, recipe_ids):
+        """Boolean array: whether each of `recipe_ids` is set in `mask`."""
+        positions, found = self._positions(recipe_ids)
+        return found & mask[positions] if len(self.doc_ids) else found
+
+    def select(self, ranked, mask):
+        """The (recipe_id, score) pairs of `ranked` whose recipe is set in `mask` (all when None)."""
+        if mask is None:
+            return list(ranked)
+        keep = self.contains(mask, (recipe_id for recipe_id, _ in ranked))
+        return [pair for pair, kept in zip(ranked, keep.tolist()) if kept]
+
+    def ids(self, mask):
+        """Recipe ids set in `mask`, ascending."""
+        return self.doc_ids[mask]
+
+    def tag_mask(self, tags, mode='any'):
+        """Recipes having any, all or none of `tags` (case-insensitive)."""
+        if mode not in TAG_MODES:
+            raise ValueError(f"Unsupported tag_mode: {mode}")
+        codes = {self.lookup['tags'].get(tag.lower()) for tag in tags}
+        if mode == 'all' and None in codes:
+            return self._none()
+        slices = [self.tag_positions[self.tag_ptr[code]:self.tag_ptr[code + 1]] for code in codes if code is not None]
+        if mode == 'all':
+            if not slices:
+                return ~self._none()
+            return np.bincount(np.concatenate(slices), minlength=len(self.doc_ids)) == len(slices)
+        mask = self._none()
+        for positions in slices:
+            mask[positions] = True
+        return ~mask if mode == 'none' else mask
+
+    def filter_masks(self, category='', difficulty='', max_time='', tags=(), tag_mode='any'):
+        """Mask of each active /search filter, keyed by the facet it filters."""
+        masks = {}
+        for facet, value in (('category', category), ('difficulty', difficulty)):
+            if value:
+                code = self.lookup[facet].get(value.lower())
+                masks[facet] = self.codes[facet] == code if code is not None else self._none()
+        if max_time:
+            with np.errstate(invalid='ignore'):
+                masks['total_time'] = self.total_time <= int(max_time)
+        if tags:
+            masks['tags'] = self.tag_mask(tags, tag_mode)
+        return masks
+
+    @staticmethod
+    def combine(masks):
+        """AND of filter masks, or None when no filter is active."""
+        combined = None
+        for mask in masks.values():
+            combined = mask if combined is None else combined & mask
+        return combined
+
+    def _none(self):
+        return np.zeros(len(self.doc_ids), dtype=bool)
+
+    def counts(self, base=None, filters=None):
+        """Facet counts for the recipes in `base` (all when None) that pass `filters`.
+
+        Returns {"category": {label: count}, "difficulty": ..., "cuisine_type": ...,
+        "total_time": {"30": count, ...}, "tags": {label: count}} with zero counts left out.
+        """
+        filters = filters or {}
+        if base is None:
+            base = np.ones(len(self.total_time), dtype=bool)
+
+        def scope(facet):
+            mask = base
+            for other, other_mask in filters.items():
+                if other != facet:
+                    mask = mask & other_mask
+            return mask
+
+        facets = {}
+        for facet in VALUE_FACETS:
+            codes = self.codes[facet][scope(facet)]
+            counts = np.bincount(codes[codes >= 0], minlength=len(self.values[facet]))
+            labels = self.values[facet]
+            facets[facet] = {
+                labels[code]: int(counts[code])
+                for code in np.argsort(-counts, kind='stable').tolist() if counts[code]
+            }
+
+        times = self.total_time[scope('total_time')]
+        with np.errstate(invalid='ignore'):
+            facets['total_time'] = {str(bound): int(np.count_nonzero(times <= bound)) for bound in TIME_BUCKETS}
+
+        tag_counts = np.bincount(self.tag_codes[scope('tags')[self.tag_rows]], minlength=len(self.values['tags']))
+        top = np.argsort(-tag_counts, kind='stable')[:self.top_tags].tolist()
+        facets['tags'] = {self.values['tags'][code]: int(tag_counts[code]) for code in top if tag_counts[code]}
+        return facets
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "recipes": len(self.doc_ids),
+            "values": {facet: len(labels) for facet, labels in self.values.items()},
+            "tag_postings": len(self.tag_positions),
+        }
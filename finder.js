@@ -2,6 +2,9 @@
 class RecipeFinder {
     constructor() {
         this.recipes = [];
+        this.nextCursor = null;
+        this.resultsTotal = 0;
+        this.listParams = new URLSearchParams();
         this.categories = [];
         this.tags = [];
         this.currentView = 'grid';
@@ -11,7 +14,7 @@ class RecipeFinder {
             category: '',
             difficulty: '',
             max_time: '',
-            sort: 'name'
+            sort: ''
         };
         this.sessionId = this.generateSessionId();
 
@@ -25,7 +28,6 @@ class RecipeFinder {
     init() {
         this.bindEvents();
         this.loadInitialData();
-        this.updateStats();
     }
 
     bindEvents() {
@@ -37,6 +39,7 @@ class RecipeFinder {
 
         // Show all recipes
         document.getElementById('showAllButton').addEventListener('click', () => this.showAllRecipes());
+        document.getElementById('loadMoreButton').addEventListener('click', () => this.loadMoreRecipes());
 
         // Filter changes
         document.getElementById('categoryFilter').addEventListener('change', () => this.applyFilters());
@@ -82,6 +85,14 @@ class RecipeFinder {
     }
 
     async loadInitialData() {
+        try {
+            this.applyBootstrap(await this.fetchAPI('/bootstrap'));
+            return;
+        } catch (error) {
+            // Servers without /bootstrap (app.py) fall back to the individual calls
+            console.error('Bootstrap failed, loading sections separately:', error);
+        }
+
         try {
             await Promise.all([
                 this.loadCategories(),
@@ -89,7 +100,8 @@ class RecipeFinder {
                 this.loadPopularRecipes(),
                 this.loadQuickMeals(),
                 this.loadTags(),
-                this.loadFeaturedRecipes()
+                this.loadFeaturedRecipes(),
+                this.updateStats()
             ]);
         } catch (error) {
             console.error('Error loading initial data:', error);
@@ -116,27 +128,83 @@ class RecipeFinder {
         }
     }
 
+    // List routes return {recipes, next_cursor, total}; the alternative app.py server still sends a bare array
+    readPage(data) {
+        if (Array.isArray(data)) {
+            return { recipes: data, next_cursor: null, total: data.length };
+        }
+        return data;
+    }
+
+    async loadRecipePage(params, append = false) {
+        // Cards only need the card fields; full text comes from /recipe/<id>
+        const query = new URLSearchParams(params);
+        query.set('view', 'card');
+        if (append && this.nextCursor) query.set('cursor', this.nextCursor);
+
+        const data = await this.fetchAPI(`/search?${query.toString()}`);
+        const page = this.readPage(data);
+        if (Array.isArray(data)) page.recipes = this.sortRecipes(page.recipes, query.get('sort'));
+        this.showRecipePage(page, append);
+    }
+
+    showRecipePage(page, append = false) {
+        const recipes = page.recipes;
+        this.recipes = append ? this.recipes.concat(recipes) : recipes;
+        this.nextCursor = page.next_cursor;
+        if (!append) this.resultsTotal = page.total ?? recipes.length;
+
+        this.displayRecipes(recipes, 'results', append);
+        this.updateResultsCount(this.resultsTotal);
+        document.getElementById('loadMoreButton').style.display = this.nextCursor ? '' : 'none';
+    }
+
+    // Sections in /bootstrap list recipe ids; each card is sent once under `recipes`
+    applyBootstrap(data) {
+        const cards = ids => ids.map(id => data.recipes[id]);
+
+        this.listParams = new URLSearchParams();
+        this.showRecipePage({ ...data.all, recipes: cards(data.all.ids) });
+        this.displayRecipes(cards(data.popular), 'popularResults');
+        this.displayRecipes(cards(data.quick_meals), 'quickMealsResults');
+        console.log('Featured recipes loaded:', cards(data.featured));
+        this.tags = data.tags;
+        this.showCategories(data.categories);
+        this.showStats(data.stats);
+    }
+
     async loadAllRecipes() {
         try {
-            this.recipes = await this.fetchAPI('/search');
-            this.displayRecipes(this.recipes, 'results');
-            this.updateResultsCount(this.recipes.length);
+            this.listParams = new URLSearchParams();
+            await this.loadRecipePage(this.listParams);
         } catch (error) {
             this.showError('Failed to load recipes');
         }
     }
 
+    async loadMoreRecipes() {
+        if (!this.nextCursor) return;
+        try {
+            await this.loadRecipePage(this.listParams, true);
+        } catch (error) {
+            this.showError('Failed to load more recipes');
+        }
+    }
+
     async loadCategories() {
         try {
-            const categoriesData = await this.fetchAPI('/categories');
-            this.categories = categoriesData;
-            this.populateCategoryFilters();
-            this.displayCategories();
+            this.showCategories(await this.fetchAPI('/categories'));
         } catch (error) {
             this.showError('Failed to load categories');
         }
     }
 
+    showCategories(categories) {
+        this.categories = categories;
+        this.populateCategoryFilters();
+        this.displayCategories();
+    }
+
     async loadTags() {
         try {
             this.tags = await this.fetchAPI('/tags');
@@ -147,7 +215,7 @@ class RecipeFinder {
 
     async loadPopularRecipes() {
         try {
-            const recipes = await this.fetchAPI('/popular');
+            const recipes = await this.fetchAPI('/popular?view=card');
             this.displayRecipes(recipes, 'popularResults');
         } catch (error) {
             document.getElementById('popularResults').innerHTML = 
@@ -157,7 +225,7 @@ class RecipeFinder {
 
     async loadQuickMeals() {
         try {
-            const recipes = await this.fetchAPI('/quick-meals');
+            const recipes = await this.fetchAPI('/quick-meals?view=card');
             this.displayRecipes(recipes, 'quickMealsResults');
         } catch (error) {
             document.getElementById('quickMealsResults').innerHTML = 
@@ -167,7 +235,7 @@ class RecipeFinder {
 
     async loadFeaturedRecipes() {
         try {
-            const recipes = await this.fetchAPI('/featured');
+            const recipes = await this.fetchAPI('/featured?view=card');
             // You can display featured recipes in a special section if needed
             console.log('Featured recipes loaded:', recipes);
         } catch (error) {
@@ -233,27 +301,31 @@ class RecipeFinder {
         });
     }
 
-    displayRecipes(recipes, containerId) {
+    displayRecipes(recipes, containerId, append = false) {
         const container = document.getElementById(containerId);
         
-        if (!recipes || recipes.length === 0) {
+        if (!append && (!recipes || recipes.length === 0)) {
             container.innerHTML = '<div class="no-results">No recipes found</div>';
             return;
         }
 
-        container.innerHTML = recipes.map(recipe => this.createRecipeCard(recipe)).join('');
+        const template = document.createElement('div');
+        template.innerHTML = recipes.map(recipe => this.createRecipeCard(recipe)).join('');
+        const newCards = Array.from(template.children);
+
+        if (!append) container.innerHTML = '';
+        newCards.forEach(card => container.appendChild(card));
         
-        // Add click events to recipe cards
-        container.querySelectorAll('.recipe-card').forEach(card => {
+        // Add click events to the cards added by this call only
+        newCards.forEach(card => {
             card.addEventListener('click', () => this.showRecipeDetails(card.dataset.recipeId));
-        });
 
-        // Add click events to view recipe buttons
-        container.querySelectorAll('.view-recipe').forEach(btn => {
-            btn.addEventListener('click', (e) => {
-                e.stopPropagation();
-                const recipeId = e.target.closest('.recipe-card').dataset.recipeId;
-                this.showRecipeDetails(recipeId);
+            // Add click events to view recipe buttons
+            card.querySelectorAll('.view-recipe').forEach(btn => {
+                btn.addEventListener('click', (e) => {
+                    e.stopPropagation();
+                    this.showRecipeDetails(card.dataset.recipeId);
+                });
             });
         });
     }
@@ -330,19 +402,19 @@ class RecipeFinder {
             if (category) params.append('category', category);
             if (difficulty) params.append('difficulty', difficulty);
             if (max_time) params.append('max_time', max_time);
+            // Relevance (empty) leaves the order to the server: best match for text searches, name otherwise
+            if (sort) params.append('sort', sort);
 
-            const recipes = await this.fetchAPI(`/search?${params.toString()}`);
-            
-            // Apply sorting
-            const sortedRecipes = this.sortRecipes(recipes, sort);
-            this.displayRecipes(sortedRecipes, 'results');
-            this.updateResultsCount(sortedRecipes.length);
+            this.listParams = params;
+            await this.loadRecipePage(params);
         } catch (error) {
             this.showError('Failed to apply filters');
         }
     }
 
     sortRecipes(recipes, sortBy) {
+        // Relevance keeps the server's order
+        if (!sortBy) return recipes;
         return [...recipes].sort((a, b) => {
             switch (sortBy) {
                 case 'time':
@@ -369,14 +441,14 @@ class RecipeFinder {
         document.getElementById('categoryFilter').value = '';
         document.getElementById('difficultyFilter').value = '';
         document.getElementById('timeFilter').value = '';
-        document.getElementById('sortFilter').value = 'name';
+        document.getElementById('sortFilter').value = '';
         
         this.currentFilters = {
             query: '',
             category: '',
             difficulty: '',
             max_time: '',
-            sort: 'name'
+            sort: ''
         };
 
         this.loadAllRecipes();
@@ -693,21 +765,23 @@ class RecipeFinder {
 
     async updateStats() {
         try {
-            const stats = await this.fetchAPI('/stats');
-            
-            document.getElementById('recipeCount').textContent = `${stats.total_recipes} Recipes`;
-            document.getElementById('categoryCount').textContent = `${stats.total_categories} Categories`;
-            document.getElementById('totalRecipes').textContent = `${stats.total_recipes} Recipes Available`;
-            
-            // Update API status
-            document.getElementById('apiStatus').className = 'status-online';
-            document.getElementById('apiStatus').textContent = '● API Online';
+            this.showStats(await this.fetchAPI('/stats'));
         } catch (error) {
             document.getElementById('apiStatus').className = 'status-offline';
             document.getElementById('apiStatus').textContent = '● API Offline';
         }
     }
 
+    showStats(stats) {
+        document.getElementById('recipeCount').textContent = `${stats.total_recipes} Recipes`;
+        document.getElementById('categoryCount').textContent = `${stats.total_categories} Categories`;
+        document.getElementById('totalRecipes').textContent = `${stats.total_recipes} Recipes Available`;
+        
+        // Update API status
+        document.getElementById('apiStatus').className = 'status-online';
+        document.getElementById('apiStatus').textContent = '● API Online';
+    }
+
     showError(message) {
         // Create a temporary error notification
         const errorDiv = document.createElement('div');
@@ -0,0 +1,166 @@
+"""
+Typo-tolerant query correction for /search.
+
+The vocabulary is every word of the catalog's recipe names, tags and
+ingredients. Each word is split into character trigrams with boundary
+markers: "paneer" gives "$pa", "pan", "ane", "nee", "eer", "er$". The
+trigram -> word postings are stored CSR-style in two NumPy arrays.
+
+To correct an unknown query word:
+1. Gather the postings of its trigrams and count shared trigrams per word
+   with one bincount.
+2. Keep words of a compatible length, and of those the FUZZY_CANDIDATES that
+   share the most trigrams.
+3. Verify each candidate with an edit distance that counts a transposition
+   as one edit and stops as soon as the bound is exceeded.
+The closest word wins, and the more common one among equals. "biriyani"
+becomes "biryani", "paner" becomes "paneer" and "bature" becomes "bhature".
+"""
+
+import os
+
+import numpy as np
+
+from search_index import tokenize
+
+# Below this many exact matches /search also runs the corrected query
+FUZZY_MIN_RESULTS = int(os.environ.get('FUZZY_MIN_RESULTS', 5))
+FUZZY_CANDIDATES = int(os.environ.get('FUZZY_CANDIDATES', 64))
+# Weight of a corrected-query match relative to an exact one
+FUZZY_SCORE_WEIGHT = float(os.environ.get('FUZZY_SCORE_WEIGHT', 0.5))
+
+# Words shorter than this are never corrected
+MIN_WORD_LENGTH = 3
+
+
+def max_edits(word):
+    """Edits allowed for a word: one up to five letters, two beyond."""
+    return 1 if len(word) <= 5 else 2
+
+
+def trigrams(word):
+    padded = f'${word}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Edit distance (insert, delete, substitute, swap neighbours) or limit + 1 once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class FuzzyIndex:
+    """Trigram index over the words of recipe names, tags and ingredients."""
+
+    def __init__(self, candidates=FUZZY_CANDIDATES):
+        self.candidates = candidates
+        self.version = None
+        self.words = []
+        self.word_ids = {}
+        self.frequency = np.zeros(0, dtype=np.int32)
+        self.lengths = np.zeros(0, dtype=np.int16)
+        self.grams = {}
+        self.gram_ptr = np.zeros(1, dtype=np.int64)
+        self.gram_words = np.zeros(0, dtype=np.int32)
+
+    def rebuild(self, snapshot):
+        """Rebuild from a catalog snapshot and swap the new index in atomically."""
+        frequency = {}
+        for recipe in snapshot.recipes:
+            words = set(tokenize(recipe.name))
+            words.update(tokenize(' '.join(recipe.tags)))
+            words.update(tokenize(recipe.ingredients))
+            for word in words:
+                if len(word) >= MIN_WORD_LENGTH and word.isalpha():
+                    frequency[word] = frequency.get(word, 0) + 1
+
+        words = sorted(frequency)
+        postings = {}
+        for word_id, word in enumerate(words):
+            for gram in trigrams(word):
+                postings.setdefault(gram, []).append(word_id)
+        grams = sorted(postings)
+
+        (self.words, self.word_ids, self.frequency, self.lengths, self.grams, self.gram_ptr,
+         self.gram_words, self.version) = (
+            words,
+            {word: word_id for word_id, word in enumerate(words)},
+            np.array([frequency[word] for word in words], dtype=np.int32),
+            np.array([len(word) for word in words], dtype=np.int16),
+            {gram: i for i, gram in enumerate(grams)},
+            np.concatenate(([0], np.cumsum([len(postings[gram]) for gram in grams]))).astype(np.int64),
+            np.array([word_id for gram in grams for word_id in postings[gram]], dtype=np.int32),
+            snapshot.version,
+        )
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def closest(self, word):
+        """The known word nearest to `word` within max_edits(word), or None."""
+        limit = max_edits(word)
+        slices = [
+            self.gram_words[self.gram_ptr[i]:self.gram_ptr[i + 1]]
+            for i in (self.grams.get(gram) for gram in trigrams(word)) if i is not None
+        ]
+        if not slices:
+            return None
+        shared = np.bincount(np.concatenate(slices), minlength=len(self.words))
+        shared[np.abs(self.lengths.astype(np.int64) - len(word)) > limit] = 0
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > self.candidates:
+            candidates = candidates[np.argpartition(-shared[candidates], self.candidates)[:self.candidates]]
+
+        best = None
+        for word_id in candidates.tolist():
+            distance = edit_distance(word, self.words[word_id], limit)
+            if distance <= limit:
+                rank = (distance, -int(self.frequency[word_id]), self.words[word_id])
+                if best is None or rank < best:
+                    best = rank
+        return best[2] if best else None
+
+    def correct(self, query, known=None):
+        """`query` with its unknown words replaced by their closest known word, or None if nothing changed.
+
+        `known(word)` may accept words beyond this index's vocabulary (e.g. any
+        term the full-text index holds).
+        """
+        words = tokenize(query)
+        corrected = []
+        changed = False
+        for word in words:
+            if (len(word) < MIN_WORD_LENGTH or not word.isalpha() or word in self.word_ids
+                    or (known is not None and known(word))):
+                corrected.append(word)
+                continue
+            replacement = self.closest(word)
+            if replacement is not None and replacement != word:
+                corrected.append(replacement)
+                changed = True
+            else:
+                corrected.append(word)
+        return ' '.join(corrected) if changed else None
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "words": len(self.words),
+            "trigrams": len(self.grams),
+            "postings": len(self.gram_words),
+        }
@@ -0,0 +1,52 @@
+"""
+Gunicorn settings for server:app (`gunicorn -c gunicorn.conf.py`).
+
+The app is preloaded once in the master, so the catalog snapshot and search
+index are built once and shared copy-on-write by every worker. Database
+connections must not be shared that way. The master closes its idle
+connections before each fork, and every worker starts its pools from scratch
+in post_fork. A worker then warms its connections and response cache before
+it takes its first request. max_requests recycles workers gradually, with
+jitter so they do not all restart at once.
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = 'server:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+# Requests mostly wait on MySQL, so threads per worker raise throughput without more memory
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, multiprocessing.cpu_count())))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+preload_app = True
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = '-'
+
+
+def pre_fork(server, worker):
+    # Connections opened while preloading would otherwise be inherited by every worker
+    import server as app_module
+    for pool in app_module.db_router.pools:
+        pool.dispose()
+
+
+def post_fork(server, worker):
+    import server as app_module
+    for pool in app_module.db_router.pools:
+        pool.reset()
+
+
+def post_worker_init(worker):
+    # Runs after the app is loaded and before the worker accepts connections
+    import server as app_module
+    app_module.warm_up()
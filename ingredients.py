@@ -0,0 +1,165 @@
+"""
+Parsing of the free-text `ingredients` column.
+
+A recipe stores its ingredients as one comma-separated string. Each item is a
+name, optionally followed by a parenthesised quantity or note, and the note
+may itself contain commas:
+
+    "Toor dal (1 cup), Onion (1, chopped), Salt (to taste)"
+
+`parse_ingredients()` also reads the amount at the start of each note:
+"1 cup" is 1.0 cup, "500g" is 500.0 g, "1, chopped" is a count of 1 and
+"to taste" has no quantity.
+"""
+
+import re
+from collections import namedtuple
+
+_WORD = re.compile(r"[a-z]+")
+
+ParsedIngredient = namedtuple('ParsedIngredient', ['name', 'quantity', 'unit', 'note'])
+
+# Unit spellings -> canonical unit; an amount without a unit is a count
+UNITS = {
+    'g': 'g', 'gm': 'g', 'gms': 'g', 'gram': 'g', 'grams': 'g',
+    'kg': 'kg', 'kgs': 'kg', 'kilogram': 'kg', 'kilograms': 'kg',
+    'mg': 'mg',
+    'ml': 'ml', 'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml',
+    'l': 'l', 'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l',
+    'oz': 'oz', 'ounce': 'oz', 'ounces': 'oz',
+    'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'cup': 'cup', 'cups': 'cup',
+    'tbsp': 'tbsp', 'tbsps': 'tbsp', 'tablespoon': 'tbsp', 'tablespoons': 'tbsp',
+    'tsp': 'tsp', 'tsps': 'tsp', 'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'pinch': 'pinch', 'pinches': 'pinch',
+    'clove': 'clove', 'cloves': 'clove',
+    'inch': 'inch', 'inches': 'inch',
+    'slice': 'slice', 'slices': 'slice',
+    'leaf': 'leaf', 'leaves': 'leaf',
+    'sprig': 'sprig', 'sprigs': 'sprig',
+    'stalk': 'stalk', 'stalks': 'stalk',
+    'bunch': 'bunch', 'bunches': 'bunch',
+    'handful': 'handful', 'handfuls': 'handful',
+    'scoop': 'scoop', 'scoops': 'scoop',
+    'floret': 'floret', 'florets': 'floret',
+    'can': 'can', 'cans': 'can',
+    'packet': 'packet', 'packets': 'packet', 'pack': 'packet',
+    'piece': 'piece', 'pieces': 'piece', 'pcs': 'piece',
+}
+
+_FRACTIONS = {'½': 0.5, '¼': 0.25, '¾': 0.75, '⅓': 1 / 3, '⅔': 2 / 3, '⅛': 0.125}
+
+# "1", "1.5", "1 1/2", "1/2", "1½", "½" and ranges such as "2-3" (the lower bound is used)
+_AMOUNT = re.compile(
+    r"""^\s*(?:
+        (?P<whole>\d+(?:\.\d+)?)?\s*(?P<fraction>[½¼¾⅓⅔⅛])
+      | (?:(?P<mixed>\d+)\s+)?(?P<numerator>\d+)\s*/\s*(?P<denominator>\d+)
+      | (?P<number>\d+(?:\.\d+)?)(?!\s*/)
+    )
+    (?:\s*(?:-|to)\s*[\d.½¼¾⅓⅔⅛/]+)?
+    \s*(?P<unit>[a-z]+\b)?""",
+    re.VERBOSE | re.IGNORECASE,
+)
+
+# Words that describe preparation or state rather than the ingredient itself
+DESCRIPTORS = frozenset({
+    'a', 'an', 'and', 'as', 'boiled', 'chopped', 'cooked', 'cubed', 'diced', 'dried', 'finely',
+    'for', 'fresh', 'freshly', 'frying', 'garnish', 'grated', 'ground', 'large', 'medium',
+    'minced', 'of', 'optional', 'or', 'peeled', 'ripe', 'roughly', 'sliced', 'small', 'taste',
+    'the', 'to', 'whole',
+})
+
+
+def split_ingredients(text):
+    """Split an ingredients string into (name, note) pairs; the note is '' when absent."""
+    items = []
+    depth = 0
+    start = 0
+    text = text or ''
+    for i, char in enumerate(text):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(0, depth - 1)
+        elif char == ',' and depth == 0:
+            items.append(text[start:i])
+            start = i + 1
+    items.append(text[start:])
+
+    pairs = []
+    for item in items:
+        name, _, note = item.partition('(')
+        name = name.strip()
+        if name:
+            pairs.append((name, note.rsplit(')', 1)[0].strip()))
+    return pairs
+
+
+# Plurals the suffix rules in singular() get wrong
+IRREGULAR_PLURALS = {'halves': 'half', 'leaves': 'leaf', 'loaves': 'loaf'}
+
+
+def singular(word):
+    """Crude English singular, enough to match "tomatoes" with "tomato"."""
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word.endswith('ss'):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name):
+    """Lowercase ingredient name without descriptors, e.g. "Onions, chopped" -> "onion"."""
+    words = [singular(word) for word in _WORD.findall(name.lower()) if word not in DESCRIPTORS]
+    return ' '.join(words)
+
+
+def ingredient_names(text):
+    """Normalized name of every ingredient in an ingredients string, in order."""
+    names = []
+    for name, _ in split_ingredients(text):
+        name = normalize_name(name)
+        if name:
+            names.append(name)
+    return names
+
+
+def parse_amount(note):
+    """(quantity, unit) at the start of a note; (None, None) when it has no amount.
+
+    A number followed by a word that is not a known unit ("2 large") is a count.
+    """
+    match = _AMOUNT.match(note or '')
+    if not match:
+        return None, None
+    if match['fraction']:
+        quantity = float(match['whole'] or 0) + _FRACTIONS[match['fraction']]
+    elif match['numerator']:
+        denominator = int(match['denominator'])
+        if not denominator:
+            return None, None
+        quantity = int(match['mixed'] or 0) + int(match['numerator']) / denominator
+    else:
+        quantity = float(match['number'])
+    return quantity, UNITS.get((match['unit'] or '').lower())
+
+
+def parse_ingredients(text):
+    """ParsedIngredient for every ingredient in an ingredients string, in order.
+
+    "Chicken (500g), Yogurt (1 cup), Salt" ->
+    [("chicken", 500.0, "g", "500g"), ("yogurt", 1.0, "cup", "1 cup"), ("salt", None, None, "")]
+    """
+    parsed = []
+    for name, note in split_ingredients(text):
+        name = normalize_name(name)
+        if name:
+            quantity, unit = parse_amount(note)
+            parsed.append(ParsedIngredient(name, quantity, unit, note))
+    return parsed
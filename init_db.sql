@@ -50,15 +50,64 @@ CREATE TABLE IF NOT EXISTS recipe_views (
     INDEX view_date_index (viewed_at)
 );
 
--- Search history for recommendations
+-- Views per recipe per hour, rolled up from recipe_views by rollup_views.py
+CREATE TABLE IF NOT EXISTS recipe_view_buckets (
+    recipe_id INT NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    views INT NOT NULL,
+    PRIMARY KEY (recipe_id, bucket_start),
+    INDEX view_bucket_start_index (bucket_start)
+);
+
+-- Views older than the retention horizon, per recipe per day (prune_activity.py)
+CREATE TABLE IF NOT EXISTS recipe_view_daily (
+    recipe_id INT NOT NULL,
+    day DATE NOT NULL,
+    views INT NOT NULL,
+    PRIMARY KEY (recipe_id, day)
+);
+
+-- Top recipes per trending window by time-decayed views, rewritten on each rollup
+CREATE TABLE IF NOT EXISTS recipe_trending (
+    time_window VARCHAR(8) NOT NULL,
+    rank_pos INT NOT NULL,
+    recipe_id INT NOT NULL,
+    score DOUBLE NOT NULL,
+    PRIMARY KEY (time_window, rank_pos)
+);
+
+-- Search history for recommendations, one structured row per filtered search
+-- (databases created before these columns existed are upgraded by migrate_db.py)
 CREATE TABLE IF NOT EXISTS search_history (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    search_query VARCHAR(255),
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    normalized_query VARCHAR(255),
+    category VARCHAR(50),
+    difficulty VARCHAR(20),
+    max_time INT,
+    tags VARCHAR(500),
     session_id VARCHAR(100),
     results_count INT,
+    latency_ms INT,
     searched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    INDEX search_query_index (search_query),
-    INDEX search_date_index (searched_at)
+    INDEX search_date_index (searched_at),
+    INDEX search_query_date_index (normalized_query, searched_at),
+    INDEX search_category_date_index (category, searched_at)
+);
+
+-- Searches older than the retention horizon, per distinct search per day (prune_activity.py)
+CREATE TABLE IF NOT EXISTS search_history_daily (
+    day DATE NOT NULL,
+    search_key CHAR(32) NOT NULL,
+    normalized_query VARCHAR(255),
+    category VARCHAR(50),
+    difficulty VARCHAR(20),
+    max_time INT,
+    tags VARCHAR(500),
+    searches INT NOT NULL,
+    results_sum BIGINT NOT NULL,
+    latency_ms_sum BIGINT NOT NULL,
+    PRIMARY KEY (day, search_key),
+    INDEX search_daily_query_index (normalized_query, day)
 );
 
 -- Recipe tags for better categorization
@@ -84,6 +133,26 @@ CREATE TABLE IF NOT EXISTS recipe_nutrition (
     UNIQUE KEY unique_recipe_nutrition (recipe_id)
 );
 
+-- Denormalized rating/view counters, kept current by the API and rebuilt by rebuild_stats.py
+CREATE TABLE IF NOT EXISTS recipe_stats (
+    recipe_id INT PRIMARY KEY,
+    rating_sum INT NOT NULL DEFAULT 0,
+    rating_count INT NOT NULL DEFAULT 0,
+    view_count BIGINT NOT NULL DEFAULT 0,
+    last_viewed_at TIMESTAMP NULL,
+    FOREIGN KEY (recipe_id) REFERENCES recipes(id),
+    INDEX stats_view_count_index (view_count)
+);
+
+-- Change counters polled by the API to know when its in-memory copies are stale
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope VARCHAR(32) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO data_versions (scope) VALUES ('recipes'), ('ratings'), ('views'), ('trending');
+
 -- Insert sample recipes with enhanced data
 INSERT INTO recipes (name, description, ingredients, instructions, image_url, category, difficulty, prep_time, cook_time, servings, tags, cuisine_type, is_featured, is_quick_meal) VALUES 
 ('Dal Tadka', 'A comforting lentil dish tempered with aromatic spices', 'Toor dal (1 cup), Cumin seeds (1 tsp), Garlic (4 cloves), Onion (1, chopped), Tomato (1, chopped), Turmeric (½ tsp), Ghee (2 tbsp), Coriander (for garnish), Salt (to taste)',
@@ -215,15 +284,13 @@ SELECT
     r.category,
     r.difficulty,
     (r.prep_time + r.cook_time) as total_time,
-    COALESCE(AVG(rt.rating), 0) as avg_rating,
-    COUNT(rt.id) as rating_count,
-    COUNT(rv.id) as view_count,
+    COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+    COALESCE(s.rating_count, 0) as rating_count,
+    COALESCE(s.view_count, 0) as view_count,
     r.is_featured,
     r.is_quick_meal
 FROM recipes r
-LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-LEFT JOIN recipe_views rv ON r.id = rv.recipe_id
-GROUP BY r.id;
+LEFT JOIN recipe_stats s ON r.id = s.recipe_id;
 
 CREATE VIEW quick_meals AS
 SELECT *
@@ -242,12 +309,11 @@ DELIMITER //
 CREATE PROCEDURE GetRecipesByCategory(IN category_name VARCHAR(50))
 BEGIN
     SELECT r.*, 
-           COALESCE(AVG(rt.rating), 0) as avg_rating,
-           COUNT(rt.id) as rating_count
+           COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+           COALESCE(s.rating_count, 0) as rating_count
     FROM recipes r
-    LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
+    LEFT JOIN recipe_stats s ON r.id = s.recipe_id
     WHERE r.category = category_name
-    GROUP BY r.id
     ORDER BY avg_rating DESC, r.name;
 END //
 
@@ -260,38 +326,68 @@ CREATE PROCEDURE SearchRecipesAdvanced(
 )
 BEGIN
     SELECT DISTINCT r.*,
-           COALESCE(AVG(rt.rating), 0) as avg_rating,
-           COUNT(rt.id) as rating_count
+           COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating,
+           COALESCE(s.rating_count, 0) as rating_count
     FROM recipes r
-    LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
+    LEFT JOIN recipe_stats s ON r.id = s.recipe_id
     LEFT JOIN recipe_tags rtg ON r.id = rtg.recipe_id
     WHERE (search_query IS NULL OR r.name LIKE CONCAT('%', search_query, '%') OR r.ingredients LIKE CONCAT('%', search_query, '%'))
       AND (category_filter IS NULL OR r.category = category_filter)
       AND (difficulty_filter IS NULL OR r.difficulty = difficulty_filter)
       AND (max_time IS NULL OR (r.prep_time + r.cook_time) <= max_time)
       AND (tags_list IS NULL OR FIND_IN_SET(rtg.tag_name, tags_list))
-    GROUP BY r.id
     ORDER BY avg_rating DESC, r.name;
 END //
 
 CREATE PROCEDURE LogRecipeView(IN recipe_id INT, IN session_id VARCHAR(100))
 BEGIN
     INSERT INTO recipe_views (recipe_id, session_id) VALUES (recipe_id, session_id);
+    INSERT INTO recipe_stats (recipe_id, view_count, last_viewed_at)
+    VALUES (recipe_id, 1, CURRENT_TIMESTAMP)
+    ON DUPLICATE KEY UPDATE view_count = view_count + 1, last_viewed_at = CURRENT_TIMESTAMP;
 END //
 
 CREATE PROCEDURE GetSimilarRecipes(IN recipe_id INT, IN limit_count INT)
 BEGIN
     SELECT r2.*, 
-           COALESCE(AVG(rt.rating), 0) as avg_rating
+           COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating
     FROM recipes r1
     JOIN recipes r2 ON r1.category = r2.category AND r1.id != r2.id
-    LEFT JOIN recipe_ratings rt ON r2.id = rt.recipe_id
+    LEFT JOIN recipe_stats s ON r2.id = s.recipe_id
     WHERE r1.id = recipe_id
-    GROUP BY r2.id
-    ORDER BY COUNT(rt.id) DESC, avg_rating DESC
+    ORDER BY COALESCE(s.rating_count, 0) DESC, avg_rating DESC
     LIMIT limit_count;
 END //
 
+-- Any change to the catalog bumps the 'recipes' version so API workers reload their search index
+CREATE TRIGGER recipes_after_insert AFTER INSERT ON recipes FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'recipes' //
+
+CREATE TRIGGER recipes_after_update AFTER UPDATE ON recipes FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'recipes' //
+
+CREATE TRIGGER recipes_after_delete AFTER DELETE ON recipes FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'recipes' //
+
+CREATE TRIGGER recipe_tags_after_insert AFTER INSERT ON recipe_tags FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'recipes' //
+
+CREATE TRIGGER recipe_tags_after_update AFTER UPDATE ON recipe_tags FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'recipes' //
+
+CREATE TRIGGER recipe_tags_after_delete AFTER DELETE ON recipe_tags FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'recipes' //
+
+-- Rating changes invalidate cached responses that show ratings
+CREATE TRIGGER recipe_ratings_after_insert AFTER INSERT ON recipe_ratings FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'ratings' //
+
+CREATE TRIGGER recipe_ratings_after_update AFTER UPDATE ON recipe_ratings FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'ratings' //
+
+CREATE TRIGGER recipe_ratings_after_delete AFTER DELETE ON recipe_ratings FOR EACH ROW
+    UPDATE data_versions SET version = version + 1 WHERE scope = 'ratings' //
+
 DELIMITER ;
 
 -- Insert 30+ new sample recipes with simple image names
@@ -635,6 +731,9 @@ INSERT INTO recipe_tags (recipe_id, tag_name) VALUES
 (43, 'non-vegetarian'), (43, 'crispy'), (43, 'party'),
 (44, 'vegetarian'), (44, 'italian'), (44, 'cheesy');
 
+-- Start every recipe with an empty stats row
+INSERT INTO recipe_stats (recipe_id) SELECT id FROM recipes;
+
 -- Users table
 CREATE TABLE IF NOT EXISTS users (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -660,4 +759,5 @@ CREATE TABLE IF NOT EXISTS user_favorites (
 -- Add indexes for better performance
 CREATE INDEX idx_user_favorites_user ON user_favorites(user_id);
 CREATE INDEX idx_user_favorites_recipe ON user_favorites(recipe_id);
+CREATE INDEX idx_user_favorites_user_created ON user_favorites(user_id, created_at);
 CREATE INDEX idx_users_email ON users(email);
@@ -0,0 +1,194 @@
+import mysql.connector
+import os
+import re
+import sys
+
+from search_index import tokenize
+
+CONFIG = {
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),  # Required: Set via environment variable
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'database': os.environ.get('DB_NAME', 'recipe_finder'),
+    'autocommit': True
+}
+
+# Old search_history rows logged each search as one 'q=...&category=...' string
+OLD_SEARCH_QUERY = re.compile(r'^q=(.*)&category=(.*)&difficulty=(.*)&max_time=(.*)$', re.DOTALL)
+# Old rows parsed and rewritten per statement batch
+BACKFILL_BATCH_SIZE = int(os.environ.get('MIGRATE_BATCH_SIZE', 5000))
+
+# Structured search_history columns, each added after the one before it
+SEARCH_HISTORY_COLUMNS = [
+    ('normalized_query', 'VARCHAR(255)', 'id'),
+    ('category', 'VARCHAR(50)', 'normalized_query'),
+    ('difficulty', 'VARCHAR(20)', 'category'),
+    ('max_time', 'INT', 'difficulty'),
+    ('tags', 'VARCHAR(500)', 'max_time'),
+    ('latency_ms', 'INT', 'results_count'),
+]
+
+SEARCH_HISTORY_INDEXES = {
+    'search_query_date_index': '(normalized_query, searched_at)',
+    'search_category_date_index': '(category, searched_at)',
+}
+
+CREATE_DATA_VERSIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        scope VARCHAR(32) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+SEED_DATA_VERSIONS = "INSERT IGNORE INTO data_versions (scope) VALUES ('recipes'), ('ratings'), ('views'), ('trending')"
+
+# Tables whose every row change bumps a data_versions scope, as in init_db.sql
+VERSIONED_TABLES = [('recipes', 'recipes'), ('recipe_tags', 'recipes'), ('recipe_ratings', 'ratings')]
+
+UPDATE_OLD_SEARCH = """
+    UPDATE search_history
+    SET normalized_query = %s, category = %s, difficulty = %s, max_time = %s
+    WHERE id = %s
+"""
+
+def columns(cursor, table):
+    """Column name -> data type of `table` in the current database."""
+    cursor.execute(
+        "SELECT column_name, data_type FROM information_schema.columns"
+        " WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,)
+    )
+    return {name.lower(): data_type.lower() for name, data_type in cursor.fetchall()}
+
+def indexes(cursor, table):
+    cursor.execute(
+        "SELECT DISTINCT index_name FROM information_schema.statistics"
+        " WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,)
+    )
+    return {name.lower() for name, in cursor.fetchall()}
+
+def triggers(cursor):
+    cursor.execute("SELECT trigger_name FROM information_schema.triggers WHERE trigger_schema = DATABASE()")
+    return {name.lower() for name, in cursor.fetchall()}
+
+def migrate_data_versions(cursor):
+    """Create and seed data_versions, and install the triggers that bump it.
+
+    Without them the API cannot poll the catalog version, so its in-memory
+    search, facet and suggestion indexes never load.
+    """
+    cursor.execute(CREATE_DATA_VERSIONS_TABLE)
+    cursor.execute(SEED_DATA_VERSIONS)
+    installed = triggers(cursor)
+    created = []
+    for table, scope in VERSIONED_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            name = f"{table}_after_{event.lower()}"
+            if name in installed:
+                continue
+            cursor.execute(
+                f"CREATE TRIGGER {name} AFTER {event} ON {table} FOR EACH ROW"
+                f" UPDATE data_versions SET version = version + 1 WHERE scope = '{scope}'"
+            )
+            created.append(name)
+    if created:
+        print(f"Created data_versions triggers: {', '.join(created)}")
+
+def parse_old_search(search_query):
+    """(normalized_query, category, difficulty, max_time) of an old search_query string, or None."""
+    match = OLD_SEARCH_QUERY.match(search_query or '')
+    if not match:
+        return None
+    query, category, difficulty, max_time = match.groups()
+    return (
+        ' '.join(tokenize(query))[:255] or None,
+        category[:50] or None,
+        difficulty[:20] or None,
+        int(max_time) if max_time.isdigit() else None,
+    )
+
+def backfill_search_history(cursor):
+    """Parse old search_query strings into the structured columns, BACKFILL_BATCH_SIZE rows at a time."""
+    backfilled = 0
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT id, search_query FROM search_history WHERE id > %s AND search_query IS NOT NULL"
+            " ORDER BY id LIMIT %s",
+            (last_id, BACKFILL_BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return backfilled
+        last_id = rows[-1][0]
+        updates = []
+        for row_id, search_query in rows:
+            parsed = parse_old_search(search_query)
+            if parsed is not None:
+                updates.append((*parsed, row_id))
+        if updates:
+            cursor.executemany(UPDATE_OLD_SEARCH, updates)
+        backfilled += len(updates)
+
+def migrate_search_history(cursor):
+    """Bring a search_history table from before the structured columns up to init_db.sql's layout."""
+    existing = columns(cursor, 'search_history')
+    if not existing:
+        print("search_history does not exist yet; init_db.sql creates it")
+        return
+
+    if existing.get('id') == 'int':
+        cursor.execute("ALTER TABLE search_history MODIFY id BIGINT AUTO_INCREMENT")
+    missing = [column for column in SEARCH_HISTORY_COLUMNS if column[0] not in existing]
+    if missing:
+        cursor.execute("ALTER TABLE search_history " + ", ".join(
+            f"ADD COLUMN {name} {definition} AFTER {after}" for name, definition, after in missing
+        ))
+        print(f"Added search_history columns: {', '.join(name for name, _, _ in missing)}")
+
+    present = indexes(cursor, 'search_history')
+    missing_indexes = [name for name in SEARCH_HISTORY_INDEXES if name not in present]
+    if missing_indexes:
+        cursor.execute("ALTER TABLE search_history " + ", ".join(
+            f"ADD INDEX {name} {SEARCH_HISTORY_INDEXES[name]}" for name in missing_indexes
+        ))
+        print(f"Added search_history indexes: {', '.join(missing_indexes)}")
+
+    if 'search_query' in existing:
+        print(f"Backfilled {backfill_search_history(cursor)} old searches")
+        # Dropping the column drops search_query_index with it
+        cursor.execute("ALTER TABLE search_history DROP COLUMN search_query")
+        print("Dropped search_history.search_query")
+
+def migrate():
+    """Upgrade an existing database to the schema in init_db.sql.
+
+    init_db.sql only creates missing tables, so tables changed since a
+    database was created have to be altered here. Every step checks the
+    current schema first, so running it again is harmless. Run it before
+    deploying a version of the API that needs the new schema; it returns
+    False when a step failed.
+    """
+    try:
+        print(f"Connecting to database at {CONFIG['host']}...")
+        cnx = mysql.connector.connect(**CONFIG)
+        cursor = cnx.cursor()
+
+        migrate_data_versions(cursor)
+        migrate_search_history(cursor)
+
+        print("Schema is up to date")
+        cursor.close()
+        cnx.close()
+        return True
+
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+        return False
+
+if __name__ == "__main__":
+    # A failed migration must stop the deploy (render.yaml preDeployCommand)
+    sys.exit(0 if migrate() else 1)
@@ -0,0 +1,282 @@
+"""
+Compact recipe records and the single serialization path for recipe responses.
+
+Routes fetch plain tuple rows and hand the cursor to `fetch_recipes()`. The
+column layout of a result set is resolved once into a RecipeSchema, which
+knows which columns need normalizing, which derived fields to append
+(total_time, nutrition) and a pre-built JSON template for the whole object.
+Each row then becomes a slotted Recipe holding a single value list, and is
+written straight into that template without building a dict.
+
+A FieldSet (from the `fields=` / `view=` arguments) narrows both ends: it
+produces the SELECT column list, and the schema only writes those fields.
+"""
+
+import json
+from datetime import date
+from decimal import Decimal
+
+from flask import Response
+from werkzeug.http import http_date
+
+_encode_str = json.encoder.encode_basestring_ascii
+_encode_other = json.JSONEncoder(separators=(',', ':')).encode
+
+# recipe_nutrition column -> key in the nested "nutrition" object
+NUTRITION_COLUMNS = {'protein_g': 'protein', 'carbs_g': 'carbs', 'fat_g': 'fat', 'fiber_g': 'fiber'}
+
+
+class RawJSON(str):
+    """Already-encoded JSON that encode_value writes out unchanged."""
+
+
+def _to_float(value):
+    return float(value) if value else 0
+
+
+def _to_int(value):
+    return int(value) if value else 0
+
+
+# Response fields and the SELECT columns each one needs
+# (r = recipes, s = recipe_stats, n = recipe_nutrition)
+FIELD_COLUMNS = {
+    'id': ['r.id'],
+    'name': ['r.name'],
+    'description': ['r.description'],
+    'ingredients': ['r.ingredients'],
+    'instructions': ['r.instructions'],
+    'image_url': ['r.image_url'],
+    'category': ['r.category'],
+    'difficulty': ['r.difficulty'],
+    'prep_time': ['r.prep_time'],
+    'cook_time': ['r.cook_time'],
+    'servings': ['r.servings'],
+    'created_at': ['r.created_at'],
+    'tags': ['r.tags'],
+    'cuisine_type': ['r.cuisine_type'],
+    'is_featured': ['r.is_featured'],
+    'is_quick_meal': ['r.is_quick_meal'],
+    'avg_rating': ['COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) as avg_rating'],
+    'review_count': ['COALESCE(s.rating_count, 0) as review_count'],
+    'view_count': ['COALESCE(s.view_count, 0) as view_count'],
+    'total_time': ['r.prep_time', 'r.cook_time'],
+    # Filled by rebuild_nutrition.py; recipes without a row get "nutrition": null
+    'nutrition': ['n.calories', 'n.protein_g', 'n.carbs_g', 'n.fat_g', 'n.fiber_g'],
+}
+
+# What createRecipeCard renders
+CARD_FIELDS = (
+    'id', 'name', 'description', 'image_url', 'category', 'difficulty', 'prep_time',
+    'cook_time', 'total_time', 'avg_rating', 'review_count', 'view_count', 'nutrition'
+)
+
+# Cards only show the opening of the description
+CARD_COLUMNS = {'description': ['LEFT(r.description, 200) as description']}
+
+VIEWS = {'card': (CARD_FIELDS, CARD_COLUMNS)}
+
+
+# Columns whose raw MySQL value (Decimal, NULL) is normalized before serialization
+COLUMN_CONVERTERS = {
+    'avg_rating': _to_float,
+    'prep_time': _to_int,
+    'cook_time': _to_int,
+    'review_count': _to_int,
+    'rating_count': _to_int,
+    'view_count': _to_int,
+}
+
+
+def encode_value(value):
+    """Encode one value the way Flask's JSON provider would."""
+    if value is None:
+        return 'null'
+    kind = type(value)
+    if kind is str:
+        return _encode_str(value)
+    if kind is int:
+        return int.__repr__(value)
+    if kind is float:
+        return float.__repr__(value)
+    if kind is RawJSON:
+        return value
+    if kind is Decimal:
+        return _encode_str(str(value))
+    if isinstance(value, date):
+        return _encode_str(http_date(value))
+    if isinstance(value, (bytes, bytearray)):
+        return _encode_str(value.decode('utf-8'))
+    return _encode_other(value)
+
+
+class FieldSet:
+    """Fields requested through `fields=` or `view=`; None means every field."""
+
+    def __init__(self, fields=None, columns=None):
+        self.fields = fields
+        self.columns = columns or {}
+
+    @classmethod
+    def from_args(cls, args):
+        """Parse request arguments; raises ValueError for unknown names."""
+        view = args.get('view', '').strip()
+        if view:
+            if view not in VIEWS:
+                raise ValueError(f"Unknown view: {view}")
+            return cls(*VIEWS[view])
+
+        names = [name.strip() for name in args.get('fields', '').split(',') if name.strip()]
+        if not names:
+            return cls()
+        for name in names:
+            if name not in FIELD_COLUMNS:
+                raise ValueError(f"Unknown field: {name}")
+        # The id is always sent; clients and cursors key on it
+        return cls(tuple(dict.fromkeys(['id', *names])))
+
+    def select_list(self, *required):
+        """SELECT column list for the requested fields plus `required` ones (e.g. a sort key)."""
+        names = FIELD_COLUMNS if self.fields is None else (*self.fields, *required)
+        columns = []
+        for name in names:
+            columns.extend(self.columns.get(name) or FIELD_COLUMNS[name])
+        return ', '.join(dict.fromkeys(columns))
+
+    def load(self, cursor, always=()):
+        """Load all rows of a plain (tuple) cursor, writing only the requested fields.
+
+        `always` names columns the route itself selects (e.g. favorited_at),
+        which are written whatever fields were requested.
+        """
+        output = self.fields if self.fields is None else (*self.fields, *always)
+        return RecipeSchema(cursor.column_names, output).load(cursor.fetchall())
+
+
+class RecipeSchema:
+    """Column layout of one result set, resolved once and shared by its rows."""
+
+    def __init__(self, column_names, output=None):
+        self.columns = tuple(column_names)
+        fields = list(self.columns)
+
+        self._converters = [
+            (i, COLUMN_CONVERTERS[name]) for i, name in enumerate(self.columns)
+            if name in COLUMN_CONVERTERS
+        ]
+
+        self._times = None
+        if 'prep_time' in self.columns and 'cook_time' in self.columns:
+            self._times = (self.columns.index('prep_time'), self.columns.index('cook_time'))
+            fields.append('total_time')
+
+        self._nutrition = None
+        if 'calories' in self.columns:
+            macros = [name for name in NUTRITION_COLUMNS if name in self.columns]
+            # The nested object is rendered once per row and then written as is
+            template = ','.join(
+                ['"calories":%s'] + [f'{_encode_str(NUTRITION_COLUMNS[name])}:"%sg"' for name in macros]
+            )
+            self._nutrition = (
+                self.columns.index('calories'),
+                [self.columns.index(name) for name in macros],
+                '{' + template + '}',
+            )
+            fields.append('nutrition')
+
+        self.fields = tuple(fields)
+        self.index = {name: i for i, name in enumerate(self.fields)}
+
+        # Positions of the values written out, in template order
+        self.output = [
+            i for i, name in enumerate(self.fields)
+            if output is None or name in output
+        ]
+        self.output_names = {self.fields[i] for i in self.output}
+        self.template = '{' + ','.join(f'{_encode_str(self.fields[i])}:%s' for i in self.output) + '}'
+
+    def load(self, rows):
+        """Normalize every row of the result set into Recipe records."""
+        converters, times, nutrition = self._converters, self._times, self._nutrition
+        recipes = []
+        for row in rows:
+            values = list(row)
+            for i, convert in converters:
+                values[i] = convert(values[i])
+            if times:
+                values.append(values[times[0]] + values[times[1]])
+            if nutrition:
+                calories, macros, template = nutrition
+                if values[calories] is None:
+                    values.append(None)
+                else:
+                    values.append(RawJSON(template % (
+                        values[calories], *[values[i] if values[i] is not None else 0 for i in macros]
+                    )))
+            recipes.append(Recipe(self, values))
+        return recipes
+
+
+class Recipe:
+    """One recipe row plus its derived fields, addressed through its schema."""
+
+    __slots__ = ('schema', 'values', 'extras')
+
+    def __init__(self, schema, values):
+        self.schema = schema
+        self.values = values
+        self.extras = None
+
+    def __getitem__(self, name):
+        return self.values[self.schema.index[name]]
+
+    def get(self, name, default=None):
+        i = self.schema.index.get(name)
+        return self.values[i] if i is not None else default
+
+    @property
+    def id(self):
+        return self['id']
+
+    def to_json(self):
+        values = self.values
+        text = self.schema.template % tuple([encode_value(values[i]) for i in self.schema.output])
+        if self.extras:
+            text = text[:-1] + ''.join(
+                f',{_encode_str(name)}:{encode_value(value)}' for name, value in self.extras.items()
+            ) + '}'
+        return text
+
+
+def fetch_recipes(cursor, fields=None):
+    """Load all rows of a plain (tuple) cursor as Recipe records."""
+    return RecipeSchema(cursor.column_names, fields).load(cursor.fetchall())
+
+
+def recipes_json(recipes):
+    return '[' + ','.join(recipe.to_json() for recipe in recipes) + ']'
+
+
+def recipes_by_id_json(recipes):
+    """JSON object mapping each recipe id to the recipe."""
+    return '{' + ','.join(f'"{recipe.id}":{recipe.to_json()}' for recipe in recipes) + '}'
+
+
+def recipes_response(recipes):
+    """JSON array response for a list of recipes."""
+    return Response(recipes_json(recipes), mimetype='application/json')
+
+
+def recipe_response(recipe, **extras):
+    """JSON object response for one recipe, with extra top-level fields.
+
+    An extra named like a column (e.g. the recipe_tags list for `tags`)
+    replaces that column's value.
+    """
+    schema = recipe.schema
+    for name, value in extras.items():
+        if name in schema.output_names:
+            recipe.values[schema.index[name]] = value
+        else:
+            recipe.extras = {**(recipe.extras or {}), name: value}
+    return Response(recipe.to_json(), mimetype='application/json')
@@ -0,0 +1,134 @@
+"""
+Per-serving nutrition computed from the parsed ingredients of each recipe.
+
+The reference values come from nutrients.csv: kcal and macros per 100 g for
+each ingredient name, plus how many grams one cup and one piece weigh and how
+much to assume when the recipe gives no amount ("Salt", "Pepper (to taste)").
+`NutrientTable.match()` looks an ingredient up by its full normalized name,
+then by shorter runs of its words, preferring the last ones: "mozzarella
+cheese" falls back to "cheese" and "oil frying" to "oil".
+
+`compute_nutrition()` turns every recipe into (ingredient, grams) pairs and
+sums them with one NumPy scatter-add per batch. rebuild_nutrition.py stores
+the result in recipe_nutrition, so routes only read it.
+"""
+
+import csv
+import os
+from collections import Counter
+
+import numpy as np
+
+from ingredients import parse_ingredients
+
+NUTRIENTS_CSV = os.environ.get(
+    'NUTRIENTS_CSV', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nutrients.csv')
+)
+
+# Reference columns, per 100 g, in recipe_nutrition order
+NUTRIENTS = ('kcal', 'protein_g', 'carbs_g', 'fat_g', 'fiber_g')
+
+# Used when nutrients.csv leaves a weight blank
+DEFAULT_CUP_G = 240.0
+DEFAULT_PIECE_G = 100.0
+DEFAULT_AMOUNT_G = 10.0
+
+# Grams per unit that do not depend on the ingredient
+UNIT_GRAMS = {
+    'g': 1.0, 'kg': 1000.0, 'mg': 0.001, 'oz': 28.35, 'lb': 453.6,
+    'pinch': 0.3, 'clove': 5.0, 'inch': 5.0, 'slice': 25.0, 'leaf': 0.3, 'sprig': 1.0,
+    'stalk': 40.0, 'bunch': 50.0, 'handful': 25.0, 'scoop': 70.0, 'floret': 15.0,
+    'can': 400.0, 'packet': 100.0,
+}
+
+# Fractions of a cup; ml and l go through the cup weight so oil and flour differ from water
+CUP_FRACTIONS = {'cup': 1.0, 'tbsp': 1 / 16, 'tsp': 1 / 48, 'ml': 1 / 240, 'l': 1000 / 240}
+
+# recipe_nutrition stores macros as DECIMAL(5,2)
+MAX_MACRO_G = 999.99
+
+
+class NutrientTable:
+    """Reference nutrient values, one row per ingredient name."""
+
+    def __init__(self, names, values, cup_g, piece_g, default_g):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.values = np.asarray(values, dtype=np.float64).reshape(-1, len(NUTRIENTS))
+        self.cup_g = cup_g
+        self.piece_g = piece_g
+        self.default_g = default_g
+
+    @classmethod
+    def load(cls, path=NUTRIENTS_CSV):
+        names, values, cup_g, piece_g, default_g = [], [], [], [], []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                names.append(row['name'].strip())
+                values.append([float(row[column]) for column in NUTRIENTS])
+                cup_g.append(float(row['cup_g'] or DEFAULT_CUP_G))
+                piece_g.append(float(row['piece_g'] or DEFAULT_PIECE_G))
+                default_g.append(float(row['default_g'] or DEFAULT_AMOUNT_G))
+        return cls(names, values, cup_g, piece_g, default_g)
+
+    def __len__(self):
+        return len(self.names)
+
+    def match(self, name):
+        """Row index for a normalized ingredient name, or None if nothing matches."""
+        food = self.index.get(name)
+        if food is not None:
+            return food
+        words = name.split()
+        for length in range(len(words) - 1, 0, -1):
+            for start in range(len(words) - length, -1, -1):
+                food = self.index.get(' '.join(words[start:start + length]))
+                if food is not None:
+                    return food
+        return None
+
+    def grams(self, food, quantity, unit):
+        """Weight in grams of one parsed amount of the ingredient at row `food`."""
+        if quantity is None:
+            return self.default_g[food]
+        if unit in UNIT_GRAMS:
+            return quantity * UNIT_GRAMS[unit]
+        if unit in CUP_FRACTIONS:
+            return quantity * CUP_FRACTIONS[unit] * self.cup_g[food]
+        return quantity * self.piece_g[food]
+
+
+def compute_nutrition(recipes, table):
+    """Per-serving nutrition of each (id, ingredients, servings) recipe.
+
+    Returns rows of (recipe_id, calories, protein_g, carbs_g, fat_g, fiber_g)
+    in input order, and a Counter of ingredient names with no reference row.
+    A recipe none of whose ingredients matched gets no row.
+    """
+    recipe_rows, foods, grams = [], [], []
+    unmatched = Counter()
+    for position, (_, ingredients, servings) in enumerate(recipes):
+        for item in parse_ingredients(ingredients):
+            food = table.match(item.name)
+            if food is None:
+                unmatched[item.name] += 1
+                continue
+            recipe_rows.append(position)
+            foods.append(food)
+            grams.append(table.grams(food, item.quantity, item.unit) / max(servings or 1, 1))
+
+    totals = np.zeros((len(recipes), len(NUTRIENTS)))
+    if foods:
+        amounts = table.values[np.asarray(foods)] * (np.asarray(grams) / 100)[:, None]
+        np.add.at(totals, np.asarray(recipe_rows), amounts)
+    totals = np.round(totals, 2)
+    totals[:, 1:] = np.minimum(totals[:, 1:], MAX_MACRO_G)
+
+    matched = np.bincount(np.asarray(recipe_rows, dtype=np.intp), minlength=len(recipes))
+
+    rows = [
+        (recipe[0], int(round(calories)), *macros)
+        for recipe, count, (calories, *macros) in zip(recipes, matched.tolist(), totals.tolist())
+        if count
+    ]
+    return rows, unmatched
@@ -0,0 +1,177 @@
+"""
+Keyset (cursor) pagination for the recipe list routes.
+
+Every supported ordering is a SortKey: a SQL expression plus the matching
+value on a serialized Recipe, always followed by r.id as a tie-breaker so
+the order is total. A page's cursor holds the sort name and the last row's
+(key, id) pair, encoded as opaque URL-safe base64. The next page starts
+strictly after that pair, so MySQL only reads `limit + 1` rows per request
+no matter how deep the client pages, and rows inserted meanwhile never
+shift a page boundary.
+
+The in-memory sort index (sort_index.py) orders names by str.casefold()
+and ratings rounded in Python, which is close to MySQL's collation and
+arithmetic but not guaranteed equal. Its cursors are therefore tagged with
+their origin, and each path only resumes its own cursors.
+"""
+
+import base64
+import binascii
+import json
+import os
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Response
+
+from models import encode_value, recipes_json
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 24))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))
+
+DIFFICULTY_ORDER = {'Easy': 1, 'Medium': 2, 'Hard': 3}
+
+# `field` is the response field the key is read from; it is always selected
+SortKey = namedtuple('SortKey', ['name', 'expression', 'descending', 'field', 'value'])
+
+SORT_KEYS = {
+    'name': SortKey('name', 'r.name', False, 'name', lambda recipe: recipe['name']),
+    'rating': SortKey(
+        'rating', 'COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0)', True, 'avg_rating',
+        lambda recipe: recipe['avg_rating']
+    ),
+    'time': SortKey(
+        'time', '(COALESCE(r.prep_time, 0) + COALESCE(r.cook_time, 0))', False, 'total_time',
+        lambda recipe: recipe['total_time']
+    ),
+    'popularity': SortKey(
+        'popularity', 'COALESCE(s.view_count, 0)', True, 'view_count',
+        lambda recipe: recipe['view_count']
+    ),
+    # ENUM + 0 yields the declared position, so Easy < Medium < Hard
+    'difficulty': SortKey(
+        'difficulty', 'COALESCE(r.difficulty + 0, 0)', False, 'difficulty',
+        lambda recipe: DIFFICULTY_ORDER.get(recipe['difficulty'], 0)
+    ),
+}
+
+# Favorites are listed newest first
+RECENT = SortKey('recent', 'f.created_at', True, 'favorited_at', lambda recipe: recipe['favorited_at'])
+
+# In-memory ordering of full-text matches; never reaches SQL
+RELEVANCE = 'relevance'
+
+# Origin tag of cursors issued by the in-memory sort index
+IN_MEMORY = 'memory'
+
+
+class PageRequest:
+    """The `limit`, `sort` and `cursor` arguments of one list request."""
+
+    def __init__(self, sort, limit, after=None, origin=None):
+        self.sort = sort
+        self.limit = limit
+        self.after = after
+        self.origin = origin
+
+    @classmethod
+    def from_args(cls, args, sorts, default_sort):
+        """Parse request arguments; raises ValueError on anything malformed."""
+        sort = args.get('sort', '').strip() or default_sort
+        if sort not in sorts:
+            raise ValueError(f"Unsupported sort: {sort}")
+
+        limit = args.get('limit', '').strip()
+        if limit:
+            if not limit.isdigit() or int(limit) < 1:
+                raise ValueError("limit must be a positive integer")
+            limit = min(int(limit), MAX_PAGE_SIZE)
+        else:
+            limit = DEFAULT_PAGE_SIZE
+
+        token = args.get('cursor', '').strip()
+        if not token:
+            return cls(sort, limit)
+        value, last_id, origin = decode_cursor(token, sort)
+        return cls(sort, limit, (value, last_id), origin)
+
+    @property
+    def first(self):
+        return self.after is None
+
+    def keyset_sql(self, sort_key):
+        """WHERE fragment selecting rows strictly after the cursor."""
+        if self.after is None:
+            return '', []
+        value, last_id = self.after
+        op = '<' if sort_key.descending else '>'
+        return (
+            f" AND ({sort_key.expression} {op} %s OR ({sort_key.expression} = %s AND r.id > %s))",
+            [value, value, last_id]
+        )
+
+    def order_sql(self, sort_key):
+        """ORDER BY/LIMIT fragment; one extra row tells whether a next page exists."""
+        direction = 'DESC' if sort_key.descending else 'ASC'
+        return f" ORDER BY {sort_key.expression} {direction}, r.id ASC LIMIT {self.limit + 1}"
+
+    def paginate(self, recipes, sort_key):
+        """Trim the look-ahead row and return (page, next_cursor)."""
+        if len(recipes) <= self.limit:
+            return recipes, None
+        recipes = recipes[:self.limit]
+        last = recipes[-1]
+        return recipes, encode_cursor(self.sort, sort_key.value(last), last.id)
+
+    def slice_ranked(self, ranked):
+        """Page through [(recipe_id, score)] already in relevance order."""
+        start = 0
+        if self.after is not None:
+            score, last_id = self.after
+            # Ranked by score descending, then id ascending
+            while start < len(ranked) and (ranked[start][1], -ranked[start][0]) >= (score, -last_id):
+                start += 1
+        page = ranked[start:start + self.limit]
+        next_cursor = None
+        if start + self.limit < len(ranked):
+            last_id, score = page[-1]
+            next_cursor = encode_cursor(self.sort, score, last_id)
+        return [recipe_id for recipe_id, _ in page], next_cursor
+
+
+def encode_cursor(sort, value, last_id, origin=None):
+    if isinstance(value, Decimal):
+        value = float(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat(sep=' ')
+    elif isinstance(value, date):
+        value = value.isoformat()
+    fields = [sort, value, last_id] if origin is None else [sort, value, last_id, origin]
+    raw = json.dumps(fields, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(token, sort):
+    """Return (value, id, origin) from a cursor issued for `sort`; origin is None for SQL cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursor_sort, value, last_id, *origin = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or type(last_id) is not int or not isinstance(value, (str, int, float)):
+        raise ValueError("Invalid cursor")
+    if origin not in ([], [IN_MEMORY]):
+        raise ValueError("Invalid cursor")
+    return value, last_id, origin[0] if origin else None
+
+
+def page_response(recipes, next_cursor, total=None, **extras):
+    """`{"recipes": [...], "next_cursor": ..., "total": ...}` response, plus any `extras`."""
+    body = (
+        '{"recipes":' + recipes_json(recipes)
+        + ',"next_cursor":' + encode_value(next_cursor)
+        + ',"total":' + encode_value(total)
+        + ''.join(f',{json.dumps(name)}:{encode_value(value)}' for name, value in extras.items()) + '}'
+    )
+    return Response(body, mimetype='application/json')
@@ -0,0 +1,231 @@
+"""
+"Cook with what I have" matching for /search/pantry.
+
+Every canonical ingredient name in the catalog (see ingredients.normalize_name)
+gets a bit, with the most common ingredients on the lowest bits. Each recipe
+keeps an int bitset of the ingredients it needs, so the ingredients a pantry
+lacks for a recipe are `needed & ~pantry`.
+
+Counting does not loop over recipes. A recipe can only be covered by the
+pantry if it shares at least one ingredient with it. The posting lists of the
+pantry's ingredients are concatenated and counted with one bincount, which
+gives every candidate's number of ingredients present. Coverage and missing
+counts are array arithmetic from there, and the bitsets are only decoded for
+the recipes actually returned.
+
+Staples (salt, oil, water by default) are assumed to be in every kitchen. A
+recipe does not need them unless the caller turns that off.
+"""
+
+import os
+
+import numpy as np
+
+from ingredients import ingredient_names, normalize_name
+
+PANTRY_STAPLES = frozenset(
+    name.strip() for name in os.environ.get('PANTRY_STAPLES', 'salt,oil,water').split(',') if name.strip()
+)
+
+# Ingredients accepted in one pantry query
+MAX_PANTRY_ITEMS = 50
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def _set_bits(mask):
+    """Positions of the set bits of an int, lowest first."""
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+
+class PantryMatches:
+    """Ranked pantry matches as parallel arrays, so only the returned page becomes Python objects."""
+
+    __slots__ = ('ids', 'rank_keys', 'coverage', 'missing')
+
+    def __init__(self, ids, rank_keys, coverage, missing):
+        self.ids = ids
+        self.rank_keys = rank_keys
+        self.coverage = coverage
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.ids)
+
+    def filter(self, keep):
+        """The matches where the boolean array `keep` is set, still in rank order."""
+        return PantryMatches(self.ids[keep], self.rank_keys[keep], self.coverage[keep], self.missing[keep])
+
+    def page(self, after, limit):
+        """Entries [(recipe_id, rank_key, coverage, missing)] after a (rank_key, id) cursor.
+
+        Returns the page and whether more entries follow it.
+        """
+        start = 0
+        if after is not None:
+            rank_key, last_id = after
+            # Ranked by key descending, then id ascending
+            start = int(np.count_nonzero(
+                (self.rank_keys > rank_key) | ((self.rank_keys == rank_key) & (self.ids <= last_id))
+            ))
+        end = start + limit
+        entries = list(zip(
+            self.ids[start:end].tolist(),
+            self.rank_keys[start:end].tolist(),
+            self.coverage[start:end].tolist(),
+            self.missing[start:end].tolist(),
+        ))
+        return entries, end < len(self.ids)
+
+
+class PantryIndex:
+    """Ingredient vocabulary, per-recipe ingredient bitsets and posting lists."""
+
+    def __init__(self, staples=PANTRY_STAPLES):
+        self.staples = staples
+        self.version = None
+        self.names = []
+        self.bits = {}
+        self.by_last_word = {}
+        self.doc_ids = _EMPTY
+        self.positions = {}
+        self.needed = []
+        self.sizes = _EMPTY
+        self.staple_counts = _EMPTY
+        self.staple_mask = 0
+        self.postings = []
+
+    def rebuild(self, snapshot):
+        """Rebuild from a catalog snapshot and swap the new index in atomically."""
+        recipe_names = []
+        frequency = {}
+        for recipe in snapshot.recipes:
+            names = set(ingredient_names(recipe.ingredients))
+            recipe_names.append(names)
+            for name in names:
+                frequency[name] = frequency.get(name, 0) + 1
+
+        names = sorted(frequency, key=lambda name: (-frequency[name], name))
+        bits = {name: bit for bit, name in enumerate(names)}
+        staple_mask = 0
+        for name in names:
+            if self._is_staple(name):
+                staple_mask |= 1 << bits[name]
+
+        needed = []
+        rows = [[] for _ in names]
+        for position, recipe_ingredients in enumerate(recipe_names):
+            mask = 0
+            for name in recipe_ingredients:
+                bit = bits[name]
+                mask |= 1 << bit
+                rows[bit].append(position)
+            needed.append(mask)
+
+        by_last_word = {}
+        for name in names:
+            by_last_word.setdefault(name.rsplit(' ', 1)[-1], []).append(name)
+
+        (self.names, self.bits, self.by_last_word, self.staple_mask, self.needed,
+         self.sizes, self.staple_counts, self.postings, self.doc_ids, self.positions,
+         self.version) = (
+            names,
+            bits,
+            by_last_word,
+            staple_mask,
+            needed,
+            np.array([mask.bit_count() for mask in needed], dtype=np.int64),
+            np.array([(mask & staple_mask).bit_count() for mask in needed], dtype=np.int64),
+            [np.array(positions, dtype=np.int64) for positions in rows],
+            np.array([recipe.id for recipe in snapshot.recipes], dtype=np.int64),
+            {recipe.id: position for position, recipe in enumerate(snapshot.recipes)},
+            snapshot.version,
+        )
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def _is_staple(self, name):
+        """A staple is a name in the staple list or one ending in it ("olive oil", "warm water")."""
+        return any(name == staple or name.endswith(' ' + staple) for staple in self.staples)
+
+    def resolve(self, items):
+        """Pantry bitmask for user-typed ingredient names, and the names that matched nothing.
+
+        A name also covers the more specific catalog names ending in it, so
+        "rice" covers "basmati rice" and "dal" covers "toor dal".
+        """
+        mask = 0
+        unknown = []
+        for item in items:
+            name = normalize_name(item)
+            if not name:
+                continue
+            matches = [
+                candidate for candidate in self.by_last_word.get(name.rsplit(' ', 1)[-1], ())
+                if candidate == name or candidate.endswith(' ' + name)
+            ]
+            if not matches:
+                unknown.append(item.strip())
+            for candidate in matches:
+                mask |= 1 << self.bits[candidate]
+        return mask, unknown
+
+    def search(self, pantry, use_staples=True, max_missing=None):
+        """Rank recipes by how much of them the pantry covers, best first.
+
+        Order: highest coverage, then fewest missing ingredients, then id.
+        With `use_staples` the staples count as present whether listed or not.
+        """
+        if use_staples:
+            pantry |= self.staple_mask
+            required = self.sizes - self.staple_counts
+            counted = pantry & ~self.staple_mask
+        else:
+            required = self.sizes
+            counted = pantry
+
+        lists = [self.postings[bit] for bit in _set_bits(counted)]
+        if not lists:
+            return PantryMatches(_EMPTY, _EMPTY, np.zeros(0), _EMPTY)
+        have = np.bincount(np.concatenate(lists), minlength=len(self.doc_ids))
+        candidates = np.flatnonzero(have)
+        have = have[candidates]
+        total = required[candidates]
+        missing = total - have
+
+        keep = total > 0
+        if max_missing is not None:
+            keep &= missing <= max_missing
+        candidates, have, total, missing = candidates[keep], have[keep], total[keep], missing[keep]
+
+        coverage = have / total
+        # One sortable number: coverage in tenths of a percent, then fewer missing first
+        rank_keys = np.round(coverage * 1000).astype(np.int64) * 100 + (99 - np.minimum(missing, 99))
+        recipe_ids = self.doc_ids[candidates]
+        order = np.lexsort((recipe_ids, -rank_keys))
+        return PantryMatches(recipe_ids[order], rank_keys[order], np.round(coverage[order], 3), missing[order])
+
+    def missing_ingredients(self, recipe_id, pantry, use_staples=True):
+        """Canonical names of the ingredients a recipe needs that the pantry lacks."""
+        position = self.positions.get(recipe_id)
+        if position is None:
+            return []
+        if use_staples:
+            pantry |= self.staple_mask
+        lacking = self.needed[position] & ~pantry
+        return [self.names[bit] for bit in _set_bits(lacking)]
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "recipes": len(self.doc_ids),
+            "ingredients": len(self.names),
+            "staples": sum(1 for name in self.names if self._is_staple(name)),
+        }
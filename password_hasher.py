@@ -0,0 +1,201 @@
+"""
+bcrypt hashing in a small process pool, off the request threads.
+
+A bcrypt check takes tens to hundreds of milliseconds of pure CPU. Done inline,
+a burst of logins occupies every worker and recipe reads queue up behind
+them. Here the work runs in at most `workers` child processes. At most
+`max_pending` calls may wait for a free process. A call that cannot get a
+place within `queue_timeout` seconds, or whose result does not come back
+within `hash_timeout` seconds, raises HasherBusy. The route turns that into
+a 503. A timed-out call still holds its place until its child finishes, so
+the limits hold while bcrypt is saturated.
+
+The cost factor comes from BCRYPT_ROUNDS. It is read from every stored hash,
+so `rehash_if_needed()` gives the login route a new hash at the current cost
+when the stored one was made at another.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2.0))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5.0))
+
+# Children must not be forked from the threaded web worker: a lock held by another
+# thread at fork time stays held forever in the child
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Recent call durations kept for the latency percentiles
+LATENCY_SAMPLES = 512
+
+
+class HasherBusy(Exception):
+    """The hashing pool could not take or finish the call in time."""
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check_password(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
+
+
+def hash_rounds(password_hash):
+    """Cost factor of a stored `$2b$12$...` hash, or None if it is not bcrypt."""
+    parts = password_hash.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool and reports its latency and queue depth."""
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_MAX_PENDING, queue_timeout=PASSWORD_HASH_QUEUE_TIMEOUT,
+                 hash_timeout=PASSWORD_HASH_TIMEOUT):
+        if not 4 <= rounds <= 31:
+            raise ValueError(f"bcrypt rounds must be between 4 and 31, got {rounds}")
+
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.hash_timeout = hash_timeout
+
+        self.hashed = 0
+        self.checked = 0
+        self.rehashed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._pending = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        # Created lazily so each forked worker owns its own child processes
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context(START_METHOD)
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count('rejected')
+            raise HasherBusy("password hashing queue is full")
+        started = time.monotonic()
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # A timed-out call keeps its slot until the child actually finishes, since
+        # cancel() cannot stop a running task
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.hash_timeout)
+        except FutureTimeout:
+            future.cancel()
+            self._count('timeouts')
+            raise HasherBusy("password hashing timed out")
+        finally:
+            with self._lock:
+                self._latencies.append(time.monotonic() - started)
+
+    def _count(self, counter):
+        # Request threads share these counters; += on an attribute is not atomic
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def hash(self, password):
+        """bcrypt hash of `password` at the configured cost, as a str."""
+        password_hash = self._run(_hash_password, password.encode('utf-8'), self.rounds)
+        self._count('hashed')
+        return password_hash.decode('utf-8')
+
+    def check(self, password, password_hash):
+        """Whether `password` matches the stored hash."""
+        matches = self._run(_check_password, password.encode('utf-8'), password_hash.encode('utf-8'))
+        self._count('checked')
+        return matches
+
+    def needs_rehash(self, password_hash):
+        """Whether a stored hash was made at a different cost than the configured one."""
+        return hash_rounds(password_hash) != self.rounds
+
+    def rehash_if_needed(self, password, password_hash):
+        """New hash of a just-verified `password` if the stored one is at another cost, else None.
+
+        A saturated pool also gives None: the old hash still works, and the
+        next login tries again.
+        """
+        if not self.needs_rehash(password_hash):
+            return None
+        try:
+            new_hash = self.hash(password)
+        except HasherBusy:
+            return None
+        self._count('rehashed')
+        return new_hash
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            pending = self._pending
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "queued": max(0, pending - self.workers),
+            "hashed": self.hashed,
+            "checked": self.checked,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "latency_ms": {
+                "p50": _percentile_ms(latencies, 0.50),
+                "p95": _percentile_ms(latencies, 0.95),
+                "max": _percentile_ms(latencies, 1.0),
+            },
+        }
+
+
+def _percentile_ms(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return round(sorted_values[index] * 1000, 1)
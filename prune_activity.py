@@ -0,0 +1,189 @@
+import mysql.connector
+import datetime
+import hashlib
+import os
+import sys
+import time
+from collections import Counter
+
+from trending import TRENDING_WINDOWS
+
+CONFIG = {
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),  # Required: Set via environment variable
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'database': os.environ.get('DB_NAME', 'recipe_finder'),
+    'autocommit': True
+}
+
+# Raw views and searches older than this many days are rolled up and deleted
+RETENTION_DAYS = int(os.environ.get('ACTIVITY_RETENTION_DAYS', 30))
+# Rows rolled up and deleted per transaction, so no lock is held for long
+BATCH_SIZE = int(os.environ.get('ACTIVITY_PRUNE_BATCH_SIZE', 5000))
+# Pause between batches, to let replicas and other writers keep up
+BATCH_PAUSE = int(os.environ.get('ACTIVITY_PRUNE_PAUSE_MS', 50)) / 1000
+
+CREATE_VIEW_DAILY_TABLE = """
+    CREATE TABLE IF NOT EXISTS recipe_view_daily (
+        recipe_id INT NOT NULL,
+        day DATE NOT NULL,
+        views INT NOT NULL,
+        PRIMARY KEY (recipe_id, day)
+    )
+"""
+
+CREATE_SEARCH_DAILY_TABLE = """
+    CREATE TABLE IF NOT EXISTS search_history_daily (
+        day DATE NOT NULL,
+        search_key CHAR(32) NOT NULL,
+        normalized_query VARCHAR(255),
+        category VARCHAR(50),
+        difficulty VARCHAR(20),
+        max_time INT,
+        tags VARCHAR(500),
+        searches INT NOT NULL,
+        results_sum BIGINT NOT NULL,
+        latency_ms_sum BIGINT NOT NULL,
+        PRIMARY KEY (day, search_key),
+        INDEX search_daily_query_index (normalized_query, day)
+    )
+"""
+
+SELECT_OLD_VIEWS = """
+    SELECT id, recipe_id, viewed_at
+    FROM recipe_views
+    WHERE viewed_at < %s
+    ORDER BY viewed_at
+    LIMIT %s
+    FOR UPDATE
+"""
+
+UPSERT_VIEW_DAILY = """
+    INSERT INTO recipe_view_daily (recipe_id, day, views)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE views = views + VALUES(views)
+"""
+
+SELECT_OLD_SEARCHES = """
+    SELECT id, searched_at, normalized_query, category, difficulty, max_time, tags, results_count, latency_ms
+    FROM search_history
+    WHERE searched_at < %s
+    ORDER BY searched_at
+    LIMIT %s
+    FOR UPDATE
+"""
+
+UPSERT_SEARCH_DAILY = """
+    INSERT INTO search_history_daily
+        (day, search_key, normalized_query, category, difficulty, max_time, tags,
+         searches, results_sum, latency_ms_sum)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        searches = searches + VALUES(searches),
+        results_sum = results_sum + VALUES(results_sum),
+        latency_ms_sum = latency_ms_sum + VALUES(latency_ms_sum)
+"""
+
+def daily_views(rows):
+    """Per-recipe, per-day view counts of a batch of recipe_views rows."""
+    counts = Counter((recipe_id, viewed_at.date()) for _, recipe_id, viewed_at in rows if recipe_id is not None)
+    return [(recipe_id, day, views) for (recipe_id, day), views in sorted(counts.items())]
+
+def search_key(search):
+    """Stable key of a search's query and filters; the columns are too wide for one index."""
+    return hashlib.md5(repr(search).encode('utf-8')).hexdigest()
+
+def daily_searches(rows):
+    """Per-day totals of each distinct search in a batch of search_history rows."""
+    totals = {}
+    for _, searched_at, *search, results_count, latency_ms in rows:
+        key = (searched_at.date(), *search)
+        searches, results_sum, latency_sum = totals.get(key, (0, 0, 0))
+        totals[key] = (searches + 1, results_sum + (results_count or 0), latency_sum + (latency_ms or 0))
+    aggregates = [(day, search_key(tuple(search)), *search, *sums) for (day, *search), sums in totals.items()]
+    # Sorted so concurrent runs lock aggregate rows in the same order
+    return sorted(aggregates, key=lambda row: row[:2])
+
+def roll_up(cnx, cursor, table, select, aggregate, upsert, cutoff):
+    """Move rows older than `cutoff` from `table` into daily aggregates, BATCH_SIZE rows per transaction.
+
+    Each batch adds its rows to the aggregates and deletes them in the same
+    transaction, so a row is counted either raw or rolled up, never both.
+    """
+    moved = 0
+    while True:
+        cnx.start_transaction()
+        cursor.execute(select, (cutoff, BATCH_SIZE))
+        rows = cursor.fetchall()
+        if not rows:
+            cnx.commit()
+            break
+        aggregates = aggregate(rows)
+        if aggregates:
+            cursor.executemany(upsert, aggregates)
+        ids = [row[0] for row in rows]
+        cursor.execute(f"DELETE FROM {table} WHERE id IN (%s)" % ", ".join(["%s"] * len(ids)), ids)
+        cnx.commit()
+        moved += len(rows)
+        time.sleep(BATCH_PAUSE)
+    return moved
+
+def prune_buckets(cursor, cutoff):
+    """Delete hourly view buckets no trending window reaches any more, BATCH_SIZE rows at a time."""
+    deleted = 0
+    while True:
+        cursor.execute("DELETE FROM recipe_view_buckets WHERE bucket_start < %s LIMIT %s", (cutoff, BATCH_SIZE))
+        if not cursor.rowcount:
+            return deleted
+        deleted += cursor.rowcount
+        time.sleep(BATCH_PAUSE)
+
+def prune(retention_days=RETENTION_DAYS):
+    """Roll recipe_views and search_history rows older than the horizon into daily tables.
+
+    Afterwards the raw tables only hold the last `retention_days` days, and
+    the daily tables grow with recipes (or distinct searches) times days,
+    not with traffic. Hourly trending buckets older than the longest
+    /trending window are dropped too. Run it daily; an interrupted run
+    loses nothing and the next one continues where it stopped.
+
+    Both raw tables stay unpartitioned: recipe_views has a foreign key, and
+    MySQL cannot partition a table that has one.
+    """
+    if retention_days < 1:
+        print("Error: the retention horizon must be at least 1 day")
+        return
+    try:
+        print(f"Connecting to database at {CONFIG['host']}...")
+        cnx = mysql.connector.connect(**CONFIG)
+        cursor = cnx.cursor()
+
+        cursor.execute(CREATE_VIEW_DAILY_TABLE)
+        cursor.execute(CREATE_SEARCH_DAILY_TABLE)
+
+        # Whole days only, so a day is never split between raw rows and its aggregate
+        today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        cutoff = today - datetime.timedelta(days=retention_days)
+        print(f"Rolling up activity before {cutoff:%Y-%m-%d}...")
+
+        views = roll_up(cnx, cursor, 'recipe_views', SELECT_OLD_VIEWS, daily_views, UPSERT_VIEW_DAILY, cutoff)
+        print(f"Moved {views} recipe views into recipe_view_daily")
+        searches = roll_up(
+            cnx, cursor, 'search_history', SELECT_OLD_SEARCHES, daily_searches, UPSERT_SEARCH_DAILY, cutoff
+        )
+        print(f"Moved {searches} searches into search_history_daily")
+
+        longest_window = max(hours for hours, _ in TRENDING_WINDOWS.values())
+        buckets = prune_buckets(cursor, today - datetime.timedelta(hours=longest_window + 24))
+        print(f"Deleted {buckets} expired hourly view buckets")
+
+        cursor.close()
+        cnx.close()
+
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    prune(int(args[args.index('--days') + 1]) if '--days' in args else RETENTION_DAYS)
@@ -0,0 +1,100 @@
+import mysql.connector
+import os
+import sys
+from collections import Counter
+
+from nutrition import NutrientTable, compute_nutrition
+
+CONFIG = {
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),  # Required: Set via environment variable
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'database': os.environ.get('DB_NAME', 'recipe_finder'),
+    'autocommit': True
+}
+
+# Recipes read and written per round trip
+BATCH_SIZE = int(os.environ.get('NUTRITION_BATCH_SIZE', 1000))
+
+SELECT_ALL_RECIPES = """
+    SELECT r.id, r.ingredients, r.servings
+    FROM recipes r
+    WHERE r.id > %s
+    ORDER BY r.id
+    LIMIT %s
+"""
+
+SELECT_RECIPES_WITHOUT_NUTRITION = """
+    SELECT r.id, r.ingredients, r.servings
+    FROM recipes r
+    LEFT JOIN recipe_nutrition n ON n.recipe_id = r.id AND n.calories IS NOT NULL
+    WHERE n.recipe_id IS NULL AND r.id > %s
+    ORDER BY r.id
+    LIMIT %s
+"""
+
+UPSERT_NUTRITION = """
+    INSERT INTO recipe_nutrition (recipe_id, calories, protein_g, carbs_g, fat_g, fiber_g)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        calories = VALUES(calories),
+        protein_g = VALUES(protein_g),
+        carbs_g = VALUES(carbs_g),
+        fat_g = VALUES(fat_g),
+        fiber_g = VALUES(fiber_g)
+"""
+
+def rebuild(recompute_all=False):
+    """Fill recipe_nutrition from each recipe's ingredients and nutrients.csv.
+
+    By default only recipes without nutrition are computed, so hand-entered
+    rows are kept. Pass --all to recompute every recipe, e.g. after editing
+    nutrients.csv. Ingredients missing from the reference table are listed
+    at the end; add them to nutrients.csv and run again with --all.
+    """
+    try:
+        table = NutrientTable.load()
+        print(f"Loaded {len(table)} reference ingredients")
+
+        print(f"Connecting to database at {CONFIG['host']}...")
+        cnx = mysql.connector.connect(**CONFIG)
+        cursor = cnx.cursor()
+
+        select = SELECT_ALL_RECIPES if recompute_all else SELECT_RECIPES_WITHOUT_NUTRITION
+        print("Rebuilding recipe_nutrition..." if recompute_all else "Filling missing recipe_nutrition rows...")
+        last_id = 0
+        seen = written = 0
+        unmatched = Counter()
+        while True:
+            cursor.execute(select, (last_id, BATCH_SIZE))
+            recipes = cursor.fetchall()
+            if not recipes:
+                break
+            last_id = recipes[-1][0]
+            seen += len(recipes)
+
+            rows, missing = compute_nutrition(recipes, table)
+            unmatched.update(missing)
+            if rows:
+                cursor.executemany(UPSERT_NUTRITION, rows)
+                written += len(rows)
+
+        if written:
+            # Cached recipe responses embed nutrition, so they must be dropped
+            cursor.execute("UPDATE data_versions SET version = version + 1 WHERE scope = 'recipes'")
+
+        print(f"Computed nutrition for {written} of {seen} recipes")
+        if unmatched:
+            print(f"{len(unmatched)} ingredients not in the reference table (most used first):")
+            for name, count in unmatched.most_common(25):
+                print(f"  {name} ({count})")
+
+        cursor.close()
+        cnx.close()
+
+    except (mysql.connector.Error, OSError) as err:
+        print(f"Error: {err}")
+
+if __name__ == "__main__":
+    rebuild(recompute_all='--all' in sys.argv[1:])
@@ -0,0 +1,93 @@
+import mysql.connector
+import os
+
+from prune_activity import CREATE_VIEW_DAILY_TABLE
+
+CONFIG = {
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),  # Required: Set via environment variable
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'database': os.environ.get('DB_NAME', 'recipe_finder'),
+    'autocommit': True
+}
+
+CREATE_STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS recipe_stats (
+        recipe_id INT PRIMARY KEY,
+        rating_sum INT NOT NULL DEFAULT 0,
+        rating_count INT NOT NULL DEFAULT 0,
+        view_count BIGINT NOT NULL DEFAULT 0,
+        last_viewed_at TIMESTAMP NULL,
+        FOREIGN KEY (recipe_id) REFERENCES recipes(id),
+        INDEX stats_view_count_index (view_count)
+    )
+"""
+
+# Ratings and views are aggregated separately so the two never fan out against each other
+REBUILD_STATS = """
+    INSERT INTO recipe_stats (recipe_id, rating_sum, rating_count, view_count, last_viewed_at)
+    SELECT r.id,
+           COALESCE(rt.rating_sum, 0),
+           COALESCE(rt.rating_count, 0),
+           COALESCE(rv.view_count, 0),
+           rv.last_viewed_at
+    FROM recipes r
+    LEFT JOIN (
+        SELECT recipe_id, SUM(rating) as rating_sum, COUNT(rating) as rating_count
+        FROM recipe_ratings
+        GROUP BY recipe_id
+    ) rt ON r.id = rt.recipe_id
+    LEFT JOIN (
+        SELECT recipe_id, SUM(views) as view_count, MAX(last_viewed_at) as last_viewed_at
+        FROM (
+            SELECT recipe_id, COUNT(*) as views, MAX(viewed_at) as last_viewed_at
+            FROM recipe_views
+            GROUP BY recipe_id
+            UNION ALL
+            -- Views prune_activity.py has moved out of recipe_views
+            SELECT recipe_id, SUM(views), TIMESTAMP(MAX(day))
+            FROM recipe_view_daily
+            GROUP BY recipe_id
+        ) v
+        GROUP BY recipe_id
+    ) rv ON r.id = rv.recipe_id
+    ON DUPLICATE KEY UPDATE
+        rating_sum = VALUES(rating_sum),
+        rating_count = VALUES(rating_count),
+        view_count = VALUES(view_count),
+        last_viewed_at = VALUES(last_viewed_at)
+"""
+
+def rebuild():
+    """Recompute recipe_stats from the ratings and views tables.
+
+    View counts add the raw recipe_views rows to the daily rollups that
+    prune_activity.py keeps for older views.
+
+    Run once after creating the table, or whenever the counters look off.
+    Ratings and views written while it runs can be lost, so pick a quiet moment.
+    """
+    try:
+        print(f"Connecting to database at {CONFIG['host']}...")
+        cnx = mysql.connector.connect(**CONFIG)
+        cursor = cnx.cursor()
+
+        cursor.execute(CREATE_STATS_TABLE)
+        cursor.execute(CREATE_VIEW_DAILY_TABLE)
+
+        print("Rebuilding recipe_stats...")
+        cursor.execute(REBUILD_STATS)
+
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(rating_count), 0), COALESCE(SUM(view_count), 0) FROM recipe_stats")
+        recipes, ratings, views = cursor.fetchone()
+        print(f"Rebuilt stats for {recipes} recipes ({ratings} ratings, {views} views)")
+
+        cursor.close()
+        cnx.close()
+
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+
+if __name__ == "__main__":
+    rebuild()
@@ -2,6 +2,9 @@
 class RecipeApp {
     constructor() {
         this.recipes = [];
+        this.nextCursor = null;
+        this.resultsTotal = 0;
+        this.listParams = new URLSearchParams();
         this.categories = [];
         this.tags = [];
         this.currentView = 'grid';
@@ -11,10 +14,12 @@ class RecipeApp {
             category: '',
             difficulty: '',
             max_time: '',
-            sort: 'name'
+            sort: ''
         };
         this.sessionId = this.generateSessionId();
         this.token = localStorage.getItem('recipeToken');
+        this.favoriteIds = null;
+        this.suggestionCache = new Map();
         this.user = JSON.parse(localStorage.getItem('recipeUser') || 'null');
 
         this.init();
@@ -28,7 +33,6 @@ class RecipeApp {
         this.bindEvents();
         this.checkAuthState();
         this.loadInitialData();
-        this.updateStats();
     }
 
     bindEvents() {
@@ -37,9 +41,11 @@ class RecipeApp {
         document.getElementById('searchInput').addEventListener('keypress', (e) => {
             if (e.key === 'Enter') this.searchRecipes();
         });
+        document.getElementById('searchInput').addEventListener('input', (e) => this.loadSuggestions(e.target.value));
 
         // Show all recipes
         document.getElementById('showAllButton').addEventListener('click', () => this.showAllRecipes());
+        document.getElementById('loadMoreButton').addEventListener('click', () => this.loadMoreRecipes());
 
         // Filter changes
         document.getElementById('categoryFilter').addEventListener('change', () => this.applyFilters());
@@ -248,6 +254,7 @@ class RecipeApp {
             });
 
             this.token = data.token;
+            this.favoriteIds = null;
             this.user = data.user;
             
             localStorage.setItem('recipeToken', this.token);
@@ -286,6 +293,7 @@ class RecipeApp {
             });
 
             this.token = data.token;
+            this.favoriteIds = null;
             this.user = data.user;
             
             localStorage.setItem('recipeToken', this.token);
@@ -330,6 +338,7 @@ class RecipeApp {
     handleLogout() {
         this.token = null;
         this.user = null;
+        this.favoriteIds = null;
         localStorage.removeItem('recipeToken');
         localStorage.removeItem('recipeUser');
         
@@ -391,20 +400,21 @@ class RecipeApp {
         if (!this.token) return;
 
         try {
-            const favorites = await this.fetchAPI('/favorites');
-            this.displayRecipes(favorites, 'favoritesContent');
+            const page = this.readPage(await this.fetchAPI('/favorites?view=card&limit=100'));
+            this.displayRecipes(page.recipes, 'favoritesContent');
         } catch (error) {
             document.getElementById('favoritesContent').innerHTML = 
                 '<div class="error">Failed to load favorites</div>';
         }
     }
 
-    async toggleFavorite(recipeId, isFavorited) {
+    async toggleFavorite(recipeId) {
         if (!this.token) {
             this.showLoginModal();
             return;
         }
 
+        const isFavorited = await this.checkFavoriteStatus(recipeId);
         try {
             if (isFavorited) {
                 await this.fetchAPI(`/favorites/${recipeId}`, {
@@ -422,14 +432,20 @@ class RecipeApp {
                 });
             }
 
+            // Keep the local id set in step with the server
+            const ids = await this.getFavoriteIds().catch(() => null);
+            if (ids) {
+                if (isFavorited) ids.delete(Number(recipeId));
+                else ids.add(Number(recipeId));
+            }
+
             // Update UI
-            const favoriteBtn = document.querySelector(`[data-recipe-id="${recipeId}"] .favorite-btn`);
-            if (favoriteBtn) {
+            document.querySelectorAll(`[data-recipe-id="${recipeId}"] .favorite-btn`).forEach(favoriteBtn => {
                 favoriteBtn.classList.toggle('favorited', !isFavorited);
                 favoriteBtn.innerHTML = !isFavorited ? 
                     '<i class="fas fa-heart"></i> Favorited' : 
                     '<i class="far fa-heart"></i> Add to Favorites';
-            }
+            });
 
             // Reload favorites if on favorites tab
             if (this.currentTab === 'favorites') {
@@ -441,18 +457,40 @@ class RecipeApp {
         }
     }
 
+    // One request per session for the user's favorite ids; the browser revalidates it with its ETag
+    getFavoriteIds() {
+        if (!this.favoriteIds) {
+            this.favoriteIds = this.fetchAPI('/favorites/ids').then(data => new Set(data.recipe_ids));
+        }
+        return this.favoriteIds;
+    }
+
     async checkFavoriteStatus(recipeId) {
         if (!this.token) return false;
 
         try {
-            const data = await this.fetchAPI(`/favorites/check/${recipeId}`);
-            return data.is_favorited;
+            const ids = await this.getFavoriteIds();
+            return ids.has(Number(recipeId));
         } catch (error) {
-            return false;
+            // Servers without /favorites/ids (app.py) answer one recipe at a time
+            try {
+                const data = await this.fetchAPI(`/favorites/check/${recipeId}`);
+                return data.is_favorited;
+            } catch (error) {
+                return false;
+            }
         }
     }
 
     async loadInitialData() {
+        try {
+            this.applyBootstrap(await this.fetchAPI('/bootstrap'));
+            return;
+        } catch (error) {
+            // Servers without /bootstrap (app.py) fall back to the individual calls
+            console.error('Bootstrap failed, loading sections separately:', error);
+        }
+
         try {
             await Promise.all([
                 this.loadCategories(),
@@ -460,7 +498,8 @@ class RecipeApp {
                 this.loadPopularRecipes(),
                 this.loadQuickMeals(),
                 this.loadTags(),
-                this.loadFeaturedRecipes()
+                this.loadFeaturedRecipes(),
+                this.updateStats()
             ]);
         } catch (error) {
             console.error('Error loading initial data:', error);
@@ -497,27 +536,107 @@ class RecipeApp {
         }
     }
 
+    // List routes return {recipes, next_cursor, total}; the alternative app.py server still sends a bare array
+    readPage(data) {
+        if (Array.isArray(data)) {
+            return { recipes: data, next_cursor: null, total: data.length };
+        }
+        return data;
+    }
+
+    async loadRecipePage(params, append = false) {
+        // Cards only need the card fields; full text comes from /recipe/<id>
+        const query = new URLSearchParams(params);
+        query.set('view', 'card');
+        if (append && this.nextCursor) query.set('cursor', this.nextCursor);
+        else query.set('facets', '1');
+
+        const data = await this.fetchAPI(`/search?${query.toString()}`);
+        const page = this.readPage(data);
+        if (Array.isArray(data)) page.recipes = this.sortRecipes(page.recipes, query.get('sort'));
+        this.showRecipePage(page, append);
+    }
+
+    showRecipePage(page, append = false) {
+        const recipes = page.recipes;
+        this.recipes = append ? this.recipes.concat(recipes) : recipes;
+        this.nextCursor = page.next_cursor;
+        if (!append) {
+            this.resultsTotal = page.total ?? recipes.length;
+            this.correctedQuery = page.corrected_query || null;
+        }
+
+        if (!append && page.facets) this.showFacets(page.facets);
+
+        this.displayRecipes(recipes, 'results', append);
+        this.updateResultsCount(this.resultsTotal, this.correctedQuery);
+        document.getElementById('loadMoreButton').style.display = this.nextCursor ? '' : 'none';
+    }
+
+    // Show how many results each filter option would give, e.g. "Dessert (12)"
+    showFacets(facets) {
+        const selects = {
+            categoryFilter: facets.category,
+            difficultyFilter: facets.difficulty,
+            timeFilter: facets.total_time
+        };
+        Object.entries(selects).forEach(([id, counts]) => {
+            if (!counts) return;
+            const lookup = new Map(Object.entries(counts).map(([value, count]) => [value.toLowerCase(), count]));
+            Array.from(document.getElementById(id).options).forEach(option => {
+                if (!option.value) return;
+                if (!option.dataset.label) option.dataset.label = option.textContent.replace(/ \(\d+\)$/, '');
+                option.textContent = `${option.dataset.label} (${lookup.get(option.value.toLowerCase()) || 0})`;
+            });
+        });
+    }
+
+    // Sections in /bootstrap list recipe ids; each card is sent once under `recipes`
+    applyBootstrap(data) {
+        const cards = ids => ids.map(id => data.recipes[id]);
+
+        this.listParams = new URLSearchParams();
+        this.showRecipePage({ ...data.all, recipes: cards(data.all.ids) });
+        this.displayRecipes(cards(data.popular), 'popularResults');
+        this.displayRecipes(cards(data.quick_meals), 'quickMealsResults');
+        console.log('Featured recipes loaded:', cards(data.featured));
+        this.tags = data.tags;
+        this.showCategories(data.categories);
+        this.showStats(data.stats);
+    }
+
     async loadAllRecipes() {
         try {
-            this.recipes = await this.fetchAPI('/search');
-            this.displayRecipes(this.recipes, 'results');
-            this.updateResultsCount(this.recipes.length);
+            this.listParams = new URLSearchParams();
+            await this.loadRecipePage(this.listParams);
         } catch (error) {
             this.showError('Failed to load recipes');
         }
     }
 
+    async loadMoreRecipes() {
+        if (!this.nextCursor) return;
+        try {
+            await this.loadRecipePage(this.listParams, true);
+        } catch (error) {
+            this.showError('Failed to load more recipes');
+        }
+    }
+
     async loadCategories() {
         try {
-            const categoriesData = await this.fetchAPI('/categories');
-            this.categories = categoriesData;
-            this.populateCategoryFilters();
-            this.displayCategories();
+            this.showCategories(await this.fetchAPI('/categories'));
         } catch (error) {
             this.showError('Failed to load categories');
         }
     }
 
+    showCategories(categories) {
+        this.categories = categories;
+        this.populateCategoryFilters();
+        this.displayCategories();
+    }
+
     async loadTags() {
         try {
             this.tags = await this.fetchAPI('/tags');
@@ -528,7 +647,7 @@ class RecipeApp {
 
     async loadPopularRecipes() {
         try {
-            const recipes = await this.fetchAPI('/popular');
+            const recipes = await this.fetchAPI('/popular?view=card');
             this.displayRecipes(recipes, 'popularResults');
         } catch (error) {
             document.getElementById('popularResults').innerHTML = 
@@ -538,7 +657,7 @@ class RecipeApp {
 
     async loadQuickMeals() {
         try {
-            const recipes = await this.fetchAPI('/quick-meals');
+            const recipes = await this.fetchAPI('/quick-meals?view=card');
             this.displayRecipes(recipes, 'quickMealsResults');
         } catch (error) {
             document.getElementById('quickMealsResults').innerHTML = 
@@ -548,7 +667,7 @@ class RecipeApp {
 
     async loadFeaturedRecipes() {
         try {
-            const recipes = await this.fetchAPI('/featured');
+            const recipes = await this.fetchAPI('/featured?view=card');
             // You can display featured recipes in a special section if needed
             console.log('Featured recipes loaded:', recipes);
         } catch (error) {
@@ -614,10 +733,10 @@ class RecipeApp {
         });
     }
 
-    displayRecipes(recipes, containerId) {
+    displayRecipes(recipes, containerId, append = false) {
         const container = document.getElementById(containerId);
         
-        if (!recipes || recipes.length === 0) {
+        if (!append && (!recipes || recipes.length === 0)) {
             container.innerHTML = '<div class="no-results">No recipes found</div>';
             return;
         }
@@ -628,39 +747,43 @@ class RecipeApp {
             const card = this.createRecipeCard(recipe);
             recipeCards.push(card);
         }
-        container.innerHTML = recipeCards.join('');
+        const template = document.createElement('div');
+        template.innerHTML = recipeCards.join('');
+        const newCards = Array.from(template.children);
+
+        if (!append) container.innerHTML = '';
+        newCards.forEach(card => container.appendChild(card));
         
-        // Add event listeners
-        container.querySelectorAll('.recipe-card').forEach(card => {
+        // Add event listeners to the cards added by this call only
+        newCards.forEach(card => {
             card.addEventListener('click', (e) => {
                 if (!e.target.closest('.recipe-actions')) {
                     this.showRecipeDetails(card.dataset.recipeId);
                 }
             });
-        });
 
-        // Add favorite button events
-        container.querySelectorAll('.favorite-btn').forEach(async (btn) => {
-            const recipeId = btn.dataset.recipeId;
-            const isFavorited = await this.checkFavoriteStatus(recipeId);
-            
-            if (isFavorited) {
-                btn.classList.add('favorited');
-                btn.innerHTML = '<i class="fas fa-heart"></i> Favorited';
-            }
-            
-            btn.addEventListener('click', async (e) => {
-                e.stopPropagation();
-                await this.toggleFavorite(recipeId, isFavorited);
+            // Add favorite button events
+            card.querySelectorAll('.favorite-btn').forEach(async (btn) => {
+                const recipeId = btn.dataset.recipeId;
+                const isFavorited = await this.checkFavoriteStatus(recipeId);
+                
+                if (isFavorited) {
+                    btn.classList.add('favorited');
+                    btn.innerHTML = '<i class="fas fa-heart"></i> Favorited';
+                }
+                
+                btn.addEventListener('click', async (e) => {
+                    e.stopPropagation();
+                    await this.toggleFavorite(recipeId);
+                });
             });
-        });
 
-        // Add view recipe button events
-        container.querySelectorAll('.view-recipe').forEach(btn => {
-            btn.addEventListener('click', (e) => {
-                e.stopPropagation();
-                const recipeId = e.target.closest('.recipe-card').dataset.recipeId;
-                this.showRecipeDetails(recipeId);
+            // Add view recipe button events
+            card.querySelectorAll('.view-recipe').forEach(btn => {
+                btn.addEventListener('click', (e) => {
+                    e.stopPropagation();
+                    this.showRecipeDetails(card.dataset.recipeId);
+                });
             });
         });
     }
@@ -719,6 +842,32 @@ class RecipeApp {
         `;
     }
 
+    // Typeahead: /suggest answers from the server's in-memory index, and each prefix is asked once
+    async loadSuggestions(prefix) {
+        if (prefix.trim().length < 2) return;
+        const key = prefix.toLowerCase();
+        let suggestions = this.suggestionCache.get(key);
+        if (!suggestions) {
+            try {
+                const data = await this.fetchAPI(`/suggest?prefix=${encodeURIComponent(prefix)}`);
+                suggestions = data.suggestions;
+                this.suggestionCache.set(key, suggestions);
+            } catch (error) {
+                return;
+            }
+        }
+
+        // A slow answer for an earlier keystroke must not replace the current list
+        if (document.getElementById('searchInput').value !== prefix) return;
+        const options = suggestions.map(suggestion => {
+            const option = document.createElement('option');
+            option.value = suggestion.text;
+            option.label = suggestion.type;
+            return option;
+        });
+        document.getElementById('searchSuggestions').replaceChildren(...options);
+    }
+
     async searchRecipes() {
         const query = document.getElementById('searchInput').value.trim();
         this.currentFilters.query = query;
@@ -739,19 +888,19 @@ class RecipeApp {
             if (category) params.append('category', category);
             if (difficulty) params.append('difficulty', difficulty);
             if (max_time) params.append('max_time', max_time);
+            // Relevance (empty) leaves the order to the server: best match for text searches, name otherwise
+            if (sort) params.append('sort', sort);
 
-            const recipes = await this.fetchAPI(`/search?${params.toString()}`);
-            
-            // Apply sorting
-            const sortedRecipes = this.sortRecipes(recipes, sort);
-            this.displayRecipes(sortedRecipes, 'results');
-            this.updateResultsCount(sortedRecipes.length);
+            this.listParams = params;
+            await this.loadRecipePage(params);
         } catch (error) {
             this.showError('Failed to apply filters');
         }
     }
 
     sortRecipes(recipes, sortBy) {
+        // Relevance keeps the server's order
+        if (!sortBy) return recipes;
         return [...recipes].sort((a, b) => {
             switch (sortBy) {
                 case 'time':
@@ -778,14 +927,14 @@ class RecipeApp {
         document.getElementById('categoryFilter').value = '';
         document.getElementById('difficultyFilter').value = '';
         document.getElementById('timeFilter').value = '';
-        document.getElementById('sortFilter').value = 'name';
+        document.getElementById('sortFilter').value = '';
         
         this.currentFilters = {
             query: '',
             category: '',
             difficulty: '',
             max_time: '',
-            sort: 'name'
+            sort: ''
         };
 
         this.loadAllRecipes();
@@ -955,7 +1104,12 @@ class RecipeApp {
         }
         
         favoriteBtn.addEventListener('click', async () => {
-            await this.toggleFavorite(recipeId, isFavorited);
+            await this.toggleFavorite(recipeId);
+            const favorited = await this.checkFavoriteStatus(recipeId);
+            favoriteBtn.classList.toggle('favorited', favorited);
+            favoriteBtn.innerHTML = favorited ?
+                '<i class="fas fa-heart"></i> Favorited' :
+                '<i class="far fa-heart"></i> Add to Favorites';
         });
     }
 
@@ -1126,27 +1280,32 @@ class RecipeApp {
         }
     }
 
-    updateResultsCount(count) {
-        document.getElementById('resultsCount').textContent = `${count} recipe${count !== 1 ? 's' : ''} found`;
+    updateResultsCount(count, correctedQuery = null) {
+        const found = `${count} recipe${count !== 1 ? 's' : ''} found`;
+        // /search adds matches for the corrected spelling when the typed one finds little
+        document.getElementById('resultsCount').textContent =
+            correctedQuery ? `${found} (including results for "${correctedQuery}")` : found;
     }
 
     async updateStats() {
         try {
-            const stats = await this.fetchAPI('/stats');
-            
-            document.getElementById('recipeCount').textContent = `${stats.total_recipes} Recipes`;
-            document.getElementById('categoryCount').textContent = `${stats.total_categories} Categories`;
-            document.getElementById('totalRecipes').textContent = `${stats.total_recipes} Recipes Available`;
-            
-            // Update API status
-            document.getElementById('apiStatus').className = 'status-online';
-            document.getElementById('apiStatus').textContent = '● API Online';
+            this.showStats(await this.fetchAPI('/stats'));
         } catch (error) {
             document.getElementById('apiStatus').className = 'status-offline';
             document.getElementById('apiStatus').textContent = '● API Offline';
         }
     }
 
+    showStats(stats) {
+        document.getElementById('recipeCount').textContent = `${stats.total_recipes} Recipes`;
+        document.getElementById('categoryCount').textContent = `${stats.total_categories} Categories`;
+        document.getElementById('totalRecipes').textContent = `${stats.total_recipes} Recipes Available`;
+        
+        // Update API status
+        document.getElementById('apiStatus').className = 'status-online';
+        document.getElementById('apiStatus').textContent = '● API Online';
+    }
+
     showSuccess(message) {
         // Create temporary success message
         const successDiv = document.createElement('div');
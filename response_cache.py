@@ -0,0 +1,149 @@
+"""
+Per-process cache and HTTP validators for the read endpoints.
+
+Entries are keyed by route plus normalized query arguments and remember the
+data versions (see catalog.py) they were computed from. A lookup misses when
+the entry has expired, or when any of the scopes it depends on has moved on
+since, so writes invalidate exactly the routes that read what they changed.
+
+The same versions give every read route a strong ETag that is known before
+the handler runs, so a matching If-None-Match is answered with 304 without
+touching the database. A response the handler read from a replica that has
+not reached those versions yet (see db_pool.ReplicaVersions) is neither
+cached nor ETagged.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+
+# Changes with every deploy so a new response format never matches an old ETag
+ETAG_BUILD = (os.environ.get('RENDER_GIT_COMMIT') or os.environ.get('APP_VERSION') or 'dev')[:12]
+
+
+class ResponseCache:
+    """Bounded LRU of serialized JSON responses with TTLs and version checks."""
+
+    def __init__(self, version_source, is_current=None, max_entries=RESPONSE_CACHE_SIZE):
+        self._version_source = version_source
+        # is_current(scopes, versions): False when the handler's data may predate `versions`
+        self._is_current = is_current or (lambda scopes, versions: True)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    def get(self, key, versions):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, entry_versions, body = entry
+            if expires_at <= now or entry_versions != versions:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key, versions, body, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, versions, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+        }
+
+    @staticmethod
+    def etag(versions):
+        """Strong ETag for a response computed from these data versions."""
+        return '-'.join([ETAG_BUILD, *(str(version) for version in versions)])
+
+    def cached(self, ttl, scopes):
+        """Cache a JSON route for `ttl` seconds or until one of `scopes` changes."""
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                key = (request.path, normalized_args())
+                # Read before computing so a write racing with us invalidates the entry
+                versions = self._version_source(scopes)
+                body = self.get(key, versions)
+                if body is not None:
+                    return Response(body, mimetype='application/json')
+
+                response = make_response(f(*args, **kwargs))
+                if response.status_code == 200 and self._is_current(scopes, versions):
+                    self.set(key, versions, response.get_data(), ttl)
+                return response
+            return decorated
+        return decorator
+
+    def conditional(self, scopes, cache_control, on_not_modified=None):
+        """Send a version-derived ETag and Cache-Control, and answer 304 early.
+
+        `on_not_modified(*args, **kwargs)` runs instead of the handler when the
+        client copy is current, for side effects such as counting a view.
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                versions = self._version_source(scopes)
+                etag = self.etag(versions)
+
+                if request.if_none_match.contains(etag):
+                    self.not_modified += 1
+                    if on_not_modified:
+                        on_not_modified(*args, **kwargs)
+                    response = Response(status=304)
+                else:
+                    response = make_response(f(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not self._is_current(scopes, versions):
+                        # Read from a lagging replica: valid now, but not under this ETag
+                        response.headers['Cache-Control'] = 'no-cache'
+                        return response
+
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = cache_control
+                return response
+            return decorated
+        return decorator
+
+
+def normalized_args():
+    """Query arguments as a sorted tuple, ignoring empty values."""
+    return tuple(sorted(
+        (name, value.strip())
+        for name, values in request.args.lists()
+        for value in values
+        if value.strip()
+    ))
@@ -0,0 +1,127 @@
+import mysql.connector
+import datetime
+import os
+import sys
+import time
+
+from trending import TRENDING_SIZE, TRENDING_WINDOWS
+
+CONFIG = {
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),  # Required: Set via environment variable
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'database': os.environ.get('DB_NAME', 'recipe_finder'),
+    'autocommit': True
+}
+
+# Seconds between ticks with --loop
+ROLLUP_INTERVAL = int(os.environ.get('VIEW_ROLLUP_INTERVAL', 300))
+
+CREATE_BUCKETS_TABLE = """
+    CREATE TABLE IF NOT EXISTS recipe_view_buckets (
+        recipe_id INT NOT NULL,
+        bucket_start DATETIME NOT NULL,
+        views INT NOT NULL,
+        PRIMARY KEY (recipe_id, bucket_start),
+        INDEX view_bucket_start_index (bucket_start)
+    )
+"""
+
+CREATE_TRENDING_TABLE = """
+    CREATE TABLE IF NOT EXISTS recipe_trending (
+        time_window VARCHAR(8) NOT NULL,
+        rank_pos INT NOT NULL,
+        recipe_id INT NOT NULL,
+        score DOUBLE NOT NULL,
+        PRIMARY KEY (time_window, rank_pos)
+    )
+"""
+
+# Recounts whole hours, so running it twice over the same range is harmless
+ROLLUP_BUCKETS = """
+    INSERT INTO recipe_view_buckets (recipe_id, bucket_start, views)
+    SELECT recipe_id, TIMESTAMP(DATE(viewed_at), MAKETIME(HOUR(viewed_at), 0, 0)), COUNT(*)
+    FROM recipe_views
+    WHERE viewed_at >= %s AND recipe_id IS NOT NULL
+    GROUP BY recipe_id, TIMESTAMP(DATE(viewed_at), MAKETIME(HOUR(viewed_at), 0, 0))
+    ON DUPLICATE KEY UPDATE views = VALUES(views)
+"""
+
+# A bucket's views count half as much every half-life since the bucket started
+TRENDING_SCORES = """
+    SELECT recipe_id, SUM(views * POW(0.5, TIMESTAMPDIFF(MINUTE, bucket_start, %s) / 60 / %s)) AS score
+    FROM recipe_view_buckets
+    WHERE bucket_start >= %s
+    GROUP BY recipe_id
+    ORDER BY score DESC, recipe_id
+    LIMIT %s
+"""
+
+def rollup_start(cursor, now):
+    """First hour to recount: the hour before the newest bucket, so views flushed late are caught.
+
+    With no buckets yet, the longest trending window is backfilled.
+    """
+    cursor.execute("SELECT MAX(bucket_start) FROM recipe_view_buckets")
+    newest = cursor.fetchone()[0]
+    if newest is None:
+        newest = now - datetime.timedelta(hours=max(hours for hours, _ in TRENDING_WINDOWS.values()))
+    return newest.replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=1)
+
+def rank_trending(cnx, cursor, now):
+    """Rewrite recipe_trending for every window, each in its own transaction."""
+    current_hour = now.replace(minute=0, second=0, microsecond=0)
+    for window, (hours, half_life) in TRENDING_WINDOWS.items():
+        cursor.execute(TRENDING_SCORES, (now, half_life, current_hour - datetime.timedelta(hours=hours), TRENDING_SIZE))
+        ranked = [(window, rank, recipe_id, float(score)) for rank, (recipe_id, score) in enumerate(cursor.fetchall(), 1)]
+
+        cnx.start_transaction()
+        cursor.execute("DELETE FROM recipe_trending WHERE time_window = %s", (window,))
+        if ranked:
+            cursor.executemany(
+                "INSERT INTO recipe_trending (time_window, rank_pos, recipe_id, score) VALUES (%s, %s, %s, %s)",
+                ranked
+            )
+        cnx.commit()
+        print(f"  {window}: {len(ranked)} recipes ranked")
+
+def rollup():
+    """Roll recent recipe_views into hourly buckets and re-rank /trending.
+
+    Meant to run every few minutes (cron, or --loop). Each run recounts the
+    hours since the newest bucket. Views are timestamped by the API with its
+    local clock, and the decay is measured on the same clock.
+    """
+    try:
+        print(f"Connecting to database at {CONFIG['host']}...")
+        cnx = mysql.connector.connect(**CONFIG)
+        cursor = cnx.cursor()
+
+        cursor.execute(CREATE_BUCKETS_TABLE)
+        cursor.execute(CREATE_TRENDING_TABLE)
+        cursor.execute("INSERT IGNORE INTO data_versions (scope) VALUES ('trending')")
+
+        now = datetime.datetime.now()
+        start = rollup_start(cursor, now)
+        cursor.execute(ROLLUP_BUCKETS, (start,))
+        print(f"Rolled up views since {start:%Y-%m-%d %H:00}")
+
+        rank_trending(cnx, cursor, now)
+        # Cached /trending responses carry this counter in their ETag
+        cursor.execute("UPDATE data_versions SET version = version + 1 WHERE scope = 'trending'")
+
+        cursor.close()
+        cnx.close()
+
+    except mysql.connector.Error as err:
+        print(f"Error: {err}")
+
+if __name__ == "__main__":
+    if '--loop' in sys.argv[1:]:
+        while True:
+            started = time.monotonic()
+            rollup()
+            time.sleep(max(ROLLUP_INTERVAL - (time.monotonic() - started), 0))
+    else:
+        rollup()
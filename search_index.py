@@ -0,0 +1,148 @@
+"""
+Inverted index with field-weighted BM25 (BM25F) ranking for /search.
+
+Built from the catalog snapshot, so text matching never reaches MySQL. Each
+term keeps a posting list of (document, pseudo term frequency) pairs where the
+pseudo frequency already folds in field weights and length normalisation, so a
+query only has to walk the postings of its own terms.
+"""
+
+import math
+import re
+from array import array
+from bisect import bisect_left
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# A term in the name is worth three in the description
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'tags': 2.0,
+    'ingredients': 1.5,
+    'description': 1.0,
+}
+
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens."""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def recipe_fields(recipe):
+    """Return the tokenized searchable fields of a catalog recipe."""
+    return {
+        'name': tokenize(recipe.name),
+        'tags': tokenize(' '.join(recipe.tags)),
+        'ingredients': tokenize(recipe.ingredients),
+        'description': tokenize(recipe.description),
+    }
+
+
+class SearchIndex:
+    """Field-weighted BM25 index over name, tags, ingredients and description."""
+
+    def __init__(self):
+        self.version = None
+        self.doc_ids = array('I')
+        self.terms = []
+        self.postings = {}
+
+    def rebuild(self, snapshot):
+        """Rebuild from a catalog snapshot and swap the new index in atomically."""
+        docs = [recipe_fields(recipe) for recipe in snapshot.recipes]
+        doc_count = len(docs)
+
+        avg_lengths = {}
+        for field in FIELD_WEIGHTS:
+            total = sum(len(doc[field]) for doc in docs)
+            avg_lengths[field] = (total / doc_count) if doc_count and total else 1.0
+
+        pseudo_tf = {}
+        for position, doc in enumerate(docs):
+            doc_terms = {}
+            for field, weight in FIELD_WEIGHTS.items():
+                tokens = doc[field]
+                if not tokens:
+                    continue
+                norm = 1 - B + B * len(tokens) / avg_lengths[field]
+                for token in tokens:
+                    doc_terms[token] = doc_terms.get(token, 0.0) + weight / norm
+            for term, tf in doc_terms.items():
+                pseudo_tf.setdefault(term, []).append((position, tf))
+
+        postings = {}
+        for term, entries in pseudo_tf.items():
+            df = len(entries)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            positions = array('I', (position for position, _ in entries))
+            scores = array('f', (idf * tf * (K1 + 1) / (K1 + tf) for _, tf in entries))
+            postings[term] = (positions, scores)
+
+        self.doc_ids, self.terms, self.postings, self.version = (
+            array('I', (recipe.id for recipe in snapshot.recipes)),
+            sorted(postings),
+            postings,
+            snapshot.version,
+        )
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def has_prefix(self, prefix):
+        """Whether any indexed term starts with `prefix`."""
+        terms = self.terms
+        start = bisect_left(terms, prefix)
+        return start < len(terms) and terms[start].startswith(prefix)
+
+    def _expand_prefix(self, prefix):
+        """Return every indexed term starting with `prefix`."""
+        terms = self.terms
+        start = bisect_left(terms, prefix)
+        matches = []
+        for term in terms[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def search(self, query):
+        """Return [(recipe_id, score)] for documents matching every query term.
+
+        The last token is treated as a prefix so results keep up with the user
+        while they type; the others must match whole terms.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        postings, doc_ids = self.postings, self.doc_ids
+        scores = None
+        for i, token in enumerate(tokens):
+            if i == len(tokens) - 1:
+                expansions = self._expand_prefix(token)
+            else:
+                expansions = [token] if token in postings else []
+
+            term_scores = {}
+            for term in expansions:
+                positions, weights = postings[term]
+                for position, weight in zip(positions, weights):
+                    if weight > term_scores.get(position, 0.0):
+                        term_scores[position] = weight
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {position: score + term_scores[position]
+                          for position, score in scores.items() if position in term_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(doc_ids[position], score) for position, score in ranked]
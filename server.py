@@ -1,42 +1,45 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, make_response, request, send_from_directory
 from flask_cors import CORS
-import mysql.connector
 import os
 import datetime
 import uuid
 from functools import wraps
-import bcrypt
 import jwt
 import re
+import threading
+import time
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 CORS(app, supports_credentials=True)
 
-from mysql.connector import pooling
-
-# Database configuration
-# Use environment variables for production (Render), fallback to local defaults
-DB_CONFIG = {
-    "host": os.environ.get("DB_HOST", "localhost"),
-    "user": os.environ.get("DB_USER", "root"),
-    "password": os.environ.get("DB_PASSWORD", ""),  # Required: Set via environment variable
-    "database": os.environ.get("DB_NAME", "recipe_finder"),
-    "port": int(os.environ.get("DB_PORT", 3306))
-}
-
-# Create a connection pool
-try:
-    db_pool = pooling.MySQLConnectionPool(
-        pool_name="recipe_pool",
-        pool_size=5,
-        pool_reset_session=True,
-        **DB_CONFIG
-    )
-    print("✅ Database connection pool created successfully")
-except Exception as e:
-    print(f"❌ Failed to create database connection pool: {e}")
-    db_pool = None
+from db_pool import DB_CONFIG, ConnectionPool, ReplicaRouter
+from catalog import Catalog
+from search_index import SearchIndex, tokenize
+from similarity import SIMILAR_NEIGHBORS, SimilarityIndex
+from pantry import MAX_PANTRY_ITEMS, PantryIndex
+from suggest import SUGGEST_MAX_RESULTS, SuggestIndex
+from fuzzy import FUZZY_MIN_RESULTS, FUZZY_SCORE_WEIGHT, FuzzyIndex
+from facets import TAG_MODES, FacetIndex
+from sort_index import SortIndex
+from trending import TRENDING_SIZE, TRENDING_WINDOWS
+from batch_writer import BatchWriter
+from password_hasher import HasherBusy, PasswordHasher
+from response_cache import ResponseCache
+from models import VIEWS, FieldSet, encode_value, recipe_response, recipes_by_id_json, recipes_response
+from pagination import (
+    DEFAULT_PAGE_SIZE, IN_MEMORY, PageRequest, RECENT, RELEVANCE, SORT_KEYS, encode_cursor, page_response
+)
+
+# Connection pool; size, overflow and timeouts come from the DB_POOL_* variables
+db_pool = ConnectionPool(DB_CONFIG)
+
+# Read-only routes use the DB_REPLICA_HOSTS replicas when configured
+db_router = ReplicaRouter.from_env(db_pool)
+
+# After a write, the client's reads stay on the primary until replication catches up
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+READ_PRIMARY_COOKIE = 'read_primary_until'
 
 def generate_token(user_id):
     """Generate JWT token for a user."""
@@ -77,15 +80,75 @@ def token_required(f):
     return decorated
 
 def get_db_connection():
-    """Get a connection from the pool"""
+    """Get a connection from the pool, waiting up to DB_POOL_TIMEOUT for a free one"""
     try:
-        if db_pool:
-            return db_pool.get_connection()
-        else:
-            return mysql.connector.connect(**DB_CONFIG)
+        return db_pool.get_connection()
+    except Exception as e:
+        print(f"❌ Database connection error: {e}")
+        return None
+
+def get_read_connection():
+    """Get a connection for a read-only route: a replica unless this client just wrote"""
+    try:
+        conn = db_router.read_connection(primary=wrote_recently())
     except Exception as e:
         print(f"❌ Database connection error: {e}")
         return None
+    replica = db_router.last_replica()
+    if replica is not None:
+        g.setdefault('read_replicas', set()).add(replica)
+    return conn
+
+def read_is_current(scopes, versions):
+    """Whether every replica this request read from is known to have reached `versions`"""
+    return not any(
+        db_router.replica_versions.behind(replica, scopes, versions) for replica in g.get('read_replicas', ())
+    )
+
+def wrote_recently():
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def writes_data(f):
+    """Decorator for write routes: pin the client's reads to the primary for a short window."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if response.status_code < 400 and db_router.replicas:
+            response.set_cookie(
+                READ_PRIMARY_COOKIE, f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}",
+                max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
+    return decorated
+
+# In-memory catalog and full-text index, rebuilt whenever the recipes change
+catalog = Catalog(get_db_connection)
+search_index = SearchIndex()
+catalog.subscribe(search_index.rebuild)
+pantry_index = PantryIndex()
+catalog.subscribe(pantry_index.rebuild)
+suggest_index = SuggestIndex()
+catalog.subscribe(suggest_index.update)
+fuzzy_index = FuzzyIndex()
+catalog.subscribe(fuzzy_index.rebuild)
+facet_index = FacetIndex()
+catalog.subscribe(facet_index.rebuild)
+# Name/time/difficulty/rating/views order of every recipe, for paging /search results without SQL sorting
+sort_index = SortIndex()
+catalog.subscribe(sort_index.rebuild)
+# Precomputed ingredient-vector neighbours for /recipe/<id>/similar
+similarity = SimilarityIndex()
+catalog.subscribe(similarity.update)
+catalog.refresh(force=True)
+
+# Serialized responses of the catalog list routes, invalidated through data_versions
+response_cache = ResponseCache(catalog.version_of, read_is_current)
+
+# bcrypt runs in its own processes so logins cannot starve the recipe routes
+password_hasher = PasswordHasher()
 
 def get_session_id():
     """Generate or get session ID from request"""
@@ -97,6 +160,7 @@ def get_session_id():
 
 # Auth Routes
 @app.route('/register', methods=['POST'])
+@writes_data
 def register():
     try:
         data = request.get_json() or {}
@@ -116,6 +180,12 @@ def register():
         if not re.match(r'^[^@]+@[^@]+\.[^@]+$', email):
             return jsonify({"error": "Invalid email format"}), 400
 
+        # Hash before taking a connection so a queued hash does not hold one
+        try:
+            password_hash = password_hasher.hash(password)
+        except HasherBusy:
+            return hasher_busy_response()
+
         conn = get_db_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
@@ -127,7 +197,6 @@ def register():
             conn.close()
             return jsonify({"error": "User already exists"}), 400
 
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
         cursor.execute(
             "INSERT INTO users (username, email, password_hash, created_at) VALUES (%s, %s, %s, %s)",
             (username, email, password_hash, datetime.datetime.now())
@@ -172,13 +241,30 @@ def login():
         cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
         user = cursor.fetchone()
 
-        if not user or not bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Invalid credentials"}), 401
+        # Release the connection while bcrypt runs; it can wait in the hashing queue
+        cursor.close()
+        conn.close()
+
+        try:
+            if not user or not password_hasher.check(password, user['password_hash']):
+                return jsonify({"error": "Invalid credentials"}), 401
+            new_hash = password_hasher.rehash_if_needed(password, user['password_hash'])
+        except HasherBusy:
+            return hasher_busy_response()
 
         token = generate_token(user['id'])
-        cursor.execute("UPDATE users SET last_login = %s WHERE id = %s", (datetime.datetime.now(), user['id']))
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
+        cursor = conn.cursor()
+        if new_hash:
+            cursor.execute(
+                "UPDATE users SET last_login = %s, password_hash = %s WHERE id = %s",
+                (datetime.datetime.now(), new_hash, user['id'])
+            )
+        else:
+            cursor.execute("UPDATE users SET last_login = %s WHERE id = %s", (datetime.datetime.now(), user['id']))
 
         conn.commit()
         cursor.close()
@@ -198,13 +284,19 @@ def login():
         print(f"❌ Login error: {e}")
         return jsonify({"error": "Login failed"}), 500
 
+def hasher_busy_response():
+    response = jsonify({"error": "Too many sign-in attempts right now, please retry"})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 @app.route('/profile', methods=['GET'])
 @token_required
 def get_profile():
     try:
         user_id = request.user_id
 
-        conn = get_db_connection()
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
@@ -228,6 +320,7 @@ def get_profile():
         return jsonify({"error": "Failed to fetch profile"}), 500
 
 @app.route('/profile', methods=['PUT'])
+@writes_data
 @token_required
 def update_profile():
     try:
@@ -266,42 +359,43 @@ def update_profile():
 def get_favorites():
     try:
         user_id = request.user_id
+        page = PageRequest.from_args(request.args, (RECENT.name,), RECENT.name)
+        fields = FieldSet.from_args(request.args)
 
-        conn = get_db_connection()
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count,
-                   f.created_at as favorited_at
+        cursor = conn.cursor()
+
+        total = None
+        if page.first:
+            cursor.execute("SELECT COUNT(*) FROM user_favorites WHERE user_id = %s", (user_id,))
+            total = cursor.fetchone()[0]
+
+        keyset, keyset_params = page.keyset_sql(RECENT)
+        cursor.execute(f"""
+            SELECT {fields.select_list()}, f.created_at as favorited_at
             FROM user_favorites f
             JOIN recipes r ON f.recipe_id = r.id
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
+            {RECIPE_JOINS}
             WHERE f.user_id = %s
-            GROUP BY r.id
-            ORDER BY f.created_at DESC
-        """, (user_id,))
-
-        favorites = cursor.fetchall()
-        for recipe in favorites:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
+        """ + keyset + page.order_sql(RECENT), [user_id] + keyset_params)
 
+        favorites, next_cursor = page.paginate(fields.load(cursor, always=('favorited_at',)), RECENT)
         cursor.close()
         conn.close()
 
-        return jsonify(favorites)
+        return page_response(favorites, next_cursor, total)
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Favorites error: {e}")
         return jsonify({"error": "Failed to fetch favorites"}), 500
 
 @app.route('/favorites/<int:recipe_id>', methods=['POST'])
+@writes_data
 @token_required
 def add_favorite(recipe_id):
     try:
@@ -340,6 +434,7 @@ def add_favorite(recipe_id):
         return jsonify({"error": "Failed to add favorite"}), 500
 
 @app.route('/favorites/<int:recipe_id>', methods=['DELETE'])
+@writes_data
 @token_required
 def remove_favorite(recipe_id):
     try:
@@ -368,7 +463,7 @@ def check_favorite(recipe_id):
     try:
         user_id = request.user_id
 
-        conn = get_db_connection()
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
@@ -385,388 +480,712 @@ def check_favorite(recipe_id):
         print(f"❌ Check favorite error: {e}")
         return jsonify({"error": "Failed to check favorite"}), 500
 
+# Upper bound on ids per POST /favorites/check
+MAX_FAVORITE_CHECK = 500
+
+@app.route('/favorites/check', methods=['POST'])
+@token_required
+def check_favorites():
+    """Favorite status of many recipes in one indexed query"""
+    try:
+        user_id = request.user_id
+        data = request.get_json(silent=True) or {}
+        recipe_ids = data.get('recipe_ids')
+
+        if not isinstance(recipe_ids, list) or not all(type(recipe_id) is int for recipe_id in recipe_ids):
+            return jsonify({"error": "recipe_ids must be a list of integers"}), 400
+        if len(recipe_ids) > MAX_FAVORITE_CHECK:
+            return jsonify({"error": f"At most {MAX_FAVORITE_CHECK} recipe_ids per request"}), 400
+
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        if not recipe_ids:
+            return jsonify({"favorited": []})
+
+        conn = get_read_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
+
+        # Served by the unique (user_id, recipe_id) key
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT recipe_id FROM user_favorites WHERE user_id = %s AND recipe_id IN (%s)"
+            % ("%s", ", ".join(["%s"] * len(recipe_ids))),
+            [user_id] + recipe_ids
+        )
+        favorited = sorted(row[0] for row in cursor.fetchall())
+
+        cursor.close()
+        conn.close()
+
+        return jsonify({"favorited": favorited})
+
+    except Exception as e:
+        print(f"❌ Check favorites error: {e}")
+        return jsonify({"error": "Failed to check favorites"}), 500
+
+@app.route('/favorites/ids', methods=['GET'])
+@token_required
+def get_favorite_ids():
+    """The user's whole favorite id set, revalidated by a content ETag"""
+    try:
+        user_id = request.user_id
+
+        conn = get_read_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT recipe_id FROM user_favorites WHERE user_id = %s ORDER BY recipe_id", (user_id,))
+        recipe_ids = [row[0] for row in cursor.fetchall()]
+
+        cursor.close()
+        conn.close()
+
+        response = jsonify({"recipe_ids": recipe_ids})
+        response.add_etag()
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Authorization')
+        return response.make_conditional(request)
+
+    except Exception as e:
+        print(f"❌ Favorite ids error: {e}")
+        return jsonify({"error": "Failed to fetch favorite ids"}), 500
+
 # Recipe Routes
+RECIPE_JOINS = """
+    LEFT JOIN recipe_stats s ON r.id = s.recipe_id
+    LEFT JOIN recipe_nutrition n ON r.id = n.recipe_id
+"""
+
+def recipe_list_sql(fields, *required):
+    """SELECT of the requested fields over recipes and their stats, open for AND conditions"""
+    return f"SELECT {fields.select_list(*required)} FROM recipes r {RECIPE_JOINS} WHERE 1=1"
+
+# Fixed home page sections: (conditions, ORDER BY, LIMIT), shared with /bootstrap
+POPULAR_SECTION = (
+    "", "COALESCE(s.view_count, 0) DESC, COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) DESC", 8
+)
+QUICK_MEALS_SECTION = (
+    " AND (r.is_quick_meal = TRUE OR (r.prep_time + r.cook_time) <= 30)", "(r.prep_time + r.cook_time) ASC", 10
+)
+FEATURED_SECTION = (" AND r.is_featured = TRUE", "r.created_at DESC", 6)
+
+def section_sql(select, section):
+    where, order, limit = section
+    return f"SELECT {select} FROM recipes r {RECIPE_JOINS} WHERE 1=1{where} ORDER BY {order} LIMIT {limit}"
+
+def fetch_recipe_page(cursor, fields, where, params, page, total=None):
+    """Run recipe_list_sql() + `where` for one keyset page.
+
+    Returns (recipes, next_cursor, total); the total is only counted for the
+    first page, when the caller does not already know it.
+    """
+    sort_key = SORT_KEYS[page.sort]
+    if page.first and total is None:
+        cursor.execute("SELECT COUNT(*) FROM recipes r WHERE 1=1" + where, params)
+        total = cursor.fetchone()[0]
+
+    keyset, keyset_params = page.keyset_sql(sort_key)
+    sql = recipe_list_sql(fields, sort_key.field) + where + keyset + page.order_sql(sort_key)
+    cursor.execute(sql, params + keyset_params)
+    recipes, next_cursor = page.paginate(fields.load(cursor), sort_key)
+    return recipes, next_cursor, total if page.first else None
+
+def fetch_recipes_by_id(cursor, fields, recipe_ids):
+    """Fetch recipes by id, in the order given"""
+    if not recipe_ids:
+        return []
+    cursor.execute(
+        recipe_list_sql(fields) + " AND r.id IN (%s)" % ", ".join(["%s"] * len(recipe_ids)),
+        recipe_ids
+    )
+    rank = {recipe_id: i for i, recipe_id in enumerate(recipe_ids)}
+    return sorted(fields.load(cursor), key=lambda recipe: rank[recipe.id])
+
+# Best-scoring text matches MySQL sorts by another key while the sort index is still loading
+SEARCH_SORT_CANDIDATES = int(os.environ.get('SEARCH_SORT_CANDIDATES', 1000))
+
 @app.route('/search', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings', 'views'), 'public, max-age=30')
 def search_recipe():
+    started = time.perf_counter()
     try:
         query = request.args.get('q', '').strip().lower()
         category = request.args.get('category', '')
         difficulty = request.args.get('difficulty', '')
         max_time = request.args.get('max_time', '')
         tags = request.args.get('tags', '')
+        tag_list = sorted({tag.strip().lower() for tag in tags.split(',') if tag.strip()})
+        # tag_mode: any (default) of the tags, all of them, or none of them
+        tag_mode = request.args.get('tag_mode', 'any').strip().lower() or 'any'
+        if tag_mode not in TAG_MODES:
+            raise ValueError(f"Unsupported tag_mode: {tag_mode}")
+
+        # facets=1 adds counts per category, difficulty, cuisine, time and tag for this result set
+        want_facets = request.args.get('facets', '').lower() in ('1', 'true')
+
+        # Text matching and filters are answered in memory; MySQL only fetches the rows
+        snapshot = catalog.current() if (query or tag_list or want_facets) else None
+        masks = None
+        ranked = None
+        candidates = None
+        hits = None
+        corrected = None
+        if snapshot is not None and facet_index.ready:
+            masks = facet_index.filter_masks(category, difficulty, max_time, tag_list, tag_mode)
+            allowed = facet_index.combine(masks)
+            if query and search_index.ready:
+                hits = search_index.search(query)
+                ranked = facet_index.select(hits, allowed)
+                # Few hits often means a typo ("biriyani", "paner"): blend in the corrected query's matches
+                if len(ranked) < FUZZY_MIN_RESULTS and fuzzy_index.ready:
+                    corrected = fuzzy_index.correct(query, known=search_index.has_prefix)
+                    if corrected:
+                        corrected_hits = search_index.search(corrected)
+                        hits = hits + corrected_hits
+                        ranked = blend_corrected(ranked, facet_index.select(corrected_hits, allowed))
+            elif not query and tag_list:
+                # The tag index picks the recipes
+                candidates = facet_index.ids(allowed)
+            sort_index.refresh_stats((catalog.versions.get('ratings'), catalog.versions.get('views')), load_sort_stats)
+
+        if ranked is not None:
+            page = PageRequest.from_args(request.args, (RELEVANCE, *SORT_KEYS), RELEVANCE)
+        else:
+            page = PageRequest.from_args(request.args, SORT_KEYS, 'name')
+        fields = FieldSet.from_args(request.args)
 
-        conn = get_db_connection()
+        # Text or tag matches in another order are paged by the sort index. The SQL path orders names
+        # and ratings slightly differently, so each path only resumes the cursors it issued.
+        in_memory = (ranked is not None or candidates is not None) and sort_index.supports(page.sort)
+        if page.origin == IN_MEMORY and not in_memory:
+            raise ValueError("Cursor expired; request the first page again")
+        in_memory = in_memory and (page.first or page.origin == IN_MEMORY)
+
+        extras = {"corrected_query": corrected}
+        if want_facets:
+            extras["facets"] = search_facets(query, hits, masks) if page.first else None
+
+        if ranked == [] or (candidates is not None and not len(candidates)):
+            log_search_activity(query, category, difficulty, max_time, tags, 0, started)
+            return page_response([], None, 0, **extras)
+
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        # Use stored procedure for advanced search
-        if tags:
-            cursor.callproc('SearchRecipesAdvanced', [query or None, category or None, difficulty or None, int(max_time) if max_time else None, tags or None])
+        if ranked is not None and page.sort == RELEVANCE:
+            recipe_ids, next_cursor = page.slice_ranked(ranked)
+            recipes = fetch_recipes_by_id(cursor, fields, recipe_ids)
+            total = len(ranked) if page.first else None
+        elif in_memory:
+            matched = [recipe_id for recipe_id, _ in ranked] if ranked is not None else candidates
+            recipe_ids, next_cursor = sort_index.page(matched, page)
+            recipes = fetch_recipes_by_id(cursor, fields, recipe_ids)
+            total = len(matched) if page.first else None
         else:
-            # Basic search
-            sql = """
-                SELECT r.*, 
-                       COALESCE(AVG(rt.rating), 0) as avg_rating,
-                       COUNT(rt.id) as review_count,
-                       COUNT(rv.id) as view_count,
-                       n.calories, n.protein_g, n.carbs_g, n.fat_g, n.fiber_g
-                FROM recipes r
-                LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-                LEFT JOIN recipe_views rv ON r.id = rv.recipe_id
-                LEFT JOIN recipe_nutrition n ON r.id = n.recipe_id
-                WHERE 1=1
-            """
-            
+            where = ""
             params = []
-            
-            if query:
-                sql += " AND (LOWER(r.name) LIKE %s OR LOWER(r.ingredients) LIKE %s OR LOWER(r.description) LIKE %s)"
-                params.extend([f"%{query}%", f"%{query}%", f"%{query}%"])
-            
-            if category:
-                sql += " AND r.category = %s"
-                params.append(category)
-                
-            if difficulty:
-                sql += " AND r.difficulty = %s"
-                params.append(difficulty)
-                
-            if max_time:
-                sql += " AND (r.prep_time + r.cook_time) <= %s"
-                params.append(int(max_time))
-            
-            sql += " GROUP BY r.id ORDER BY r.name"
-            cursor.execute(sql, params)
 
-        recipes = []
-        if tags:
-            for result in cursor.stored_results():
-                recipes = result.fetchall()
-                break
-        else:
-            recipes = cursor.fetchall()
+            if ranked is not None:
+                # Only the best-scoring hits are sorted. `total` still counts every hit, and
+                # `truncated` tells the client that the pages stop short of it.
+                sortable = ranked[:SEARCH_SORT_CANDIDATES]
+                extras["truncated"] = len(ranked) > len(sortable)
+                where += " AND r.id IN (%s)" % ", ".join(["%s"] * len(sortable))
+                params.extend(recipe_id for recipe_id, _ in sortable)
+            else:
+                if query:
+                    where += " AND (LOWER(r.name) LIKE %s OR LOWER(r.ingredients) LIKE %s OR LOWER(r.description) LIKE %s)"
+                    params.extend([f"%{query}%", f"%{query}%", f"%{query}%"])
+
+                if category:
+                    where += " AND r.category = %s"
+                    params.append(category)
+
+                if difficulty:
+                    where += " AND r.difficulty = %s"
+                    params.append(difficulty)
+
+                if max_time:
+                    where += " AND (r.prep_time + r.cook_time) <= %s"
+                    params.append(int(max_time))
+
+                if tag_list:
+                    where += TAG_MODE_SQL[tag_mode] % ", ".join(["%s"] * len(tag_list))
+                    params.extend(tag_list)
+                    if tag_mode == 'all':
+                        params.append(len(tag_list))
+
+            known_total = len(ranked) if ranked is not None else None
+            recipes, next_cursor, total = fetch_recipe_page(cursor, fields, where, params, page, total=known_total)
 
         cursor.close()
         conn.close()
 
-        # Enhance recipe data
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = recipe['prep_time'] + recipe['cook_time']
-            recipe['view_count'] = int(recipe['view_count']) if recipe['view_count'] else 0
-            
-            # Add nutrition info
-            recipe['nutrition'] = {
-                'calories': recipe.get('calories', estimate_calories(recipe)),
-                'protein': f"{recipe.get('protein_g', 0)}g",
-                'carbs': f"{recipe.get('carbs_g', 0)}g",
-                'fat': f"{recipe.get('fat_g', 0)}g",
-                'fiber': f"{recipe.get('fiber_g', 0)}g"
-            }
+        # Log search activity once per search, not for every page of it
+        if page.first and (query or category or difficulty or max_time or tags):
+            log_search_activity(query, category, difficulty, max_time, tags, total, started)
 
-        # Log search activity
-        if query or category or difficulty or max_time:
-            log_search_activity(query, category, difficulty, max_time, len(recipes))
+        return page_response(recipes, next_cursor, total, **extras)
 
-        return jsonify(recipes)
-    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Search error: {e}")
         return jsonify({"error": "Failed to search recipes"}), 500
 
-def estimate_calories(recipe):
-    """Estimate calories based on recipe ingredients"""
-    ingredients = recipe.get('ingredients', '').lower()
-    if 'paneer' in ingredients or 'cheese' in ingredients:
-        return 350
-    elif 'chicken' in ingredients or 'meat' in ingredients:
-        return 400
-    elif 'rice' in ingredients:
-        return 300
-    elif 'dal' in ingredients or 'lentil' in ingredients:
-        return 250
-    elif 'vegetable' in ingredients:
-        return 200
-    else:
-        return 280
-
-def log_search_activity(query, category, difficulty, max_time, results_count):
-    """Log search activity for analytics"""
+# Tag filters for when the catalog or the sort index is not loaded yet; %s is the tag placeholder list
+TAG_MODE_SQL = {
+    'any': " AND r.id IN (SELECT recipe_id FROM recipe_tags WHERE tag_name IN (%s))",
+    'all': " AND r.id IN (SELECT recipe_id FROM recipe_tags WHERE tag_name IN (%s)"
+           " GROUP BY recipe_id HAVING COUNT(DISTINCT tag_name) = %%s)",
+    'none': " AND r.id NOT IN (SELECT recipe_id FROM recipe_tags WHERE tag_name IN (%s))",
+}
+
+def search_facets(query, hits, masks):
+    """Facet counts for a search from the in-memory facet index, or None while it is not loaded"""
+    if masks is None or (query and hits is None):
+        return None
+    base = facet_index.mask_for([recipe_id for recipe_id, _ in hits]) if query else None
+    return facet_index.counts(base, masks)
+
+def blend_corrected(ranked, corrected):
+    """Exact matches plus the corrected query's matches at FUZZY_SCORE_WEIGHT, in score order"""
+    scores = dict(ranked)
+    for recipe_id, score in corrected:
+        scores.setdefault(recipe_id, score * FUZZY_SCORE_WEIGHT)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+# "Cook with what I have": recipes ranked by how much of them the listed ingredients cover
+@app.route('/search/pantry', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings', 'views'), 'public, max-age=30')
+def search_pantry():
+    try:
+        items = [item.strip() for item in request.args.get('ingredients', '').split(',') if item.strip()]
+        if not items:
+            return jsonify({"error": "ingredients is required"}), 400
+        if len(items) > MAX_PANTRY_ITEMS:
+            return jsonify({"error": f"At most {MAX_PANTRY_ITEMS} ingredients are allowed"}), 400
+
+        # Salt, oil and water are assumed to be at hand unless staples=0
+        use_staples = request.args.get('staples', '1') != '0'
+        max_missing = request.args.get('max_missing', '').strip()
+        if max_missing and not max_missing.isdigit():
+            raise ValueError("max_missing must be a non-negative integer")
+        category = request.args.get('category', '')
+        difficulty = request.args.get('difficulty', '')
+        max_time = request.args.get('max_time', '')
+        tag_list = sorted({tag.strip().lower() for tag in request.args.get('tags', '').split(',') if tag.strip()})
+        tag_mode = request.args.get('tag_mode', 'any').strip().lower() or 'any'
+        page = PageRequest.from_args(request.args, (RELEVANCE,), RELEVANCE)
+        fields = FieldSet.from_args(request.args)
+
+        snapshot = catalog.current()
+        if snapshot is None or not pantry_index.ready or not facet_index.ready:
+            return jsonify({"error": "Recipe catalog is not loaded yet"}), 503
+
+        pantry, unknown = pantry_index.resolve(items)
+        matches = pantry_index.search(pantry, use_staples, int(max_missing) if max_missing else None)
+        allowed = facet_index.combine(facet_index.filter_masks(category, difficulty, max_time, tag_list, tag_mode))
+        if allowed is not None:
+            matches = matches.filter(facet_index.contains(allowed, matches.ids))
+        entries, more = matches.page(page.after, page.limit)
+        next_cursor = encode_cursor(page.sort, entries[-1][1], entries[-1][0]) if more else None
+        total = len(matches) if page.first else None
+
+        recipes = []
+        if entries:
+            conn = get_read_connection()
+            if not conn:
+                return jsonify({"error": "Database connection failed"}), 500
+            cursor = conn.cursor()
+            recipes = fetch_recipes_by_id(cursor, fields, [recipe_id for recipe_id, *_ in entries])
+            cursor.close()
+            conn.close()
+
+        coverage = {recipe_id: (share, missing) for recipe_id, _, share, missing in entries}
+        for recipe in recipes:
+            share, missing = coverage[recipe.id]
+            recipe.extras = {
+                "coverage": share,
+                "missing_count": missing,
+                "missing": pantry_index.missing_ingredients(recipe.id, pantry, use_staples),
+            }
+
+        return page_response(recipes, next_cursor, total, unknown_ingredients=unknown)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ Pantry search error: {e}")
+        return jsonify({"error": "Failed to search by ingredients"}), 500
+
+# Typeahead completions for the search box, answered from memory
+@app.route('/suggest', methods=['GET'])
+@response_cache.conditional(('recipes', 'views'), 'public, max-age=60')
+def suggest():
+    try:
+        prefix = request.args.get('prefix', '')
+        limit = min(int(request.args.get('limit', 8)), SUGGEST_MAX_RESULTS)
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+
+        catalog.current()
+        suggest_index.refresh_popularity(catalog.versions.get('views'), load_view_counts)
+        return jsonify({"prefix": prefix, "suggestions": suggest_index.suggest(prefix, limit)})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ Suggest error: {e}")
+        return jsonify({"error": "Failed to fetch suggestions"}), 500
+
+def load_view_counts():
+    """View count of every viewed recipe, for the suggestion weights"""
+    conn = db_router.read_connection()
     try:
-        conn = get_db_connection()
-        if not conn:
-            return
-        
         cursor = conn.cursor()
-        session_id = get_session_id()
-        
-        search_query = f"q={query}&category={category}&difficulty={difficulty}&max_time={max_time}"
-        
-        cursor.execute("""
-            INSERT INTO search_history (search_query, session_id, results_count)
-            VALUES (%s, %s, %s)
-        """, (search_query, session_id, results_count))
-        
-        conn.commit()
+        cursor.execute("SELECT recipe_id, view_count FROM recipe_stats WHERE view_count > 0")
+        views = dict(cursor.fetchall())
         cursor.close()
+    finally:
         conn.close()
-    except Exception as e:
-        print(f"❌ Failed to log search activity: {e}")
+    return views
+
+def load_sort_stats():
+    """Ratings and view count of every recipe with stats, for the /search sort index"""
+    conn = db_router.read_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT recipe_id, rating_sum, rating_count, view_count FROM recipe_stats")
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+    return rows
+
+def log_search_activity(query, category, difficulty, max_time, tags, results_count, started):
+    """Queue a structured search_history row for the background writer"""
+    tag_list = sorted({tag.strip().lower() for tag in tags.split(',') if tag.strip()})
+    search_log_writer.submit((
+        ' '.join(tokenize(query))[:255] or None,
+        category or None,
+        difficulty or None,
+        int(max_time) if max_time else None,
+        ','.join(tag_list)[:500] or None,
+        get_session_id(),
+        results_count,
+        int((time.perf_counter() - started) * 1000),
+        datetime.datetime.now()
+    ))
+
+def write_search_history(cursor, rows):
+    """Insert a batch of queued searches"""
+    cursor.executemany("""
+        INSERT INTO search_history
+            (normalized_query, category, difficulty, max_time, tags,
+             session_id, results_count, latency_ms, searched_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, rows)
+
+search_log_writer = BatchWriter(
+    'search_history',
+    write_search_history,
+    get_db_connection,
+    batch_size=int(os.environ.get('SEARCH_LOG_BATCH_SIZE', 500)),
+    flush_interval=int(os.environ.get('SEARCH_LOG_FLUSH_MS', 2000)) / 1000,
+    max_queue=int(os.environ.get('SEARCH_LOG_QUEUE_SIZE', 10000)),
+    overflow=os.environ.get('SEARCH_LOG_OVERFLOW', 'drop')
+)
 
 # Get recipe by ID
 @app.route('/recipe/<int:recipe_id>', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings', 'views'), 'public, max-age=60', on_not_modified=lambda recipe_id: log_revalidated_view(recipe_id))
 def get_recipe(recipe_id):
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count,
-                   COUNT(rv.id) as view_count,
-                   n.calories, n.protein_g, n.carbs_g, n.fat_g, n.fiber_g
-            FROM recipes r
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-            LEFT JOIN recipe_views rv ON r.id = rv.recipe_id
-            LEFT JOIN recipe_nutrition n ON r.id = n.recipe_id
-            WHERE r.id = %s
-            GROUP BY r.id
-        """, (recipe_id,))
+        # The detail view is the one place that ships the full text columns
+        fields = FieldSet()
+        cursor.execute(recipe_list_sql(fields) + " AND r.id = %s", (recipe_id,))
+        recipes = fields.load(cursor)
         
-        recipe = cursor.fetchone()
-        
-        if not recipe:
+        if not recipes:
             cursor.close()
             conn.close()
             return jsonify({"error": "Recipe not found"}), 404
 
         # Get recipe tags
-        cursor.execute("""
-            SELECT tag_name FROM recipe_tags WHERE recipe_id = %s
-        """, (recipe_id,))
-        tags = [row['tag_name'] for row in cursor.fetchall()]
+        cursor.execute(RECIPE_TAGS_SQL, (recipe_id,))
+        tags = [row[0] for row in cursor.fetchall()]
         
         cursor.close()
         conn.close()
 
-        # Enhance recipe data
-        recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-        recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-        recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-        recipe['total_time'] = recipe['prep_time'] + recipe['cook_time']
-        recipe['view_count'] = int(recipe['view_count']) if recipe['view_count'] else 0
-        recipe['tags'] = tags
-        
-        # Add nutrition info
-        recipe['nutrition'] = {
-            'calories': recipe.get('calories', estimate_calories(recipe)),
-            'protein': f"{recipe.get('protein_g', 0)}g",
-            'carbs': f"{recipe.get('carbs_g', 0)}g",
-            'fat': f"{recipe.get('fat_g', 0)}g",
-            'fiber': f"{recipe.get('fiber_g', 0)}g"
-        }
-
-        # Log recipe view
+        # Queue the view; the background writer persists it off the request path
         log_recipe_view(recipe_id)
 
-        return jsonify(recipe)
+        return recipe_response(recipes[0], tags=tags)
     
     except Exception as e:
         print(f"❌ Database error: {e}")
         return jsonify({"error": "Failed to fetch recipe"}), 500
 
+RECIPE_TAGS_SQL = "SELECT tag_name FROM recipe_tags WHERE recipe_id = %s"
+
 def log_recipe_view(recipe_id):
-    """Log recipe view for popularity tracking"""
+    """Queue a recipe view for the background writer"""
+    view_writer.submit((recipe_id, get_session_id(), datetime.datetime.now()))
+
+def log_revalidated_view(recipe_id):
+    """Count a 304 on a known recipe as a view, same as a full fetch"""
+    snapshot = catalog.snapshot
+    if snapshot is not None and recipe_id in snapshot.by_id:
+        log_recipe_view(recipe_id)
+
+def write_recipe_views(cursor, rows):
+    """Insert a batch of queued views and roll them into recipe_stats"""
+    cursor.executemany(
+        "INSERT INTO recipe_views (recipe_id, session_id, viewed_at) VALUES (%s, %s, %s)",
+        rows
+    )
+
+    per_recipe = {}
+    for recipe_id, _, viewed_at in rows:
+        count, last_viewed_at = per_recipe.get(recipe_id, (0, viewed_at))
+        per_recipe[recipe_id] = (count + 1, max(last_viewed_at, viewed_at))
+
+    # Sorted so concurrent workers lock stats rows in the same order
+    cursor.executemany("""
+        INSERT INTO recipe_stats (recipe_id, view_count, last_viewed_at)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            view_count = view_count + VALUES(view_count),
+            last_viewed_at = GREATEST(COALESCE(last_viewed_at, VALUES(last_viewed_at)), VALUES(last_viewed_at))
+    """, [(recipe_id, count, last) for recipe_id, (count, last) in sorted(per_recipe.items())])
+
+# Seconds between 'views' version bumps. Every cached route that shows view counts
+# is invalidated by a bump, so they are coalesced instead of following each flush.
+VIEW_VERSION_INTERVAL = float(os.environ.get('VIEW_VERSION_INTERVAL', 60))
+
+# Set while this process has written views that no bump has covered yet
+views_unversioned = threading.Event()
+
+def bump_views_version():
+    """Bump 'views' unless any worker bumped it within VIEW_VERSION_INTERVAL.
+
+    Runs in its own transaction, after the views it covers are committed, so a
+    missing or locked data_versions row cannot roll back counted views.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return
     try:
-        conn = get_db_connection()
-        if not conn:
-            return
-        
         cursor = conn.cursor()
-        session_id = get_session_id()
-        
-        cursor.callproc('LogRecipeView', [recipe_id, session_id])
-        
+        cursor.execute("""
+            UPDATE data_versions SET version = version + 1
+            WHERE scope = 'views' AND updated_at <= NOW() - INTERVAL %s SECOND
+        """, (VIEW_VERSION_INTERVAL,))
+        bumped = cursor.rowcount
         conn.commit()
         cursor.close()
+    finally:
         conn.close()
-    except Exception as e:
-        print(f"❌ Failed to log recipe view: {e}")
+    if bumped:
+        views_unversioned.clear()
+
+def version_flushed_views():
+    """Writer after-flush hook: the batch is committed, now try to bump 'views'"""
+    views_unversioned.set()
+    bump_views_version()
+
+def bump_deferred_views_version():
+    """Writer idle hook: cover views whose bump was skipped or failed once the interval allows it"""
+    if views_unversioned.is_set():
+        bump_views_version()
+
+view_writer = BatchWriter(
+    'recipe_views',
+    write_recipe_views,
+    get_db_connection,
+    batch_size=int(os.environ.get('VIEW_LOG_BATCH_SIZE', 500)),
+    flush_interval=int(os.environ.get('VIEW_LOG_FLUSH_MS', 1000)) / 1000,
+    max_queue=int(os.environ.get('VIEW_LOG_QUEUE_SIZE', 10000)),
+    overflow=os.environ.get('VIEW_LOG_OVERFLOW', 'drop'),
+    on_idle=bump_deferred_views_version,
+    after_flush=version_flushed_views
+)
 
 # Get popular recipes
 @app.route('/popular', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings', 'views'), 'public, max-age=30')
+@response_cache.cached(ttl=60, scopes=('recipes', 'ratings', 'views'))
 def get_popular_recipes():
     try:
-        conn = get_db_connection()
+        fields = FieldSet.from_args(request.args)
+
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count,
-                   COUNT(rv.id) as view_count
-            FROM recipes r
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-            LEFT JOIN recipe_views rv ON r.id = rv.recipe_id
-            GROUP BY r.id
-            ORDER BY view_count DESC, avg_rating DESC
-            LIMIT 8
-        """)
-        
-        recipes = cursor.fetchall()
+        cursor.execute(section_sql(fields.select_list(), POPULAR_SECTION))
+        recipes = fields.load(cursor)
         cursor.close()
         conn.close()
 
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
-            recipe['view_count'] = int(recipe['view_count']) if recipe['view_count'] else 0
+        return recipes_response(recipes)
 
-        return jsonify(recipes)
-    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Database error: {e}")
         return jsonify({"error": "Failed to fetch popular recipes"}), 500
 
+# Recently popular recipes, ranked by rollup_views.py from hourly view buckets
+@app.route('/trending', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings', 'trending'), 'public, max-age=60')
+@response_cache.cached(ttl=300, scopes=('recipes', 'ratings', 'trending'))
+def get_trending_recipes():
+    try:
+        window = request.args.get('window', '24h')
+        if window not in TRENDING_WINDOWS:
+            raise ValueError(f"Unsupported window: {window}")
+        limit = min(int(request.args.get('limit', 8)), TRENDING_SIZE)
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        fields = FieldSet.from_args(request.args)
+
+        conn = get_read_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
+
+        cursor = conn.cursor()
+
+        cursor.execute(trending_sql(fields), (window, limit))
+        recipes = fields.load(cursor)
+        cursor.close()
+        conn.close()
+
+        return recipes_response(recipes)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ Database error: {e}")
+        return jsonify({"error": "Failed to fetch trending recipes"}), 500
+
+def trending_sql(fields):
+    """The stored ranking of one window, read in rank order off its primary key"""
+    return f"""
+        SELECT {fields.select_list()}
+        FROM recipe_trending t
+        JOIN recipes r ON r.id = t.recipe_id
+        {RECIPE_JOINS}
+        WHERE t.time_window = %s
+        ORDER BY t.rank_pos
+        LIMIT %s
+    """
+
 # Get quick meals
 @app.route('/quick-meals', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings'), 'public, max-age=120')
+@response_cache.cached(ttl=300, scopes=('recipes', 'ratings'))
 def get_quick_meals():
     try:
-        conn = get_db_connection()
+        fields = FieldSet.from_args(request.args)
+
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count
-            FROM recipes r
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-            WHERE r.is_quick_meal = TRUE OR (r.prep_time + r.cook_time) <= 30
-            GROUP BY r.id
-            ORDER BY (r.prep_time + r.cook_time) ASC
-            LIMIT 10
-        """)
-        
-        recipes = cursor.fetchall()
+        cursor.execute(section_sql(fields.select_list(), QUICK_MEALS_SECTION))
+        recipes = fields.load(cursor)
         cursor.close()
         conn.close()
 
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
+        return recipes_response(recipes)
 
-        return jsonify(recipes)
-    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Database error: {e}")
         return jsonify({"error": "Failed to fetch quick meals"}), 500
 
 # Get featured recipes
 @app.route('/featured', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings'), 'public, max-age=120')
+@response_cache.cached(ttl=300, scopes=('recipes', 'ratings'))
 def get_featured_recipes():
     try:
-        conn = get_db_connection()
+        fields = FieldSet.from_args(request.args)
+
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT r.*, 
-                   COALESCE(AVG(rt.rating), 0) as avg_rating,
-                   COUNT(rt.id) as review_count
-            FROM recipes r
-            LEFT JOIN recipe_ratings rt ON r.id = rt.recipe_id
-            WHERE r.is_featured = TRUE
-            GROUP BY r.id
-            ORDER BY r.created_at DESC
-            LIMIT 6
-        """)
-        
-        recipes = cursor.fetchall()
+        cursor.execute(section_sql(fields.select_list(), FEATURED_SECTION))
+        recipes = fields.load(cursor)
         cursor.close()
         conn.close()
 
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
+        return recipes_response(recipes)
 
-        return jsonify(recipes)
-    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Database error: {e}")
         return jsonify({"error": "Failed to fetch featured recipes"}), 500
 
 # Get recipes by category
 @app.route('/category/<category_name>', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings'), 'public, max-age=60')
 def get_recipes_by_category(category_name):
     try:
-        conn = get_db_connection()
+        page = PageRequest.from_args(request.args, SORT_KEYS, 'rating')
+        fields = FieldSet.from_args(request.args)
+
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.callproc('GetRecipesByCategory', [category_name])
-        
-        recipes = []
-        for result in cursor.stored_results():
-            recipes = result.fetchall()
-            break
-        
+        cursor = conn.cursor()
+        recipes, next_cursor, total = fetch_recipe_page(cursor, fields, " AND r.category = %s", [category_name], page)
         cursor.close()
         conn.close()
 
-        for recipe in recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
+        return page_response(recipes, next_cursor, total)
 
-        return jsonify(recipes)
-    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Database error: {e}")
         return jsonify({"error": "Failed to fetch category recipes"}), 500
 
 # Get all categories
 @app.route('/categories', methods=['GET'])
+@response_cache.conditional(('recipes',), 'public, max-age=300')
+@response_cache.cached(ttl=600, scopes=('recipes',))
 def get_categories():
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT DISTINCT category, COUNT(*) as recipe_count 
-            FROM recipes 
-            WHERE category IS NOT NULL 
-            GROUP BY category 
-            ORDER BY recipe_count DESC, category
-        """)
-        categories = [{'name': row[0], 'count': row[1]} for row in cursor.fetchall()]
+        categories = read_categories(cursor)
         cursor.close()
         conn.close()
 
@@ -776,24 +1195,30 @@ def get_categories():
         print(f"❌ Database error: {e}")
         return jsonify({"error": "Failed to fetch categories"}), 500
 
+CATEGORIES_SQL = """
+    SELECT DISTINCT category, COUNT(*) as recipe_count 
+    FROM recipes 
+    WHERE category IS NOT NULL 
+    GROUP BY category 
+    ORDER BY recipe_count DESC, category
+"""
+
+def read_categories(cursor):
+    cursor.execute(CATEGORIES_SQL)
+    return [{'name': row[0], 'count': row[1]} for row in cursor.fetchall()]
+
 # Get all tags
 @app.route('/tags', methods=['GET'])
+@response_cache.conditional(('recipes',), 'public, max-age=300')
+@response_cache.cached(ttl=600, scopes=('recipes',))
 def get_tags():
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
         cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT DISTINCT tag_name, COUNT(*) as usage_count 
-            FROM recipe_tags 
-            GROUP BY tag_name 
-            ORDER BY usage_count DESC, tag_name
-            LIMIT 20
-        """)
-        tags = [{'name': row[0], 'count': row[1]} for row in cursor.fetchall()]
+        tags = read_tags(cursor)
         cursor.close()
         conn.close()
 
@@ -803,8 +1228,21 @@ def get_tags():
         print(f"❌ Database error: {e}")
         return jsonify({"error": "Failed to fetch tags"}), 500
 
+TAGS_SQL = """
+    SELECT DISTINCT tag_name, COUNT(*) as usage_count 
+    FROM recipe_tags 
+    GROUP BY tag_name 
+    ORDER BY usage_count DESC, tag_name
+    LIMIT 20
+"""
+
+def read_tags(cursor):
+    cursor.execute(TAGS_SQL)
+    return [{'name': row[0], 'count': row[1]} for row in cursor.fetchall()]
+
 # Submit recipe rating
 @app.route('/recipe/<int:recipe_id>/rate', methods=['POST'])
+@writes_data
 def rate_recipe(recipe_id):
     try:
         data = request.get_json()
@@ -820,10 +1258,12 @@ def rate_recipe(recipe_id):
 
         cursor = conn.cursor()
 
-        # Check if user already rated this recipe
+        # Check if user already rated this recipe; the row stays locked until commit so a
+        # concurrent re-rating cannot apply its difference against the same old value
         cursor.execute("""
-            SELECT id FROM recipe_ratings 
+            SELECT id, rating FROM recipe_ratings 
             WHERE recipe_id = %s AND session_id = %s
+            FOR UPDATE
         """, (recipe_id, session_id))
         
         existing_rating = cursor.fetchone()
@@ -835,109 +1275,199 @@ def rate_recipe(recipe_id):
                 SET rating = %s, created_at = CURRENT_TIMESTAMP 
                 WHERE id = %s
             """, (rating, existing_rating[0]))
+            update_rating_stats(cursor, recipe_id, int(rating) - (existing_rating[1] or 0), 0)
         else:
             # Insert new rating
             cursor.execute("""
                 INSERT INTO recipe_ratings (recipe_id, rating, session_id)
                 VALUES (%s, %s, %s)
             """, (recipe_id, rating, session_id))
+            update_rating_stats(cursor, recipe_id, int(rating), 1)
 
         conn.commit()
         cursor.close()
         conn.close()
 
+        # Re-read data_versions on the next request so cached ratings are dropped right away
+        catalog.mark_stale()
+
         return jsonify({"message": "Rating submitted successfully"})
     
     except Exception as e:
         print(f"❌ Rating error: {e}")
         return jsonify({"error": "Failed to submit rating"}), 500
 
+def update_rating_stats(cursor, recipe_id, rating_delta, count_delta):
+    """Apply a rating change to the denormalized recipe_stats row"""
+    cursor.execute("""
+        INSERT INTO recipe_stats (recipe_id, rating_sum, rating_count)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            rating_sum = rating_sum + VALUES(rating_sum),
+            rating_count = rating_count + VALUES(rating_count)
+    """, (recipe_id, rating_delta, count_delta))
+
 # Get similar recipes
 @app.route('/recipe/<int:recipe_id>/similar', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings'), 'public, max-age=300')
 def get_similar_recipes(recipe_id):
     try:
-        limit = request.args.get('limit', 4)
-        
-        conn = get_db_connection()
+        limit = min(int(request.args.get('limit', 4)), SIMILAR_NEIGHBORS)
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        fields = FieldSet.from_args(request.args)
+        similar_ids = similarity.neighbors(recipe_id, limit)
+
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
-        cursor.callproc('GetSimilarRecipes', [recipe_id, int(limit)])
-        
-        similar_recipes = []
-        for result in cursor.stored_results():
-            similar_recipes = result.fetchall()
-            break
-        
+        cursor = conn.cursor()
+        if similar_ids is not None:
+            similar_recipes = fetch_recipes_by_id(cursor, fields, similar_ids)
+        else:
+            # Recipe newer than the similarity index: same category, best rated first
+            cursor.execute(similar_sql(fields), (recipe_id, limit))
+            similar_recipes = fields.load(cursor)
         cursor.close()
         conn.close()
 
-        for recipe in similar_recipes:
-            recipe['avg_rating'] = float(recipe['avg_rating']) if recipe['avg_rating'] else 0
-            recipe['prep_time'] = int(recipe['prep_time']) if recipe['prep_time'] else 0
-            recipe['cook_time'] = int(recipe['cook_time']) if recipe['cook_time'] else 0
-            recipe['total_time'] = (recipe['prep_time'] or 0) + (recipe['cook_time'] or 0)
+        return recipes_response(similar_recipes)
 
-        return jsonify(similar_recipes)
-    
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"❌ Database error: {e}")
         return jsonify({"error": "Failed to fetch similar recipes"}), 500
 
+def similar_sql(fields):
+    """Same ranking as the GetSimilarRecipes procedure, for recipes the similarity index lacks"""
+    return f"""
+        SELECT {fields.select_list()}
+        FROM recipes r1
+        JOIN recipes r ON r1.category = r.category AND r1.id != r.id
+        {RECIPE_JOINS}
+        WHERE r1.id = %s
+        ORDER BY COALESCE(s.rating_count, 0) DESC, COALESCE(s.rating_sum / NULLIF(s.rating_count, 0), 0) DESC
+        LIMIT %s
+    """
+
 # Get recipe statistics
 @app.route('/stats', methods=['GET'])
+@response_cache.conditional(('recipes', 'views'), 'public, max-age=30')
+@response_cache.cached(ttl=60, scopes=('recipes', 'views'))
 def get_stats():
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         if not conn:
             return jsonify({"error": "Database connection failed"}), 500
 
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
+        stats = read_stats(cursor)
+        cursor.close()
+        conn.close()
 
-        # Get total recipes
-        cursor.execute("SELECT COUNT(*) as total_recipes FROM recipes")
-        total_recipes = cursor.fetchone()['total_recipes']
+        return jsonify(stats)
+    
+    except Exception as e:
+        print(f"❌ Database error: {e}")
+        return jsonify({"error": "Failed to fetch statistics"}), 500
 
-        # Get total categories
-        cursor.execute("SELECT COUNT(DISTINCT category) as total_categories FROM recipes")
-        total_categories = cursor.fetchone()['total_categories']
+# The /stats queries; none depends on another, so they may run concurrently
+STATS_QUERIES = {
+    'total_recipes': "SELECT COUNT(*) FROM recipes",
+    'total_categories': "SELECT COUNT(DISTINCT category) FROM recipes",
+    'total_tags': "SELECT COUNT(DISTINCT tag_name) FROM recipe_tags",
+    'total_views': "SELECT COALESCE(SUM(view_count), 0) FROM recipe_stats",
+    'popular_categories': """
+        SELECT category, COUNT(*) as count 
+        FROM recipes 
+        WHERE category IS NOT NULL 
+        GROUP BY category 
+        ORDER BY count DESC 
+        LIMIT 5
+    """,
+}
 
-        # Get total tags
-        cursor.execute("SELECT COUNT(DISTINCT tag_name) as total_tags FROM recipe_tags")
-        total_tags = cursor.fetchone()['total_tags']
+def read_stats(cursor):
+    results = {}
+    for name, sql in STATS_QUERIES.items():
+        cursor.execute(sql)
+        results[name] = cursor.fetchall()
+    return build_stats(results)
+
+def build_stats(results):
+    """Assemble the /stats object from the rows of each STATS_QUERIES entry"""
+    return {
+        "total_recipes": results['total_recipes'][0][0],
+        "total_categories": results['total_categories'][0][0],
+        "total_tags": results['total_tags'][0][0],
+        "total_views": int(results['total_views'][0][0]),
+        "popular_categories": [{'category': row[0], 'count': row[1]} for row in results['popular_categories']]
+    }
 
-        # Get total views
-        cursor.execute("SELECT COUNT(*) as total_views FROM recipe_views")
-        total_views = cursor.fetchone()['total_views']
+# Everything the home page needs on first load, in one response
+@app.route('/bootstrap', methods=['GET'])
+@response_cache.conditional(('recipes', 'ratings', 'views'), 'public, max-age=30')
+@response_cache.cached(ttl=60, scopes=('recipes', 'ratings', 'views'))
+def get_bootstrap():
+    """First page of all recipes, the home sections, categories, tags and stats.
 
-        # Get popular categories
-        cursor.execute("""
-            SELECT category, COUNT(*) as count 
-            FROM recipes 
-            WHERE category IS NOT NULL 
-            GROUP BY category 
-            ORDER BY count DESC 
-            LIMIT 5
-        """)
-        popular_categories = cursor.fetchall()
+    Sections list recipe ids; each recipe card appears once, under "recipes".
+    """
+    try:
+        fields = FieldSet(*VIEWS['card'])
+        page = PageRequest('name', DEFAULT_PAGE_SIZE)
 
+        conn = get_read_connection()
+        if not conn:
+            return jsonify({"error": "Database connection failed"}), 500
+
+        cursor = conn.cursor()
+
+        recipes, next_cursor, total = fetch_recipe_page(cursor, fields, "", [], page)
+        cards = {recipe.id: recipe for recipe in recipes}
+
+        sections = {}
+        for name, section in (('popular', POPULAR_SECTION), ('quick_meals', QUICK_MEALS_SECTION),
+                              ('featured', FEATURED_SECTION)):
+            cursor.execute(section_sql('r.id', section))
+            sections[name] = [row[0] for row in cursor.fetchall()]
+
+        # One read for the cards not already on the first page
+        missing = list(dict.fromkeys(
+            recipe_id for ids in sections.values() for recipe_id in ids if recipe_id not in cards
+        ))
+        for recipe in fetch_recipes_by_id(cursor, fields, missing):
+            cards[recipe.id] = recipe
+
+        categories = read_categories(cursor)
+        tags = read_tags(cursor)
+        stats = read_stats(cursor)
         cursor.close()
         conn.close()
 
-        return jsonify({
-            "total_recipes": total_recipes,
-            "total_categories": total_categories,
-            "total_tags": total_tags,
-            "total_views": total_views,
-            "popular_categories": popular_categories
-        })
-    
+        body = (
+            '{"recipes":' + recipes_by_id_json(cards.values())
+            + ',"all":' + encode_value({
+                "ids": [recipe.id for recipe in recipes], "next_cursor": next_cursor, "total": total
+            })
+            + ''.join(f',"{name}":{encode_value(ids)}' for name, ids in sections.items())
+            + ',"categories":' + encode_value(categories)
+            + ',"tags":' + encode_value(tags)
+            + ',"stats":' + encode_value(stats) + '}'
+        )
+        return Response(body, mimetype='application/json')
+
     except Exception as e:
-        print(f"❌ Database error: {e}")
-        return jsonify({"error": "Failed to fetch statistics"}), 500
+        print(f"❌ Bootstrap error: {e}")
+        return jsonify({"error": "Failed to load initial data"}), 500
 
 # Serve static files
+# Pages always revalidate; assets may be reused for a while before revalidating
+ASSET_MAX_AGE = int(os.environ.get('ASSET_MAX_AGE', 300))
+IMAGE_MAX_AGE = int(os.environ.get('IMAGE_MAX_AGE', 86400))
+
 @app.route('/')
 def serve_index():
     return send_from_directory(os.path.dirname(__file__), 'recipe.html')
@@ -952,26 +1482,26 @@ def serve_finder_html():
 
 @app.route('/recipe.css')
 def serve_recipe_css():
-    return send_from_directory(os.path.dirname(__file__), 'recipe.css')
+    return send_from_directory(os.path.dirname(__file__), 'recipe.css', max_age=ASSET_MAX_AGE)
 
 @app.route('/finder.css')
 def serve_finder_css():
-    return send_from_directory(os.path.dirname(__file__), 'finder.css')
+    return send_from_directory(os.path.dirname(__file__), 'finder.css', max_age=ASSET_MAX_AGE)
 
 @app.route('/recipe.js')
 def serve_recipe_js():
-    return send_from_directory(os.path.dirname(__file__), 'recipe.js')
+    return send_from_directory(os.path.dirname(__file__), 'recipe.js', max_age=ASSET_MAX_AGE)
 
 @app.route('/finder.js')
 def serve_finder_js():
-    return send_from_directory(os.path.dirname(__file__), 'finder.js')
+    return send_from_directory(os.path.dirname(__file__), 'finder.js', max_age=ASSET_MAX_AGE)
 
 # Route to serve image files
 @app.route('/images/<path:filename>')
 def serve_image(filename):
     try:
         images_dir = os.path.join(os.path.dirname(__file__), 'images')
-        return send_from_directory(images_dir, filename)
+        return send_from_directory(images_dir, filename, max_age=IMAGE_MAX_AGE)
     except FileNotFoundError:
         # Return a placeholder image if file not found
         return send_from_directory(images_dir, 'placeholder.jpg')
@@ -993,9 +1523,49 @@ def health_check():
         "status": "healthy", 
         "message": "Recipe Finder API is running",
         "database": db_status,
+        # "not loaded" means /search is running without its in-memory indexes
+        "catalog": "loaded" if catalog.snapshot is not None else "not loaded",
         "timestamp": datetime.datetime.now().isoformat()
     })
 
+# Pool, background writer and cache counters
+@app.route('/metrics')
+def metrics():
+    return jsonify({
+        "catalog": catalog.stats(),
+        "view_writer": view_writer.stats(),
+        "search_log_writer": search_log_writer.stats(),
+        "db_pool": db_pool.stats(),
+        "db_replicas": db_router.stats(),
+        "response_cache": response_cache.stats(),
+        "similarity": similarity.stats(),
+        "pantry_index": pantry_index.stats(),
+        "suggest_index": suggest_index.stats(),
+        "fuzzy_index": fuzzy_index.stats(),
+        "facet_index": facet_index.stats(),
+        "sort_index": sort_index.stats(),
+        "password_hasher": password_hasher.stats()
+    })
+
+# What a fresh worker renders before it accepts traffic (see gunicorn.conf.py)
+WARMUP_PATHS = ('/bootstrap', '/categories', '/tags', '/stats')
+
+def warm_up():
+    """Open pooled connections, bring the catalog up to date and fill the response cache"""
+    started = time.perf_counter()
+    for pool in db_router.pools:
+        try:
+            pool.warm()
+        except Exception as e:
+            print(f"❌ Could not pre-open connections to {pool.config['host']}: {e}")
+    catalog.refresh()
+    suggest_index.refresh_popularity(catalog.versions.get('views'), load_view_counts)
+    sort_index.refresh_stats((catalog.versions.get('ratings'), catalog.versions.get('views')), load_sort_stats)
+    with app.test_client() as client:
+        for path in WARMUP_PATHS:
+            client.get(path)
+    print(f"✅ Worker {os.getpid()} warmed up in {(time.perf_counter() - started) * 1000:.0f} ms")
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -1022,17 +1592,22 @@ if __name__ == '__main__':
     print("   POST /favorites/<id>    - Add favorite (JWT)")
     print("   DELETE /favorites/<id>  - Remove favorite (JWT)")
     print("   GET  /favorites/check/<id> - Check favorite status (JWT)")
+    print("   POST /favorites/check   - Check many favorites at once (JWT)")
+    print("   GET  /favorites/ids     - Favorite recipe ids (JWT)")
     print("📚 Available endpoints:")
     print("   GET  /search           - Search recipes with filters")
     print("   GET  /recipe/<id>      - Get recipe details")
     print("   GET  /popular          - Get popular recipes")
+    print("   GET  /trending         - Get trending recipes (?window=24h|7d)")
     print("   GET  /quick-meals      - Get quick meals")
     print("   GET  /featured         - Get featured recipes")
     print("   GET  /categories       - Get all categories")
     print("   GET  /tags             - Get popular tags")
     print("   GET  /category/<name>  - Get recipes by category")
     print("   GET  /stats            - Get application statistics")
+    print("   GET  /bootstrap        - Home page data in one response")
     print("   POST /recipe/<id>/rate - Rate a recipe")
     print("   GET  /health           - Health check")
+    print("   GET  /metrics          - Pool, writer and cache counters")
     
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
@@ -0,0 +1,397 @@
+"""
+Ingredient-vector similarity behind /recipe/<id>/similar.
+
+Each recipe becomes a sparse TF-IDF vector over these features:
+- its ingredient names, plus the words of multi-word names at a lower weight
+- its tags
+- its cuisine_type
+- its difficulty
+Rows are L2-normalised, so a dot product is the cosine similarity.
+
+The top SIMILAR_NEIGHBORS neighbours of every recipe are computed once per
+catalog version and kept in a (recipes x k) array, so a request is an O(k)
+lookup.
+
+The neighbours are exact, but the search avoids comparing every pair.
+Features found in more than DENSE_FEATURE_SHARE of recipes ("salt", a
+difficulty, a big cuisine) are "frequent", and the rest are "rare". Rare
+features keep posting lists. Walking the lists of one recipe's features gives
+every recipe that shares a rare feature with it, with its exact score.
+
+Recipes with identical frequent features form a group. Against another
+recipe, the only thing that varies inside a group is each recipe's norm, so
+a group sorted by norm yields its best matches first. Groups are visited in
+order of their best possible score, and the search stops once no remaining
+group can beat the current k-th neighbour.
+
+Catalog changes are applied incrementally in a background thread:
+- changed recipes are rescored;
+- recipes that had one of them as a neighbour are rescored;
+- every other list only checks whether a changed recipe now beats its last
+  entry.
+The IDF weights stay those of the last full build. Past REBUILD_SHARE of
+changed recipes the whole model is rebuilt instead.
+"""
+
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from ingredients import ingredient_names
+
+SIMILAR_NEIGHBORS = int(os.environ.get('SIMILAR_NEIGHBORS', 20))
+DENSE_FEATURE_SHARE = float(os.environ.get('SIMILAR_DENSE_FEATURE_SHARE', 0.05))
+REBUILD_SHARE = float(os.environ.get('SIMILAR_REBUILD_SHARE', 0.05))
+
+# Multipliers on the TF-IDF weight of each kind of feature
+FEATURE_WEIGHTS = {
+    'i': 1.0,   # ingredient name
+    'w': 0.4,   # word of a multi-word ingredient name
+    't': 0.8,   # tag
+    'c': 0.6,   # cuisine_type
+    'd': 0.3,   # difficulty
+}
+
+
+def recipe_features(recipe):
+    """Term frequency of each feature of a catalog recipe, keyed "<kind>:<value>"."""
+    features = {}
+
+    def add(kind, value):
+        key = f'{kind}:{value}'
+        features[key] = features.get(key, 0) + 1
+
+    for name in ingredient_names(recipe.ingredients):
+        add('i', name)
+        words = name.split()
+        if len(words) > 1:
+            for word in words:
+                add('w', word)
+    for tag in recipe.tags:
+        add('t', tag.lower())
+    if recipe.cuisine_type:
+        add('c', recipe.cuisine_type.lower())
+    if recipe.difficulty:
+        add('d', recipe.difficulty.lower())
+    return features
+
+
+class FeatureMatrix:
+    """TF-IDF rows split into posting lists (rare features) and groups of equal frequent features."""
+
+    def __init__(self, ids, features, idf, dense_share=DENSE_FEATURE_SHARE):
+        """`idf` maps feature -> weight and gains an entry for every feature it lacks."""
+        self.ids = np.asarray(ids, dtype=np.int64)
+        n = len(ids)
+        unseen_idf = math.log((1 + n) / 2) + 1
+
+        columns = {}
+        indptr = [0]
+        indices = []
+        raw = []
+        norms = []
+        for recipe_features in features:
+            row = []
+            for feature, tf in recipe_features.items():
+                column = columns.setdefault(feature, len(columns))
+                weight = idf.setdefault(feature, unseen_idf)
+                row.append((column, (1 + math.log(tf)) * weight * FEATURE_WEIGHTS[feature[0]]))
+            indices.extend(column for column, _ in row)
+            raw.extend(value for _, value in row)
+            norms.append(math.sqrt(sum(value * value for _, value in row)) or 1.0)
+            indptr.append(len(indices))
+
+        self.feature_count = len(columns)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        raw = np.asarray(raw, dtype=np.float64)
+        norms = np.asarray(norms)
+        self.inverse_norms = 1.0 / norms
+        entry_rows = np.repeat(np.arange(n), np.diff(self.indptr))
+        # Unit-length rows, so dot products are cosines
+        self.data = raw * self.inverse_norms[entry_rows]
+
+        df = np.bincount(self.indices, minlength=self.feature_count)
+        self.is_dense = df > max(dense_share * n, 1)
+        dense_entries = self.is_dense[self.indices]
+
+        sparse_columns = self.indices[~dense_entries]
+        order = np.argsort(sparse_columns, kind='stable')
+        self.posting_rows = entry_rows[~dense_entries][order]
+        self.posting_values = self.data[~dense_entries][order]
+        self.posting_ptr = np.concatenate((
+            [0], np.cumsum(np.bincount(sparse_columns, minlength=self.feature_count))
+        ))
+
+        # Group rows by their raw frequent-feature weights. Two rows' frequent
+        # features contribute (pattern_a . pattern_b) / (norm_a * norm_b), so
+        # within a group the shortest rows score highest against anyone.
+        dense_position = np.cumsum(self.is_dense) - 1
+        dense_raw = np.zeros((n, int(self.is_dense.sum())))
+        dense_raw[entry_rows[dense_entries], dense_position[self.indices[dense_entries]]] = raw[dense_entries]
+        self.patterns, self.row_pattern = np.unique(dense_raw, axis=0, return_inverse=True)
+        self.row_pattern = self.row_pattern.reshape(-1)
+        order = np.lexsort((norms, self.row_pattern))
+        self.group_rows = order
+        self.group_ptr = np.concatenate(([0], np.cumsum(np.bincount(self.row_pattern))))
+        self.group_best = self.inverse_norms[order[self.group_ptr[:-1]]]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _rare_scores(self, row):
+        """Rows sharing a rare feature with `row`, and that part of their dot product."""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        columns = self.indices[start:end]
+        values = self.data[start:end]
+        rare = ~self.is_dense[columns]
+        segments = [
+            (self.posting_ptr[column], self.posting_ptr[column + 1], value)
+            for column, value in zip(columns[rare], values[rare])
+        ]
+        if not segments:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        rows = np.concatenate([self.posting_rows[a:b] for a, b, _ in segments])
+        weights = np.concatenate([self.posting_values[a:b] * value for a, b, value in segments])
+        candidates, inverse = np.unique(rows, return_inverse=True)
+        return candidates, np.bincount(inverse, weights=weights)
+
+    def _group_overlap(self, row):
+        """Per group, the frequent-feature score against `row` before dividing by the other row's norm."""
+        return self.patterns @ self.patterns[self.row_pattern[row]] * self.inverse_norms[row]
+
+    @staticmethod
+    def _kth(scores, k):
+        if len(scores) < k:
+            return 0
+        return np.partition(scores, len(scores) - k)[len(scores) - k]
+
+    def scores(self, row):
+        """Cosine similarity of `row` with every recipe that scores above zero."""
+        overlap = self._group_overlap(row)
+        scores = overlap[self.row_pattern] * self.inverse_norms
+        candidates, rare = self._rare_scores(row)
+        scores[candidates] += rare
+        scores[row] = 0
+        others = np.flatnonzero(scores > 0)
+        return others, scores[others]
+
+    def top(self, row, k):
+        """Recipe ids and scores of the k best matches, best first (ties by id).
+
+        Rows sharing a rare feature are scored in full. Other rows score only
+        through their group, so groups are visited best bound first. Each one
+        adds its k shortest rows until no group can beat the current k-th
+        score.
+        """
+        overlap = self._group_overlap(row)
+        candidates, scores = self._rare_scores(row)
+        scores = scores + overlap[self.row_pattern[candidates]] * self.inverse_norms[candidates]
+        keep = candidates != row
+        candidates, scores = candidates[keep], scores[keep]
+        excluded = np.append(candidates, row)
+
+        bounds = overlap * self.group_best
+        threshold = self._kth(scores, k)
+        eligible = np.flatnonzero(bounds > threshold)
+        for group in eligible[np.argsort(-bounds[eligible])]:
+            if bounds[group] <= threshold:
+                break
+            members = self.group_rows[self.group_ptr[group]:self.group_ptr[group + 1]]
+            head = members[:k + len(excluded)]
+            head = head[~np.isin(head, excluded)][:k]
+            candidates = np.concatenate((candidates, head))
+            scores = np.concatenate((scores, overlap[group] * self.inverse_norms[head]))
+            threshold = self._kth(scores, k)
+
+        if len(candidates) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[best], scores[best]
+        ids = self.ids[candidates]
+        order = np.lexsort((ids, -scores))
+        return ids[order], scores[order]
+
+
+class SimilarityIndex:
+    """Precomputed top-k neighbours of every recipe, kept in step with the catalog."""
+
+    def __init__(self, k=SIMILAR_NEIGHBORS, rebuild_share=REBUILD_SHARE):
+        self.k = k
+        self.rebuild_share = rebuild_share
+        # (row_of, neighbor ids, neighbor scores); swapped as a whole
+        self._state = None
+        self._matrix = None
+        self._idf = None
+        self._features = {}
+        self._recipes = {}
+
+        self.version = None
+        self.builds = 0
+        self.updates = 0
+        self.last_update_ms = 0.0
+
+        self._pending = None
+        self._wakeup = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._state is not None
+
+    def neighbors(self, recipe_id, limit):
+        """Up to `limit` similar recipe ids, or None if the index cannot answer."""
+        state = self._state
+        if state is None:
+            return None
+        row_of, neighbor_ids, _ = state
+        row = row_of.get(recipe_id)
+        if row is None:
+            return None
+        return [int(recipe_id) for recipe_id in neighbor_ids[row, :limit] if recipe_id >= 0]
+
+    def update(self, snapshot):
+        """Catalog subscriber: build now the first time, then patch in the background."""
+        if self._state is None:
+            self._apply(snapshot)
+            return
+        self._ensure_started()
+        self._pending = snapshot
+        self._wakeup.set()
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="similarity-updater", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            snapshot, self._pending = self._pending, None
+            if snapshot is None:
+                continue
+            try:
+                self._apply(snapshot)
+            except Exception as e:
+                print(f"❌ Similarity update failed: {e}")
+
+    def _apply(self, snapshot):
+        started = time.perf_counter()
+        recipes = {recipe.id: recipe for recipe in snapshot.recipes}
+        changed = {recipe_id for recipe_id, recipe in recipes.items() if self._recipes.get(recipe_id) != recipe}
+        removed = set(self._recipes) - set(recipes)
+
+        for recipe_id in removed:
+            self._features.pop(recipe_id, None)
+        for recipe_id in changed:
+            self._features[recipe_id] = recipe_features(recipes[recipe_id])
+
+        ids = [recipe.id for recipe in snapshot.recipes]
+        if self._state is None or len(changed) + len(removed) > self.rebuild_share * max(len(ids), 1):
+            self._build(ids)
+            self.builds += 1
+        else:
+            self._patch(ids, changed, removed)
+            self.updates += 1
+
+        self._recipes = recipes
+        self.version = snapshot.version
+        self.last_update_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    def _build(self, ids):
+        features = [self._features[recipe_id] for recipe_id in ids]
+        df = {}
+        for recipe_features in features:
+            for feature in recipe_features:
+                df[feature] = df.get(feature, 0) + 1
+        n = len(ids)
+        self._idf = {feature: math.log((1 + n) / (1 + count)) + 1 for feature, count in df.items()}
+
+        matrix = FeatureMatrix(ids, features, self._idf)
+        neighbor_ids, neighbor_scores = self._empty(n)
+        for row in range(n):
+            self._fill(matrix, row, neighbor_ids, neighbor_scores)
+        self._swap(matrix, neighbor_ids, neighbor_scores)
+
+    def _patch(self, ids, changed, removed):
+        old_row_of, old_ids, old_scores = self._state
+        matrix = FeatureMatrix(ids, [self._features[recipe_id] for recipe_id in ids], self._idf)
+        neighbor_ids, neighbor_scores = self._empty(len(ids))
+
+        # Lists that named a changed or removed recipe must be recomputed
+        touched = np.isin(old_ids, np.fromiter(changed | removed, dtype=np.int64)).any(axis=1)
+        stale = set(changed)
+        for row, recipe_id in enumerate(ids):
+            old_row = old_row_of.get(recipe_id)
+            if old_row is None or touched[old_row]:
+                stale.add(recipe_id)
+            elif recipe_id not in changed:
+                neighbor_ids[row] = old_ids[old_row]
+                neighbor_scores[row] = old_scores[old_row]
+
+        row_of = {recipe_id: row for row, recipe_id in enumerate(ids)}
+        is_stale = np.zeros(len(ids), dtype=bool)
+        is_stale[[row_of[recipe_id] for recipe_id in stale]] = True
+
+        for recipe_id in changed:
+            row = row_of[recipe_id]
+            self._fill(matrix, row, neighbor_ids, neighbor_scores)
+            # Similarity is symmetric: offer the changed recipe to the lists it now beats
+            candidates, scores = matrix.scores(row)
+            better = ~is_stale[candidates] & (scores > neighbor_scores[candidates, -1])
+            for other, score in zip(candidates[better], scores[better]):
+                self._insert(neighbor_ids[other], neighbor_scores[other], recipe_id, score)
+
+        for recipe_id in stale - changed:
+            self._fill(matrix, row_of[recipe_id], neighbor_ids, neighbor_scores)
+        self._swap(matrix, neighbor_ids, neighbor_scores)
+
+    def _empty(self, n):
+        return np.full((n, self.k), -1, dtype=np.int64), np.full((n, self.k), -1.0, dtype=np.float32)
+
+    def _fill(self, matrix, row, neighbor_ids, neighbor_scores):
+        ids, scores = matrix.top(row, self.k)
+        neighbor_ids[row] = -1
+        neighbor_scores[row] = -1.0
+        neighbor_ids[row, :len(ids)] = ids
+        neighbor_scores[row, :len(scores)] = scores
+
+    @staticmethod
+    def _insert(ids, scores, recipe_id, score):
+        position = int(np.searchsorted(-scores, -score, side='right'))
+        ids[position + 1:] = ids[position:-1].copy()
+        scores[position + 1:] = scores[position:-1].copy()
+        ids[position] = recipe_id
+        scores[position] = score
+
+    def _swap(self, matrix, neighbor_ids, neighbor_scores):
+        self._matrix = matrix
+        row_of = {int(recipe_id): row for row, recipe_id in enumerate(matrix.ids)}
+        self._state = (row_of, neighbor_ids, neighbor_scores)
+
+    def stats(self):
+        matrix = self._matrix
+        return {
+            "ready": self.ready,
+            "version": self.version,
+            "recipes": len(matrix) if matrix is not None else 0,
+            "features": matrix.feature_count if matrix is not None else 0,
+            "dense_features": int(matrix.is_dense.sum()) if matrix is not None else 0,
+            "groups": len(matrix.patterns) if matrix is not None else 0,
+            "neighbors": self.k,
+            "builds": self.builds,
+            "updates": self.updates,
+            "last_update_ms": self.last_update_ms,
+        }
@@ -0,0 +1,191 @@
+"""
+In-memory ordering of /search candidates for the non-relevance sorts.
+
+A text query or a tag filter yields a set of recipe ids that can cover most
+of the catalog. Ordering it in MySQL means sending every id back as an IN
+list on every page. Instead, each SORT_KEYS ordering is kept here as a rank
+per catalog position: (name, id), (total time, id), (difficulty, id),
+(rating desc, id) and (views desc, id). A page is the `limit` smallest ranks
+among the candidates after the cursor. Only those ids go to MySQL, through
+fetch_recipes_by_id.
+
+Names, times and difficulties come from the catalog snapshot. Ratings and
+view counts come from recipe_stats. They are reloaded in a background thread
+when the 'ratings' or 'views' version moves, at most every
+SORT_STATS_INTERVAL seconds, so those two orders can lag the table by that
+long. Cursors carry the same values as the SQL path's cursors (see
+pagination.SORT_KEYS), but names are compared with str.casefold() rather
+than MySQL's collation, so they are tagged IN_MEMORY and only resumed here.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from pagination import DIFFICULTY_ORDER, IN_MEMORY, encode_cursor
+
+SORT_STATS_INTERVAL = float(os.environ.get('SORT_STATS_INTERVAL', 30))
+
+STATS_SORTS = ('rating', 'popularity')
+
+
+def _ranks(order):
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order))
+    return ranks
+
+
+class SortIndex:
+    """Per-position sort ranks for the recipes of one catalog snapshot."""
+
+    def __init__(self, stats_interval=SORT_STATS_INTERVAL):
+        self.stats_interval = stats_interval
+        self.version = None
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.names = []
+        self.name_keys = []
+        self.values = {}
+        self.ranks = {}
+        self.recipe_stats = None
+
+        self._lock = threading.Lock()
+        self._stats_loaded_at = 0.0
+        self._stats_version = None
+        self._stats_thread = None
+
+    def rebuild(self, snapshot):
+        """Catalog subscriber: recompute the catalog orders and realign the loaded stats."""
+        recipes = snapshot.recipes
+        doc_ids = np.array([recipe.id for recipe in recipes], dtype=np.int64)
+        names = [recipe.name or '' for recipe in recipes]
+        # Case-insensitive, like the column's collation; ties go to the lower id
+        name_order = sorted(range(len(recipes)), key=lambda position: (names[position].casefold(), recipes[position].id))
+        values = {
+            'time': np.array([(recipe.prep_time or 0) + (recipe.cook_time or 0) for recipe in recipes], dtype=np.int64),
+            'difficulty': np.array([DIFFICULTY_ORDER.get(recipe.difficulty, 0) for recipe in recipes], dtype=np.int64),
+        }
+        ranks = {'name': _ranks(np.array(name_order, dtype=np.int64))}
+        for sort, column in values.items():
+            ranks[sort] = _ranks(np.lexsort((doc_ids, column)))
+
+        with self._lock:
+            (self.doc_ids, self.names, self.name_keys, self.values, self.ranks, self.version) = (
+                doc_ids,
+                names,
+                [(names[position].casefold(), int(doc_ids[position])) for position in name_order],
+                values,
+                ranks,
+                snapshot.version,
+            )
+            if self.recipe_stats is not None:
+                self._apply_stats(self.recipe_stats)
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def supports(self, sort):
+        """Whether `sort` can be paged in memory right now."""
+        return sort in self.ranks
+
+    def refresh_stats(self, stats_version, load_stats):
+        """Reload ratings and views in the background when they moved and the interval has passed.
+
+        `load_stats()` returns [(recipe_id, rating_sum, rating_count, view_count)].
+        """
+        if stats_version == self._stats_version:
+            return
+        if time.monotonic() - self._stats_loaded_at < self.stats_interval:
+            return
+        thread = self._stats_thread
+        if thread is not None and thread.is_alive():
+            return
+        self._stats_loaded_at = time.monotonic()
+        self._stats_thread = threading.Thread(
+            target=self._load_stats, args=(stats_version, load_stats), name="sort-stats", daemon=True
+        )
+        self._stats_thread.start()
+
+    def _load_stats(self, stats_version, load_stats):
+        try:
+            rows = load_stats()
+        except Exception as e:
+            print(f"❌ Failed to load sort stats: {e}")
+            return
+        stats = {recipe_id: (rating_sum, rating_count, view_count) for recipe_id, rating_sum, rating_count, view_count in rows}
+        with self._lock:
+            self.recipe_stats = stats
+            self._apply_stats(stats)
+            self._stats_version = stats_version
+
+    def _apply_stats(self, stats):
+        doc_ids = self.doc_ids
+        rating = np.zeros(len(doc_ids))
+        views = np.zeros(len(doc_ids), dtype=np.int64)
+        for position, recipe_id in enumerate(doc_ids.tolist()):
+            row = stats.get(recipe_id)
+            if row is not None:
+                rating_sum, rating_count, view_count = row
+                # MySQL's division keeps four decimals; match it so cursors agree with the SQL path
+                rating[position] = round(rating_sum / rating_count, 4) if rating_count else 0.0
+                views[position] = view_count or 0
+        values = dict(self.values, rating=rating, popularity=views)
+        ranks = dict(self.ranks)
+        for sort in STATS_SORTS:
+            ranks[sort] = _ranks(np.lexsort((doc_ids, -values[sort])))
+        self.values, self.ranks = values, ranks
+
+    def page(self, recipe_ids, page):
+        """One page of `recipe_ids` in `page.sort` order after `page.after`.
+
+        Returns the page's ids and the next cursor (None on the last page).
+        """
+        with self._lock:
+            doc_ids, ranks, values, names = self.doc_ids, self.ranks[page.sort], self.values, self.names
+            threshold = self._threshold(page.sort, page.after) if page.after is not None else 0
+
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        if not len(doc_ids):
+            return [], None
+        positions = np.minimum(np.searchsorted(doc_ids, recipe_ids), len(doc_ids) - 1)
+        positions = positions[doc_ids[positions] == recipe_ids]
+        candidate_ranks = ranks[positions]
+        keep = candidate_ranks >= threshold
+        positions, candidate_ranks = positions[keep], candidate_ranks[keep]
+
+        take = min(page.limit + 1, len(positions))
+        if take < len(positions):
+            nearest = np.argpartition(candidate_ranks, take - 1)[:take]
+            positions, candidate_ranks = positions[nearest], candidate_ranks[nearest]
+        positions = positions[np.argsort(candidate_ranks)]
+
+        next_cursor = None
+        if len(positions) > page.limit:
+            positions = positions[:page.limit]
+            last = int(positions[-1])
+            value = names[last] if page.sort == 'name' else values[page.sort][last].item()
+            next_cursor = encode_cursor(page.sort, value, int(doc_ids[last]), IN_MEMORY)
+        return doc_ids[positions].tolist(), next_cursor
+
+    def _threshold(self, sort, after):
+        """Rank of the first entry strictly after the cursor's (value, id)."""
+        value, last_id = after
+        if sort == 'name':
+            return bisect_right(self.name_keys, (str(value).casefold(), last_id))
+        column = self.values[sort]
+        if sort in STATS_SORTS:
+            before = (column > value) | ((column == value) & (self.doc_ids <= last_id))
+        else:
+            before = (column < value) | ((column == value) & (self.doc_ids <= last_id))
+        return int(np.count_nonzero(before))
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "recipes": len(self.doc_ids),
+            "sorts": sorted(self.ranks),
+            "stats_version": self._stats_version,
+        }
@@ -0,0 +1,292 @@
+"""
+Prefix index behind the /suggest typeahead.
+
+Suggestions are recipe names, canonical ingredient names, tags and
+categories, all taken from the catalog snapshot. Each one is indexed under
+every word-suffix of its text, so "pan" finds both "Paneer Tikka" and "Palak
+Paneer". The keys live in one sorted list of (text, suggestion) pairs. A
+prefix is the contiguous run found by bisect.
+
+A suggestion's weight is its popularity: a recipe weighs 1 + its views, and an
+ingredient, tag or category weighs the sum over its recipes. A short prefix
+can match a long run ("c" matches every chicken dish), so any prefix whose
+run is longer than SUGGEST_SCAN_LIMIT keys has its top SUGGEST_MAX_RESULTS
+kept ready. Every other prefix scans at most that many keys. A lookup is
+therefore a bisect plus a bounded scan at worst.
+
+When the catalog changes, only the keys, weights and cached prefixes of the
+suggestions the changed recipes touch are redone. View counts are reloaded
+in a background thread at most every SUGGEST_POPULARITY_INTERVAL seconds.
+"""
+
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+
+from ingredients import ingredient_names
+from search_index import tokenize
+
+SUGGEST_MAX_RESULTS = int(os.environ.get('SUGGEST_MAX_RESULTS', 10))
+SUGGEST_SCAN_LIMIT = int(os.environ.get('SUGGEST_SCAN_LIMIT', 256))
+SUGGEST_POPULARITY_INTERVAL = float(os.environ.get('SUGGEST_POPULARITY_INTERVAL', 300))
+# Past this share of changed recipes the index is rebuilt instead of patched
+SUGGEST_REBUILD_SHARE = float(os.environ.get('SUGGEST_REBUILD_SHARE', 0.2))
+
+# Sorts after every character a key can contain, to find the end of a prefix run
+_PREFIX_END = '\uffff'
+
+
+def recipe_suggestions(recipe):
+    """The suggestions a catalog recipe contributes, as (type, value) pairs."""
+    entries = {('recipe', recipe.id)}
+    entries.update(('ingredient', name) for name in ingredient_names(recipe.ingredients))
+    entries.update(('tag', tag) for tag in recipe.tags)
+    if recipe.category:
+        entries.add(('category', recipe.category))
+    return entries
+
+
+def _suffix_keys(text, entry):
+    words = tokenize(text)
+    return {(' '.join(words[i:]), entry) for i in range(len(words))}
+
+
+class SuggestIndex:
+    """Sorted prefix keys over recipe names, ingredients, tags and categories."""
+
+    def __init__(self, max_results=SUGGEST_MAX_RESULTS, scan_limit=SUGGEST_SCAN_LIMIT,
+                 popularity_interval=SUGGEST_POPULARITY_INTERVAL, rebuild_share=SUGGEST_REBUILD_SHARE):
+        self.max_results = max_results
+        self.scan_limit = scan_limit
+        self.popularity_interval = popularity_interval
+        self.rebuild_share = rebuild_share
+
+        self.version = None
+        self.recipes = {}
+        self.members = {}
+        self.keys = []
+        self.weights = {}
+        self.top = {}
+        self.views = {}
+
+        self.builds = 0
+        self.patches = 0
+        self._lock = threading.Lock()
+        self._popularity_loaded_at = 0.0
+        self._popularity_version = None
+        self._popularity_thread = None
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def update(self, snapshot):
+        """Catalog subscriber: apply a new snapshot, incrementally when few recipes changed."""
+        with self._lock:
+            previous = self.recipes
+            current = snapshot.by_id
+            changed = [recipe_id for recipe_id, recipe in current.items() if previous.get(recipe_id) != recipe]
+            removed = [recipe_id for recipe_id in previous if recipe_id not in current]
+            if not self.ready or len(changed) + len(removed) > self.rebuild_share * max(len(current), 1):
+                self._build(current)
+            elif changed or removed:
+                self._patch(current, changed + removed)
+            self.version = snapshot.version
+
+    def suggest(self, prefix, limit=SUGGEST_MAX_RESULTS):
+        """Up to `limit` suggestions for a typed prefix, most popular first."""
+        words = tokenize(prefix)
+        if not words:
+            return []
+        # A trailing space means the last word is complete: "pav " matches "pav bhaji", not "pavlova"
+        prefix = ' '.join(words) + (' ' if prefix[-1:].isspace() else '')
+        entries = self.top.get(prefix)
+        if entries is None:
+            entries = self._rank(self.keys, self.weights, prefix)
+        return [self._describe(entry) for entry in entries[:min(limit, self.max_results)]]
+
+    def _describe(self, entry):
+        kind, value = entry
+        if kind == 'recipe':
+            recipe = self.recipes.get(value)
+            return {"text": recipe.name if recipe else '', "type": kind, "id": value}
+        return {"text": value, "type": kind}
+
+    def _text(self, entry, recipes):
+        kind, value = entry
+        if kind == 'recipe':
+            return recipes[value].name or ''
+        return value
+
+    def _weight(self, entry, members, views):
+        return sum(views.get(recipe_id, 0) + 1 for recipe_id in members[entry])
+
+    def _rank(self, keys, weights, prefix, top=None):
+        """Top suggestions among the keys starting with `prefix`.
+
+        Where `top` already holds a longer prefix, its ranked list stands in
+        for that part of the run.
+        """
+        lo = bisect_left(keys, (prefix,))
+        hi = bisect_left(keys, (prefix + _PREFIX_END,), lo)
+        if not top:
+            entries = {entry for _, entry in keys[lo:hi]}
+        else:
+            entries = set()
+            length = len(prefix) + 1
+            i = lo
+            while i < hi:
+                text = keys[i][0]
+                if len(text) < length:
+                    entries.add(keys[i][1])
+                    i += 1
+                    continue
+                child = text[:length]
+                end = bisect_left(keys, (child + _PREFIX_END,), i, hi)
+                if child in top:
+                    entries.update(top[child])
+                else:
+                    entries.update(entry for _, entry in keys[i:end])
+                i = end
+        return heapq.nsmallest(self.max_results, entries, key=lambda entry: (-weights[entry], entry[0], str(entry[1])))
+
+    def _rank_prefixes(self, keys, weights, prefixes, top):
+        """Fill `top` for `prefixes`, longest first so each can reuse its children."""
+        for prefix in sorted(prefixes, key=len, reverse=True):
+            top[prefix] = self._rank(keys, weights, prefix, top)
+        return top
+
+    def _heavy_prefixes(self, keys, texts=None):
+        """Prefixes whose run is longer than scan_limit, optionally only those of `texts`."""
+        heavy = []
+        if texts is not None:
+            for text in texts:
+                for length in range(1, len(text) + 1):
+                    prefix = text[:length]
+                    lo = bisect_left(keys, (prefix,))
+                    hi = bisect_left(keys, (prefix + _PREFIX_END,), lo)
+                    if hi - lo <= self.scan_limit:
+                        break
+                    heavy.append(prefix)
+            return heavy
+
+        # Runs nest, so only the runs of heavy prefixes need splitting further
+        stack = [(0, len(keys), 1)]
+        while stack:
+            lo, hi, length = stack.pop()
+            i = lo
+            while i < hi:
+                text = keys[i][0]
+                if len(text) < length:
+                    i += 1
+                    continue
+                prefix = text[:length]
+                end = bisect_left(keys, (prefix + _PREFIX_END,), i, hi)
+                if end - i > self.scan_limit:
+                    heavy.append(prefix)
+                    stack.append((i, end, length + 1))
+                i = end
+        return heavy
+
+    def _build(self, recipes):
+        members = {}
+        for recipe in recipes.values():
+            for entry in recipe_suggestions(recipe):
+                members.setdefault(entry, set()).add(recipe.id)
+
+        keys = sorted(key for entry in members for key in _suffix_keys(self._text(entry, recipes), entry))
+        views = self.views
+        weights = {entry: self._weight(entry, members, views) for entry in members}
+        top = self._rank_prefixes(keys, weights, self._heavy_prefixes(keys), {})
+
+        self.recipes, self.members, self.keys, self.weights, self.top = recipes, members, keys, weights, top
+        self.builds += 1
+
+    def _patch(self, recipes, recipe_ids):
+        old_recipes = self.recipes
+        members = dict(self.members)
+        touched = set()
+        for recipe_id in recipe_ids:
+            old = recipe_suggestions(old_recipes[recipe_id]) if recipe_id in old_recipes else set()
+            new = recipe_suggestions(recipes[recipe_id]) if recipe_id in recipes else set()
+            for entry in old - new:
+                members[entry] = members[entry] - {recipe_id}
+            for entry in new - old:
+                members[entry] = members.get(entry, set()) | {recipe_id}
+            touched |= old | new
+
+        old_keys, new_keys = set(), set()
+        for entry in touched:
+            if entry in self.members:
+                old_keys |= _suffix_keys(self._text(entry, old_recipes), entry)
+            if members.get(entry):
+                new_keys |= _suffix_keys(self._text(entry, recipes), entry)
+            else:
+                members.pop(entry, None)
+
+        keys = list(self.keys)
+        for key in old_keys - new_keys:
+            del keys[bisect_left(keys, key)]
+        for key in new_keys - old_keys:
+            insort(keys, key)
+
+        weights = dict(self.weights)
+        for entry in touched:
+            if entry in members:
+                weights[entry] = self._weight(entry, members, self.views)
+            else:
+                weights.pop(entry, None)
+
+        texts = {text for text, _ in old_keys | new_keys}
+        top = {prefix: entries for prefix, entries in self.top.items()
+               if not any(text.startswith(prefix) for text in texts)}
+        self._rank_prefixes(keys, weights, self._heavy_prefixes(keys, texts), top)
+
+        self.recipes, self.members, self.keys, self.weights, self.top = recipes, members, keys, weights, top
+        self.patches += 1
+
+    def refresh_popularity(self, views_version, load_views):
+        """Reload view counts in the background when they moved and the interval has passed.
+
+        `load_views()` returns {recipe_id: view_count}; it runs off the request thread.
+        """
+        if views_version == self._popularity_version:
+            return
+        if time.monotonic() - self._popularity_loaded_at < self.popularity_interval:
+            return
+        thread = self._popularity_thread
+        if thread is not None and thread.is_alive():
+            return
+        self._popularity_loaded_at = time.monotonic()
+        self._popularity_thread = threading.Thread(
+            target=self._load_popularity, args=(views_version, load_views), name="suggest-popularity", daemon=True
+        )
+        self._popularity_thread.start()
+
+    def _load_popularity(self, views_version, load_views):
+        try:
+            views = load_views()
+        except Exception as e:
+            print(f"❌ Failed to load suggestion popularity: {e}")
+            return
+        with self._lock:
+            self.views = views
+            members = self.members
+            weights = {entry: self._weight(entry, members, views) for entry in members}
+            keys = self.keys
+            top = self._rank_prefixes(keys, weights, self._heavy_prefixes(keys), {})
+            self.weights, self.top = weights, top
+            self._popularity_version = views_version
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "suggestions": len(self.members),
+            "keys": len(self.keys),
+            "cached_prefixes": len(self.top),
+            "builds": self.builds,
+            "patches": self.patches,
+            "popularity_version": self._popularity_version,
+        }
@@ -0,0 +1,17 @@
+"""
+/trending windows, shared by the API and the view rollup jobs.
+
+rollup_views.py ranks recipes per window from hourly view buckets,
+prune_activity.py keeps the buckets the longest window still reaches, and
+the API validates the `window` and `limit` arguments against them.
+"""
+
+import os
+
+# /trending windows: name -> (hours of buckets scored, half-life of a view in hours)
+TRENDING_WINDOWS = {
+    '24h': (24, float(os.environ.get('TRENDING_HALF_LIFE_24H', 6))),
+    '7d': (24 * 7, float(os.environ.get('TRENDING_HALF_LIFE_7D', 36))),
+}
+# Ranked recipes stored per window
+TRENDING_SIZE = int(os.environ.get('TRENDING_SIZE', 100))